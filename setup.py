@@ -19,7 +19,8 @@ setuptools.setup(
     packages=setuptools.find_packages(exclude=[]),
     entry_points={
         'console_scripts': [
-            'transphire = transphire.__main__:run_package'
+            'transphire = transphire.__main__:run_package',
+            'transphire_headless = transphire.transphire_headless:main'
             ]
         },
     install_requires = [
@@ -1,16 +1,46 @@
-import pkg_resources
-from pkg_resources import get_distribution
 import os
 
 try:
-    _dist = get_distribution('transphire')
+    # pkg_resources is slow to import, only use it on old Python versions
+    from importlib import metadata
+except ImportError:
+    try:
+        # Backport for Python < 3.8
+        import importlib_metadata as metadata
+    except ImportError:
+        metadata = None
+
+
+def _get_version():
+    """
+    Version of the installed package.
+
+    Returns:
+    Version string
+    """
+    not_installed = 'Please install this project with setup.py'
     # Normalize case for Windows systems
-    dist_loc = os.path.normcase(_dist.location)
     here = os.path.normcase(__file__)
+    if metadata is not None:
+        try:
+            _dist = metadata.distribution('transphire')
+        except metadata.PackageNotFoundError:
+            return not_installed
+        dist_loc = os.path.normcase(str(_dist.locate_file('')))
+        version = _dist.version
+    else:
+        import pkg_resources
+        try:
+            _dist = pkg_resources.get_distribution('transphire')
+        except pkg_resources.DistributionNotFound:
+            return not_installed
+        dist_loc = os.path.normcase(_dist.location)
+        version = _dist.version
     if not here.startswith(os.path.join(dist_loc, 'transphire')):
         # not installed, but there is another version that *is*
-        raise pkg_resources.DistributionNotFound
-except pkg_resources.DistributionNotFound:
-    __version__ = 'Please install this project with setup.py'
-else:
-    __version__ = _dist.version
+        return not_installed
+    else:
+        return version
+
+
+__version__ = _get_version()
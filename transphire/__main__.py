@@ -26,9 +26,6 @@ except ImportError:
     from PyQt5.QtWidgets import QApplication
 
 import transphire
-from transphire import transphire_utils as tu
-from transphire.mainwindow import MainWindow
-from transphire.loadwindow import DefaultSettings
 
 
 def main(font, root_directory, settings_directory, mount_directory, adjust_width, adjust_height, edit_settings):
@@ -44,6 +41,11 @@ def main(font, root_directory, settings_directory, mount_directory, adjust_width
     Return:
     None
     """
+    # Imported here, so the command line is parsed without loading the GUI
+    from transphire import transphire_utils as tu
+    from transphire.mainwindow import MainWindow
+    from transphire.loadwindow import DefaultSettings
+
     # Start the GUI from the users home directory.
     os.chdir(root_directory)
 
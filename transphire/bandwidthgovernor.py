@@ -0,0 +1,231 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import time as ti
+import collections as co
+try:
+    from PyQt4.QtCore import QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QMutex, QWaitCondition
+from transphire import transphire_execute as te
+
+
+class BandwidthGovernor(object):
+    """
+    Token buckets shared by the copy threads.
+
+    Every stage has its own rate and all stages share the total rate.
+    Stages of priority 0 never wait, their transfers are only counted,
+    so the other stages get what is left.
+    A stage only continues if no stage of a higher priority is waiting.
+    A rate of 0 means unlimited.
+    Priorities only take effect while the total rate or the rate of a stage
+    is limited, with every rate 0 they do nothing.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, total_rate, rate_dict, priority_dict, window=30):
+        """
+        Initialize object variables.
+
+        Arguments:
+        total_rate - Rate of all stages together in bytes/sec
+        rate_dict - Dictionary: stage -> rate in bytes/sec
+        priority_dict - Dictionary: stage -> priority, 0 is highest
+        window - Time in seconds to average the achieved rates
+
+        Return:
+        None
+        """
+        super(BandwidthGovernor, self).__init__()
+        self.priority_dict = priority_dict
+        self.window = window
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.total_bucket = self.create_bucket(total_rate)
+        self.bucket_dict = {
+            stage: self.create_bucket(rate)
+            for stage, rate in rate_dict.items()
+            }
+        self.waiting_dict = co.defaultdict(int)
+        self.transfer_dict = co.defaultdict(co.deque)
+
+    @staticmethod
+    def create_bucket(rate):
+        """
+        Token bucket that holds one second of transfer.
+
+        Arguments:
+        rate - Rate in bytes/sec, 0 for unlimited
+
+        Return:
+        Bucket dictionary
+        """
+        return {'rate': rate, 'tokens': rate, 'time': ti.time()}
+
+    @staticmethod
+    def refill(bucket, now):
+        """
+        Add the tokens of the time passed.
+
+        Arguments:
+        bucket - Bucket dictionary
+        now - Current time
+
+        Return:
+        None
+        """
+        bucket['tokens'] = min(
+            bucket['rate'],
+            bucket['tokens'] + bucket['rate'] * (now - bucket['time'])
+            )
+        bucket['time'] = now
+
+    def get_rate_limit(self, stage):
+        """
+        Configured rate of a stage.
+
+        Arguments:
+        stage - Stage name, e.g. Copy_backup
+
+        Return:
+        Rate in bytes/sec, 0 for unlimited
+        """
+        bucket = self.bucket_dict.get(stage)
+        if bucket is None:
+            return 0
+        else:
+            return bucket['rate']
+
+    def is_limited(self, stage):
+        """
+        Check if the transfers of a stage have to wait for tokens.
+
+        Arguments:
+        stage - Stage name, e.g. Copy_backup
+
+        Return:
+        True if the total rate or the rate of the stage is limited
+        """
+        return bool(self.total_bucket['rate'] or self.get_rate_limit(stage))
+
+    def acquire(self, stage, size, stop_check=None):
+        """
+        Wait until a stage may transfer the next bytes.
+        The tokens are taken at once, so a large transfer is paid back by
+        waiting before the next one.
+
+        Arguments:
+        stage - Stage name, e.g. Copy_backup
+        size - Number of bytes to transfer
+        stop_check - Function that returns True if the process should stop
+
+        Return:
+        None
+        """
+        priority = self.priority_dict.get(stage, 0)
+        bucket_list = [self.total_bucket]
+        if stage in self.bucket_dict:
+            bucket_list.append(self.bucket_dict[stage])
+        else:
+            pass
+
+        self.lock.lock()
+        try:
+            self.waiting_dict[priority] += 1
+            try:
+                while True:
+                    now = ti.time()
+                    for bucket in bucket_list:
+                        self.refill(bucket, now)
+
+                    if priority == 0:
+                        break
+                    elif stop_check is not None and stop_check():
+                        raise te.ProcessStopped('Bandwidth {0}'.format(stage))
+                    elif [
+                            entry for entry, count in self.waiting_dict.items()
+                            if entry < priority and count
+                            ]:
+                        pass
+                    elif not [
+                            bucket for bucket in bucket_list
+                            if bucket['rate'] and bucket['tokens'] <= 0
+                            ]:
+                        break
+                    else:
+                        pass
+                    self.condition.wait(self.lock, 100)
+            except Exception:
+                raise
+            finally:
+                self.waiting_dict[priority] -= 1
+
+            for bucket in bucket_list:
+                if bucket['rate']:
+                    bucket['tokens'] -= size
+                else:
+                    pass
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def add_transferred(self, stage, size):
+        """
+        Count transferred bytes for the achieved rate.
+
+        Arguments:
+        stage - Stage name, e.g. Copy_backup
+        size - Number of bytes transferred
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.transfer_dict[stage].append((ti.time(), size))
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get_achieved_rate(self, stage):
+        """
+        Transfer rate of a stage during the last window.
+
+        Arguments:
+        stage - Stage name, e.g. Copy_backup
+
+        Return:
+        Rate in bytes/sec
+        """
+        self.lock.lock()
+        try:
+            transfers = self.transfer_dict[stage]
+            now = ti.time()
+            while transfers and now - transfers[0][0] > self.window:
+                transfers.popleft()
+            size = sum(entry[1] for entry in transfers)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return size / self.window
@@ -0,0 +1,303 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import time as ti
+import shutil as sh
+import collections as co
+try:
+    from PyQt4.QtCore import QThread, QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QThread, QMutex, QWaitCondition
+
+
+class CapacityMonitor(QThread):
+    """
+    Poll the disk usage of folders on an own thread.
+
+    Every file system is asked once per interval, so a stalled NFS or GPFS
+    server only blocks this thread and not the processing.
+    Readers get the cached values together with the fill rate and the
+    estimated time until the file system is full.
+    One monitor is shared by the GUI and the processing; folders are
+    counted, so a folder stays watched until every user removed it.
+
+    Inherits from:
+    QThread
+    """
+
+    def __init__(self, interval=30, history=20, parent=None):
+        """
+        Initialize object variables.
+
+        Arguments:
+        interval - Time in seconds between two checks
+        history - Number of checks used for the trend
+        parent - Parent widget (default None)
+
+        Return:
+        None
+        """
+        super(CapacityMonitor, self).__init__(parent)
+        self.interval = interval
+        self.history = history
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.folder_dict = {}
+        self.running = True
+
+    def add_folder(self, folder):
+        """
+        Add a folder to watch and check it with the next poll.
+
+        Arguments:
+        folder - Folder to watch
+
+        Return:
+        None
+        """
+        folder = os.path.abspath(folder)
+        self.lock.lock()
+        try:
+            if folder not in self.folder_dict:
+                self.folder_dict[folder] = {
+                    'usage': None,
+                    'samples': co.deque(maxlen=self.history),
+                    'users': 1,
+                    }
+                self.condition.wakeAll()
+            else:
+                self.folder_dict[folder]['users'] += 1
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def remove_folder(self, folder):
+        """
+        Stop watching a folder, if no other user watches it.
+
+        Arguments:
+        folder - Folder to remove
+
+        Return:
+        None
+        """
+        folder = os.path.abspath(folder)
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(folder)
+            if entry is None:
+                pass
+            elif entry['users'] > 1:
+                entry['users'] -= 1
+            else:
+                del self.folder_dict[folder]
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def set_interval(self, interval):
+        """
+        Change the time between two checks.
+
+        Arguments:
+        interval - Time in seconds between two checks
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.interval = interval
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get_usage(self, folder):
+        """
+        Cached usage of a folder.
+
+        Arguments:
+        folder - Watched folder
+
+        Return:
+        Dictionary with total, used, free (bytes), rate (bytes/sec),
+        eta (sec until full, None if not filling), time of the check and
+        error (None, or the message if the folder is not available);
+        None, if the folder has not been checked yet.
+        """
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(os.path.abspath(folder))
+            if entry is None or entry['usage'] is None:
+                usage = None
+            else:
+                usage = dict(entry['usage'])
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return usage
+
+    def consume(self, folder, size):
+        """
+        Lower the cached free space until the next check,
+        so several copies between two checks do not overfill the disk.
+
+        Arguments:
+        folder - Watched folder
+        size - Bytes that are going to be written
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(os.path.abspath(folder))
+            if entry is not None and entry['usage'] is not None:
+                entry['usage']['free'] -= size
+                entry['usage']['used'] += size
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def poll(self):
+        """
+        Check all watched folders once.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            folders = list(self.folder_dict)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+        # Folders on the same file system share one check
+        device_usage = {}
+        for folder in folders:
+            now = ti.time()
+            try:
+                device = os.stat(folder).st_dev
+                if device not in device_usage:
+                    device_usage[device] = sh.disk_usage(folder)
+                else:
+                    pass
+                disk_usage = device_usage[device]
+            except OSError as err:
+                usage = {
+                    'total': 0,
+                    'used': 0,
+                    'free': 0,
+                    'rate': 0,
+                    'eta': None,
+                    'time': now,
+                    'error': str(err),
+                    }
+                disk_usage = None
+            else:
+                usage = {
+                    'total': disk_usage.total,
+                    'used': disk_usage.used,
+                    'free': disk_usage.free,
+                    'rate': 0,
+                    'eta': None,
+                    'time': now,
+                    'error': None,
+                    }
+
+            self.lock.lock()
+            try:
+                entry = self.folder_dict.get(folder)
+                if entry is None:
+                    continue
+                elif disk_usage is None:
+                    entry['samples'].clear()
+                else:
+                    entry['samples'].append((now, disk_usage.used))
+                    first_time, first_used = entry['samples'][0]
+                    if now > first_time:
+                        usage['rate'] = (disk_usage.used - first_used) / (now - first_time)
+                    else:
+                        pass
+                    if usage['rate'] > 0:
+                        usage['eta'] = disk_usage.free / usage['rate']
+                    else:
+                        pass
+                entry['usage'] = usage
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+    def run(self):
+        """
+        Poll until stop_monitor is called.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        while self.running:
+            self.poll()
+            self.lock.lock()
+            try:
+                if self.running:
+                    self.condition.wait(self.lock, int(self.interval * 1000))
+                else:
+                    pass
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+    def stop_monitor(self, timeout=5):
+        """
+        Stop the polling thread.
+        A thread hanging in a stalled file system is not waited for longer
+        than the timeout.
+
+        Arguments:
+        timeout - Time in seconds to wait for the thread
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.running = False
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        self.wait(int(timeout * 1000))
@@ -0,0 +1,324 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import json
+import time as ti
+import signal
+import select
+import tempfile
+import threading
+import subprocess as sp
+try:
+    from PyQt4.QtCore import QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QMutex, QWaitCondition
+from transphire import transphire_copy_helper
+from transphire import transphire_execute as te
+
+
+class CopyHelper(object):
+    """
+    Long-lived copy process running as another user.
+
+    The helper is authenticated once via sudo and processes copy, mkdir and
+    fsync requests in parallel (see transphire_copy_helper).
+    Without user, it runs as the current user, e.g. for testing.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(
+            self, user=None, password=None, workers=4, python=None,
+            startup_timeout=30
+            ):
+        """
+        Start the helper process.
+
+        Arguments:
+        user - User to copy as, None to run as the current user
+        password - Sudo password
+        workers - Number of requests to process in parallel
+        python - Python executable for the helper
+        startup_timeout - Time in seconds to wait for the helper to start
+
+        Return:
+        None
+        """
+        super(CopyHelper, self).__init__()
+        self.user = user
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.results = {}
+        self.next_id = 0
+        self.dead = False
+
+        if python is None:
+            python = sys.executable
+        else:
+            pass
+        command = [
+            python,
+            os.path.abspath(transphire_copy_helper.__file__),
+            '--workers',
+            str(workers)
+            ]
+        if user is not None:
+            command = ['sudo', '-k', '-S', '-u', user] + command
+        else:
+            pass
+
+        self.stderr = tempfile.TemporaryFile(mode='w+')
+        self.process = sp.Popen(
+            command,
+            stdin=sp.PIPE,
+            stdout=sp.PIPE,
+            stderr=self.stderr,
+            universal_newlines=True,
+            bufsize=1,
+            start_new_session=True
+            )
+        if user is not None:
+            self.process.stdin.write('{0}\n'.format(password))
+            self.process.stdin.flush()
+        else:
+            pass
+
+        # A wrong password makes sudo ask again and never answer
+        if self.wait_ready(timeout=startup_timeout) != 'READY':
+            self.kill()
+            self.stderr.seek(0)
+            text = self.stderr.read()
+            if password:
+                text = text.replace(password, 'PASSWORD')
+            else:
+                pass
+            raise IOError('Cannot start copy helper for {0}! {1}'.format(
+                user,
+                text
+                ))
+        else:
+            pass
+
+        self.reader = threading.Thread(target=self._read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def wait_ready(self, timeout):
+        """
+        Wait for the first line of the helper.
+
+        Arguments:
+        timeout - Time in seconds to wait
+
+        Return:
+        First line, None if the helper did not answer in time
+        """
+        end_time = ti.time() + timeout
+        while True:
+            remaining = end_time - ti.time()
+            if remaining <= 0:
+                return None
+            else:
+                pass
+            ready, _, _ = select.select([self.process.stdout], [], [], remaining)
+            if ready:
+                return self.process.stdout.readline().strip()
+            else:
+                pass
+
+    def kill(self):
+        """
+        Kill the process group of the helper.
+        A helper running as another user cannot be killed, it exits as soon
+        as its input is closed.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            try:
+                self.process.kill()
+            except (PermissionError, ProcessLookupError):
+                pass
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except sp.TimeoutExpired:
+            pass
+
+    def _read(self):
+        """
+        Collect the answers of the helper.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        for line in self.process.stdout:
+            try:
+                answer = json.loads(line)
+            except ValueError:
+                continue
+            self.lock.lock()
+            try:
+                self.results[answer['id']] = answer['error']
+                self.condition.wakeAll()
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+        self.lock.lock()
+        try:
+            self.dead = True
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def is_alive(self):
+        """
+        Check, if the helper still accepts requests.
+
+        Arguments:
+        None
+
+        Return:
+        True, if alive
+        """
+        return bool(not self.dead and self.process.poll() is None)
+
+    def submit(self, op, **kwargs):
+        """
+        Send a request without waiting for it.
+
+        Arguments:
+        op - Operation: copy, mkdir or fsync
+        kwargs - Arguments of the operation, paths are made absolute
+
+        Return:
+        Request id
+        """
+        request = {'op': op}
+        for key, value in kwargs.items():
+            request[key] = os.path.abspath(value)
+
+        self.lock.lock()
+        try:
+            self.next_id += 1
+            request['id'] = self.next_id
+            self.process.stdin.write('{0}\n'.format(json.dumps(request)))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            self.dead = True
+            raise IOError('Copy helper for {0} is not running!'.format(
+                self.user
+                ))
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return request['id']
+
+    def wait(self, request_ids, stop_check=None):
+        """
+        Wait for requests to finish.
+
+        Arguments:
+        request_ids - Ids returned by submit
+        stop_check - Function that returns True if the process should stop
+
+        Return:
+        Dictionary: request id -> None, if successful, else error message
+        """
+        answers = {}
+        self.lock.lock()
+        try:
+            while True:
+                for request_id in request_ids:
+                    if request_id in self.results:
+                        answers[request_id] = self.results.pop(request_id)
+                    else:
+                        pass
+                if len(answers) == len(request_ids):
+                    break
+                elif self.dead:
+                    raise IOError('Copy helper for {0} stopped!'.format(
+                        self.user
+                        ))
+                elif stop_check is not None and stop_check():
+                    raise te.ProcessStopped('Copy helper requests')
+                else:
+                    self.condition.wait(self.lock, 500)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return answers
+
+    def call(self, op, stop_check=None, **kwargs):
+        """
+        Send a request and wait for it.
+
+        Arguments:
+        op - Operation: copy, mkdir or fsync
+        stop_check - Function that returns True if the process should stop
+        kwargs - Arguments of the operation
+
+        Return:
+        None
+        """
+        request_id = self.submit(op, **kwargs)
+        error = self.wait([request_id], stop_check=stop_check)[request_id]
+        if error is not None:
+            raise IOError('{0} failed for {1}: {2}'.format(op, kwargs, error))
+        else:
+            pass
+
+    def close(self):
+        """
+        Stop the helper after the running requests are done.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait(timeout=60)
+        except sp.TimeoutExpired:
+            self.kill()
+        self.stderr.close()
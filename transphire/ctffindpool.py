@@ -0,0 +1,184 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import pexpect as pe
+try:
+    from PyQt4.QtCore import QMutex
+except ImportError:
+    from PyQt5.QtCore import QMutex
+from transphire import transphire_execute as te
+
+
+class CtffindPool(object):
+    """
+    Pool of pre-spawned CTFFIND sessions.
+
+    CTFFIND reads its parameters interactively from stdin and handles one
+    micrograph per call.
+    The pool keeps started sessions waiting for their first answer,
+    so the program start is hidden behind the previous estimation.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, executable, size):
+        """
+        Initialize object variables and spawn the sessions.
+
+        Arguments:
+        executable - Path to the CTFFIND executable
+        size - Number of sessions to keep warm
+
+        Return:
+        None
+        """
+        super(CtffindPool, self).__init__()
+        self.executable = executable
+        self.size = max(int(size), 1)
+        self.lock = QMutex()
+        self.sessions = []
+        self.closed = False
+
+        self.lock.lock()
+        try:
+            for _ in range(self.size):
+                self.sessions.append(self._spawn())
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def _spawn(self):
+        """
+        Start a new CTFFIND session that waits for input.
+
+        Arguments:
+        None
+
+        Return:
+        Pexpect child
+        """
+        return pe.spawnu(self.executable, echo=False, timeout=None)
+
+    def _take(self):
+        """
+        Take a waiting session out of the pool and spawn a replacement.
+
+        Arguments:
+        None
+
+        Return:
+        Pexpect child
+        """
+        self.lock.lock()
+        try:
+            child = None
+            while self.sessions:
+                candidate = self.sessions.pop(0)
+                if candidate.isalive():
+                    child = candidate
+                    break
+                else:
+                    candidate.close()
+            if child is None:
+                child = self._spawn()
+            else:
+                pass
+            if not self.closed:
+                self.sessions.append(self._spawn())
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return child
+
+    def run(self, input_lines, out, err, settings, stop_check=None):
+        """
+        Run one CTF estimation in a warm session.
+
+        Arguments:
+        input_lines - Answers to the CTFFIND questions
+        out - Opened file for the program output
+        err - Opened file for error messages
+        settings - TranSPHIRE settings
+        stop_check - Function that returns True if the process should stop
+
+        Return:
+        Job dictionary
+        """
+        child = self._take()
+        child.logfile_read = out
+        try:
+            for line in input_lines:
+                child.sendline(line)
+            job = te.wait_child(
+                child=child,
+                command=self.executable,
+                tool='CTF',
+                settings=settings,
+                stop_check=stop_check
+                )
+        except Exception:
+            child.close(force=True)
+            raise
+        finally:
+            child.logfile_read = None
+
+        if job['timed_out']:
+            err.write('{0} killed after {1:.0f} sec\n'.format(
+                self.executable,
+                job['stop_time'] - job['start_time']
+                ))
+        elif job['stopped']:
+            err.write('{0} killed by the user\n'.format(self.executable))
+        elif child.exitstatus:
+            err.write('{0} exited with status {1}\n'.format(
+                self.executable,
+                child.exitstatus
+                ))
+        elif child.signalstatus:
+            err.write('{0} killed by signal {1}\n'.format(
+                self.executable,
+                child.signalstatus
+                ))
+        else:
+            pass
+        return job
+
+    def close(self):
+        """
+        Terminate all waiting sessions.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.closed = True
+            for child in self.sessions:
+                child.close(force=True)
+            self.sessions = []
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
@@ -0,0 +1,348 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import time as ti
+import subprocess as sp
+try:
+    from PyQt4.QtCore import QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QMutex, QWaitCondition
+
+
+class GpuScheduler(object):
+    """
+    Hand out GPU device slots to the Motion and CTF threads.
+
+    Every device provides a number of slots.
+    A thread leases a slot before it starts a GPU program and releases it
+    afterwards, so programs are spread over all devices instead of using
+    the static device ids of the settings.
+    With detected devices, only programs on the default device 0 are
+    spread; a program set to other device ids keeps them and leases them.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, devices, slots_per_device=1, detected=False):
+        """
+        Initialize object variables.
+
+        Arguments:
+        devices - List of device ids
+        slots_per_device - Number of programs allowed on one device
+        detected - True, if the devices are detected and not set by the user
+
+        Return:
+        None
+        """
+        super(GpuScheduler, self).__init__()
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.closed = False
+        self.detected = detected
+        self.start_time = ti.time()
+        self.slots = []
+        for device in devices:
+            for idx in range(max(int(slots_per_device), 1)):
+                self.slots.append({
+                    'device': str(device),
+                    'slot': idx,
+                    'owner': None,
+                    'lease_time': None,
+                    'busy_time': 0.0,
+                    'count': 0,
+                    })
+
+    @staticmethod
+    def detect_devices(executable='nvidia-smi'):
+        """
+        Find the available GPU devices.
+
+        Arguments:
+        executable - Program to query the devices
+
+        Return:
+        List of device ids, empty if nothing is found
+        """
+        try:
+            output = sp.check_output(
+                [executable, '--query-gpu=index', '--format=csv,noheader'],
+                stderr=sp.DEVNULL,
+                timeout=30
+                )
+        except (OSError, sp.CalledProcessError, sp.TimeoutExpired):
+            return []
+        else:
+            return [
+                line.strip()
+                for line in output.decode('utf-8', 'replace').splitlines()
+                if line.strip()
+                ]
+
+    def lease(self, owner):
+        """
+        Wait for a free slot and take it.
+        The device with the least running programs is preferred.
+
+        Arguments:
+        owner - Name of the leasing thread
+
+        Return:
+        Leased slot, None if the scheduler is closed
+        """
+        self.lock.lock()
+        try:
+            while not self.closed:
+                busy_dict = {}
+                for slot in self.slots:
+                    busy_dict.setdefault(slot['device'], 0)
+                    if slot['owner'] is not None:
+                        busy_dict[slot['device']] += 1
+                    else:
+                        pass
+                free_slots = [
+                    slot for slot in self.slots if slot['owner'] is None
+                    ]
+                if free_slots:
+                    slot = min(
+                        free_slots,
+                        key=lambda x: (busy_dict[x['device']], x['busy_time'])
+                        )
+                    slot['owner'] = owner
+                    slot['lease_time'] = ti.time()
+                    slot['count'] += 1
+                    return slot
+                else:
+                    self.condition.wait(self.lock, 1000)
+            return None
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def lease_devices(self, owner, devices):
+        """
+        Wait until every device has a free slot and take one slot of each.
+        Used for programs that are configured to run on several devices.
+
+        Arguments:
+        owner - Name of the leasing thread
+        devices - List of device ids
+
+        Return:
+        List of leased slots, None if the scheduler is closed
+        """
+        devices = [str(device) for device in devices]
+        known_devices = set(slot['device'] for slot in self.slots)
+        unknown_devices = [
+            device for device in devices if device not in known_devices
+            ]
+        if unknown_devices:
+            raise ValueError(
+                'GPU devices {0} are not part of the GPU devices setting: {1}!'.format(
+                    ' '.join(unknown_devices),
+                    ' '.join(sorted(known_devices))
+                    )
+                )
+        else:
+            pass
+
+        self.lock.lock()
+        try:
+            while not self.closed:
+                chosen = []
+                for device in devices:
+                    free_slots = [
+                        slot for slot in self.slots
+                        if slot['device'] == device and
+                        slot['owner'] is None and
+                        slot not in chosen
+                        ]
+                    if free_slots:
+                        chosen.append(
+                            min(free_slots, key=lambda x: x['busy_time'])
+                            )
+                    else:
+                        break
+                if len(chosen) == len(devices):
+                    now = ti.time()
+                    for slot in chosen:
+                        slot['owner'] = owner
+                        slot['lease_time'] = now
+                        slot['count'] += 1
+                    return chosen
+                else:
+                    self.condition.wait(self.lock, 1000)
+            return None
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def release(self, slot):
+        """
+        Give a leased slot back.
+
+        Arguments:
+        slot - Slot returned by lease
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            slot['busy_time'] += ti.time() - slot['lease_time']
+            slot['owner'] = None
+            slot['lease_time'] = None
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def close(self):
+        """
+        Stop handing out slots and wake up all waiting threads.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.closed = True
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get_usage(self):
+        """
+        Usage of every slot since the scheduler started.
+
+        Arguments:
+        None
+
+        Return:
+        List of [device, slot, programs, busy time in sec, utilization in %]
+        """
+        self.lock.lock()
+        try:
+            now = ti.time()
+            wall_time = max(now - self.start_time, 1e-6)
+            usage = []
+            for slot in self.slots:
+                busy_time = slot['busy_time']
+                if slot['lease_time'] is not None:
+                    busy_time += now - slot['lease_time']
+                else:
+                    pass
+                usage.append([
+                    slot['device'],
+                    slot['slot'],
+                    slot['count'],
+                    busy_time,
+                    100 * busy_time / wall_time
+                    ])
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return usage
+
+    def keeps_devices(self, devices):
+        """
+        Check, if a program keeps its configured device ids.
+
+        Arguments:
+        devices - Device ids of the program, see get_devices
+
+        Return:
+        True, if the devices are leased as they are instead of injected
+        """
+        if len(devices) > 1:
+            return True
+        elif self.detected and devices and devices != ['0']:
+            # The user picked a device, the detection does not override it
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def get_devices(command, flag):
+        """
+        Device ids of a command line flag.
+
+        Arguments:
+        command - Command as string
+        flag - Flag that takes the device ids, e.g. -Gpu
+
+        Return:
+        List of device ids, empty if the flag is not used
+        """
+        command_list = command.split()
+        try:
+            idx = command_list.index(flag)
+        except ValueError:
+            return []
+        devices = []
+        for entry in command_list[idx+1:]:
+            if entry.isdigit():
+                devices.append(entry)
+            else:
+                break
+        return devices
+
+    @staticmethod
+    def inject_device(command, flag, device):
+        """
+        Replace the device id of a command line flag.
+        Commands with several device ids are not changed silently,
+        use lease_devices for them.
+
+        Arguments:
+        command - Command as string
+        flag - Flag that takes the device ids, e.g. -Gpu
+        device - Device id to use
+
+        Return:
+        New command as string
+        """
+        command_list = command.split()
+        try:
+            idx = command_list.index(flag)
+        except ValueError:
+            command_list.extend([flag, str(device)])
+        else:
+            end = idx + 1
+            while end < len(command_list) and command_list[end].isdigit():
+                end += 1
+            if end - idx - 1 > 1:
+                raise ValueError(
+                    'Cannot replace the GPU devices {0} of {1} with one device!'.format(
+                        ' '.join(command_list[idx+1:end]),
+                        flag
+                        )
+                    )
+            else:
+                pass
+            command_list[idx+1:end] = [str(device)]
+        return ' '.join(command_list)
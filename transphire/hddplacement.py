@@ -0,0 +1,306 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import glob
+import time as ti
+import shutil as sh
+import collections as co
+try:
+    from PyQt4.QtCore import QMutex
+except ImportError:
+    from PyQt5.QtCore import QMutex
+
+
+class HddPlacement(object):
+    """
+    Decide on which HDD a file is written.
+
+    The free space of every disk is cached and reduced by the bytes written,
+    so the disks are only asked again after the refresh interval.
+    New files go to the disk with the least running copies, so several
+    copy threads write to different disks in parallel.
+    Optionally, all files of one micrograph stay on the same disk.
+    Files that are copied again, like the combined files, always go to the
+    disk of their first copy, so only the appended part needs to be written
+    and reserved.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(
+            self, hdd_folder, keep_together=True, refresh_interval=300,
+            max_groups=1000
+            ):
+        """
+        Initialize object variables.
+
+        Arguments:
+        hdd_folder - Folder containing the mounted HDDs
+        keep_together - Put all files of a micrograph on the same disk
+        refresh_interval - Time in seconds until the free space is read again
+        max_groups - Number of micrographs whose disk is remembered
+
+        Return:
+        None
+        """
+        super(HddPlacement, self).__init__()
+        self.hdd_folder = hdd_folder
+        self.keep_together = keep_together
+        self.refresh_interval = refresh_interval
+        self.lock = QMutex()
+        self.max_groups = max_groups
+        self.disk_dict = {}
+        self.group_dict = co.OrderedDict()
+        self.pin_dict = {}
+
+    def _refresh(self):
+        """
+        Read the free space of disks that are new or not checked recently.
+        Needs to be called with the lock held.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        now = ti.time()
+        for folder in glob.glob('{0}/*'.format(self.hdd_folder)):
+            disk = self.disk_dict.get(folder)
+            if disk is None:
+                disk = {
+                    'free': 0,
+                    'planned': 0,
+                    'writers': 0,
+                    'checked': 0,
+                    'lock': QMutex(),
+                    }
+                self.disk_dict[folder] = disk
+            else:
+                pass
+
+            if now - disk['checked'] > self.refresh_interval:
+                try:
+                    disk['free'] = sh.disk_usage(folder).free
+                except OSError:
+                    disk['free'] = 0
+                disk['checked'] = now
+            else:
+                pass
+
+    def get_written_size(self, pin, size):
+        """
+        Number of bytes written by the next copy of a pinned file.
+
+        Arguments:
+        pin - Name of a file that is copied again
+        size - Current file size in bytes
+
+        Return:
+        Size in bytes that is not on the disk yet
+        """
+        self.lock.lock()
+        try:
+            entry = self.pin_dict.get(pin)
+            if entry is None:
+                written_size = size
+            elif size < entry['size']:
+                # The file is smaller now, so it is written anew
+                entry['size'] = 0
+                written_size = size
+            else:
+                written_size = size - entry['size']
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return written_size
+
+    def place(self, size, group=None, pin=None):
+        """
+        Choose a disk for a new file and reserve the space.
+
+        Arguments:
+        size - Bytes to write, see get_written_size for pinned files
+        group - Name of the micrograph the file belongs to
+        pin - Name of a file that is copied again and stays on its first disk
+
+        Return:
+        HDD folder, None if no disk has enough space
+        """
+        self.lock.lock()
+        try:
+            self._refresh()
+
+            def available(folder):
+                disk = self.disk_dict[folder]
+                return disk['free'] - disk['planned']
+
+            folder = None
+            if pin is not None and pin in self.pin_dict:
+                # The file exists on this disk, only the new part is written
+                folder = self.pin_dict[pin]['folder']
+            elif self.keep_together and group is not None:
+                folder = self.group_dict.get(group)
+                if folder is not None and available(folder) < size:
+                    folder = None
+                else:
+                    pass
+            else:
+                pass
+
+            if folder is None:
+                candidates = [
+                    entry for entry in sorted(self.disk_dict)
+                    if available(entry) >= size
+                    ]
+                if candidates:
+                    folder = min(
+                        candidates,
+                        key=lambda x: (
+                            self.disk_dict[x]['writers'],
+                            -available(x)
+                            )
+                        )
+                else:
+                    return None
+            else:
+                pass
+
+            self.disk_dict[folder]['planned'] += size
+            self.disk_dict[folder]['writers'] += 1
+            if pin is not None:
+                self.pin_dict.setdefault(pin, {'folder': folder, 'size': 0})
+            elif self.keep_together and group is not None:
+                # Only the recent micrographs are still copied
+                self.group_dict[group] = folder
+                self.group_dict.move_to_end(group)
+                while len(self.group_dict) > self.max_groups:
+                    self.group_dict.popitem(last=False)
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return folder
+
+    def release(self, folder, size, written, pin=None):
+        """
+        Give back the reserved space of a file.
+
+        Arguments:
+        folder - HDD folder returned by place
+        size - Bytes passed to place
+        written - True, if the file has been written to the disk
+        pin - Name of the pinned file, if any
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            disk = self.disk_dict[folder]
+            disk['planned'] -= size
+            disk['writers'] -= 1
+            if written:
+                disk['free'] -= size
+                if pin is not None:
+                    self.pin_dict[pin]['size'] += size
+                else:
+                    pass
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def lock_disk(self, folder):
+        """
+        Lock a disk for writing, so one disk is written by one copy at a time.
+
+        Arguments:
+        folder - HDD folder
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            disk_lock = self.disk_dict[folder]['lock']
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        disk_lock.lock()
+
+    def unlock_disk(self, folder):
+        """
+        Unlock a disk after writing.
+
+        Arguments:
+        folder - HDD folder
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            disk_lock = self.disk_dict[folder]['lock']
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        disk_lock.unlock()
+
+    @staticmethod
+    def get_group(file_name, prefix=''):
+        """
+        Name of the micrograph a file belongs to.
+
+        Arguments:
+        file_name - File path
+        prefix - Rename prefix of the micrographs
+
+        Return:
+        Group name
+        """
+        base_name = os.path.basename(file_name)
+        if prefix and base_name.startswith(prefix):
+            digits = base_name[len(prefix):]
+            number = ''
+            for char in digits:
+                if char.isdigit():
+                    number += char
+                else:
+                    break
+            if number:
+                return '{0}{1}'.format(prefix, number)
+            else:
+                pass
+        else:
+            pass
+        group = base_name.split('.')[0]
+        for suffix in ('_DW', '_Stk', '_gctf', '_frames'):
+            if group.endswith(suffix):
+                group = group[:-len(suffix)]
+            else:
+                pass
+        return group
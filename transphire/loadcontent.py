@@ -88,20 +88,21 @@ class LoadContent(QWidget):
         self.idx_type = 4
 
         # Fill content based on typ
-        content_function = tu.get_function_dict()[typ]['content']
+        items = tu.get_content_items(
+            typ=typ,
+            settings_folder=settings_folder,
+            hdd=hdd
+            )
         if typ == 'Mount':
             button = QPushButton('Delete', self)
             button.clicked.connect(self._button_clicked)
             self.layout.addWidget(button)
-            items = content_function(hdd=hdd)
             if hdd is None:
                 pass
             else:
                 self.setEnabled(False)
-        elif typ == 'Copy':
-            items = content_function(settings_folder=settings_folder)
         else:
-            items = content_function()
+            pass
 
         # Fill widget with content items
         self._fill_default(items)
@@ -17,6 +17,7 @@
 """
 import os
 import json
+import pickle
 try:
     from PyQt4.QtGui import QDialog, QVBoxLayout, QPushButton, QTabWidget
 except ImportError:
@@ -25,6 +26,7 @@ except ImportError:
 from transphire.loadcontentcontainer import LoadContentContainer
 from transphire.separator import Separator
 from transphire import transphire_utils as tu
+import transphire
 
 
 class DefaultSettings(QDialog):
@@ -231,6 +233,25 @@ class DefaultSettings(QDialog):
         """
         # Initialise default settings
         setting_names = sorted(tu.get_function_dict().keys())
+
+        # Without the dialog the content only depends on the settings files
+        cache_file = os.path.join(settings_folder, '.content_cache.pickle')
+        cache_key = DefaultSettings.get_content_cache_key(
+            setting_names=setting_names,
+            settings_folder=settings_folder
+            )
+        if not edit_settings:
+            content = DefaultSettings.load_content_cache(
+                cache_file=cache_file,
+                cache_key=cache_key
+                )
+            if content is not None:
+                return content, None
+            else:
+                pass
+        else:
+            pass
+
         default_widget = DefaultSettings(apply=apply)
 
         # Initialise a new LoadContentContainer and add it as a new tab
@@ -274,15 +295,100 @@ class DefaultSettings(QDialog):
             else:
                 with open(default_file, 'r') as file_r:
                     data = json.load(file_r)
-                    for entry in data:
-                        for dictionary in entry:
-                            for name_content in content[name]:
-                                for default_value in name_content:
-                                    if default_value.keys() == dictionary.keys():
-                                        for key in default_value:
-                                            default = dictionary[key][0]
-                                            default_value[key][0] = default
-                                        break
-                                    else:
-                                        pass
+                tu.apply_content_defaults(content=content[name], data=data)
+
+        # The dialog might have changed the settings files
+        DefaultSettings.save_content_cache(
+            cache_file=cache_file,
+            cache_key=DefaultSettings.get_content_cache_key(
+                setting_names=setting_names,
+                settings_folder=settings_folder
+                ),
+            content=content
+            )
         return content, apply
+
+    @staticmethod
+    def get_content_cache_key(setting_names, settings_folder):
+        """
+        Key of the cached content.
+        Changes, if a settings file or a module of the package changes,
+        as every module can feed the default content.
+
+        Arguments:
+        setting_names - Names of the settings
+        settings_folder - Folder to store the default settings
+
+        Return:
+        Key list
+        """
+        key = [transphire.__version__]
+        package_folder = os.path.dirname(os.path.abspath(transphire.__file__))
+        for name in sorted(os.listdir(package_folder)):
+            if name.endswith('.py'):
+                key.append([
+                    name,
+                    os.path.getmtime(os.path.join(package_folder, name))
+                    ])
+            else:
+                pass
+        for name in setting_names:
+            default_file = '{0}/content_{1}.txt'.format(settings_folder, name.replace(' ', '_'))
+            try:
+                stat = os.stat(default_file)
+            except FileNotFoundError:
+                key.append([name, None, None])
+            else:
+                key.append([name, stat.st_mtime, stat.st_size])
+        return key
+
+    @staticmethod
+    def load_content_cache(cache_file, cache_key):
+        """
+        Load the cached content.
+
+        Arguments:
+        cache_file - Cache file
+        cache_key - Key of the current settings files
+
+        Return:
+        Content, None if the cache is missing or outdated
+        """
+        try:
+            with open(cache_file, 'rb') as read:
+                key, content = pickle.load(read)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if key == cache_key:
+            return content
+        else:
+            return None
+
+    @staticmethod
+    def save_content_cache(cache_file, cache_key, content):
+        """
+        Save the content for the next start.
+
+        Arguments:
+        cache_file - Cache file
+        cache_key - Key of the current settings files
+        content - Content to save
+
+        Return:
+        None
+        """
+        # get_settings returns None for invalid entries
+        if None in content.values():
+            return None
+        else:
+            pass
+        temp_file = '{0}.{1}'.format(cache_file, os.getpid())
+        try:
+            with open(temp_file, 'wb') as write:
+                pickle.dump([cache_key, content], write)
+            os.rename(temp_file, cache_file)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
@@ -17,7 +17,6 @@
 """
 import sys
 import os
-import re
 try:
     QT_VERSION = 4
     from PyQt4.QtGui import (
@@ -28,7 +27,7 @@ try:
         QFileDialog,
         QInputDialog,
         )
-    from PyQt4.QtCore import QThread, pyqtSlot, QCoreApplication, QTimer
+    from PyQt4.QtCore import QThread, pyqtSlot, QCoreApplication, QTimer, Qt
 except ImportError:
     QT_VERSION = 5
     from PyQt5.QtWidgets import (
@@ -39,7 +38,7 @@ except ImportError:
         QFileDialog,
         QInputDialog,
         )
-    from PyQt5.QtCore import QThread, pyqtSlot, QCoreApplication, QTimer
+    from PyQt5.QtCore import QThread, pyqtSlot, QCoreApplication, QTimer, Qt
 
 # Objects
 from transphire.mountworker import MountWorker
@@ -49,6 +48,9 @@ from transphire.plotworker import PlotWorker
 from transphire.separator import Separator
 from transphire.tabdocker import TabDocker
 from transphire.mountcalculator import MountCalculator
+from transphire.quotatracker import QuotaTracker
+from transphire.capacitymonitor import CapacityMonitor
+from transphire.plotrenderer import PlotRenderer
 from transphire import transphire_utils as tu
 from transphire import transphire_import as ti
 
@@ -151,6 +153,17 @@ class MainWindow(QMainWindow):
         self.mount_directory = mount_directory
         self.temp_save = '{0}/temp_save'.format(settings_folder)
 
+        # Used space of mount points without quota command
+        self.quota_tracker = QuotaTracker()
+
+        # Disk usage of the project and scratch folder for all workers
+        self.capacity_monitor = CapacityMonitor()
+        self.capacity_monitor.start()
+
+        # Plot images are written in the background
+        self.plot_renderer = PlotRenderer()
+        self.plot_renderer.start()
+
         # Threads
         self.mount_worker = None
         self.process_worker = None
@@ -180,6 +193,8 @@ class MainWindow(QMainWindow):
         """
         # Stop threads if already started.
         if self.mount_worker is not None:
+            self.mount_worker.mount_monitor.stop_monitor()
+            self.mount_worker.remove_capacity_folders()
             self.mount_worker.setParent(None)
         if self.process_worker is not None:
             self.process_worker.setParent(None)
@@ -205,17 +220,22 @@ class MainWindow(QMainWindow):
                     calculator.kill_thread = True
                     thread.quit()
                     thread.wait()
+                    calculator.close_channels()
 
         # Create objects used in threads
         self.mount_worker = MountWorker(
             password=self.password,
             settings_folder=self.settings_folder,
-            mount_directory=self.mount_directory
+            mount_directory=self.mount_directory,
+            quota_tracker=self.quota_tracker,
+            capacity_monitor=self.capacity_monitor
             )
         self.process_worker = ProcessWorker(
             password=self.password,
             content_process=content_pipeline,
-            mount_directory=self.mount_directory
+            mount_directory=self.mount_directory,
+            quota_tracker=self.quota_tracker,
+            capacity_monitor=self.capacity_monitor
             )
         self.plot_worker = PlotWorker()
 
@@ -317,6 +337,15 @@ class MainWindow(QMainWindow):
             tu.message(entry)
 
         self.process_worker.sig_finished.connect(self._finished)
+        # Count the requests first, so the plot worker can skip outdated ones
+        self.process_worker.sig_plot_ctf.connect(
+            self.plot_worker.mark_pending,
+            Qt.DirectConnection
+            )
+        self.process_worker.sig_plot_motion.connect(
+            self.plot_worker.mark_pending,
+            Qt.DirectConnection
+            )
         self.process_worker.sig_plot_ctf.connect(self.plot_worker.calculate_array_ctf)
         self.process_worker.sig_plot_motion.connect(self.plot_worker.calculate_array_motion)
         self.plot_worker.sig_message.connect(lambda msg: tu.message(msg))
@@ -325,7 +354,10 @@ class MainWindow(QMainWindow):
         for key in self.content['Mount'].content:
             thread = QThread(self)
             thread.start()
-            mount_calculator = MountCalculator(name=key)
+            mount_calculator = MountCalculator(
+                name=key,
+                quota_tracker=self.quota_tracker
+                )
             mount_calculator.moveToThread(thread)
             self.mount_thread_list[key] = {
                 'thread': thread,
@@ -457,6 +489,7 @@ class MainWindow(QMainWindow):
                 mount_worker=self.mount_worker,
                 process_worker=self.process_worker,
                 plot_worker=self.plot_worker,
+                plot_renderer=self.plot_renderer,
                 settings_folder=self.settings_folder,
                 plot_labels=plot_labels,
                 plot_name=plot_name,
@@ -556,18 +589,7 @@ class MainWindow(QMainWindow):
         else:
             file_name = '{0}.txt'.format(file_name)
 
-
-        settings = []
-        with open(file_name, 'r') as read:
-            for line in read:
-                line = line.replace('\n', '')
-                key, *value = line.split('\t')
-                if isinstance(value, list):
-                    settings.append([key, *value])
-                else:
-                    settings.append([key, value])
-
-        settings = self.settings_to_dict(settings=settings)
+        settings = tu.read_settings_file(file_name=file_name)
         self.set_settings(settings=settings)
 
     def set_settings(self, settings):
@@ -590,52 +612,6 @@ class MainWindow(QMainWindow):
                     print('Key', key, 'no longer exists')
                     continue
 
-    @staticmethod
-    def settings_to_dict(settings):
-        """
-        Make the settings readable for the widgets set settings method.
-
-        Arguments:
-        settings - Settings as dictionary.
-
-        Return:
-        None
-        """
-        settings_dict = {}
-        idx = -1
-        while idx < len(settings)-1:
-            idx += 1
-            if settings[idx][0] == '###':
-                key = settings[idx][1]
-                if key == 'Frames':
-                    settings_dict[key] = []
-                else:
-                    settings_dict[key] = {}
-                continue
-
-            if len(settings[idx]) == 1:
-                settings[idx].append('')
-
-            if key == 'Frames':
-                setting = {}
-                setting[settings[idx][0]] = settings[idx][1]
-                for i in range(3):
-                    idx += 1
-                    setting[settings[idx][0]] = settings[idx][1]
-                settings_dict[key].append(setting)
-            else:
-                if key == 'Notification':
-                    settings_dict[key].update({settings[idx][0]: [
-                        settings[idx][1],
-                        settings[idx][2]
-                        ]})
-                else:
-                    settings_dict[key].update({
-                        settings[idx][0]: settings[idx][1]
-                        })
-
-        return settings_dict
-
     def save(self, file_name=None, temp=False):
         """
         Save GUI status to file.
@@ -739,62 +715,22 @@ class MainWindow(QMainWindow):
         None
         """
         self.enable(False)
-        settings = {}
         # Load settings to pass them to the working threads
-        error_list = []
-        skip_list = [
-            'Mount',
-            'Notification',
-            'Path',
-            'Frames'
-            ]
+        content_settings = {}
         for key in self.content:
             try:
                 settings_widget = self.content[key].get_settings()
             except AttributeError:
                 continue
-            else:
-                settings[key] = {}
-
             if settings_widget is None:
                 self.enable(True)
                 return None
-            elif key == 'Frames':
-                settings_motion = {}
-            else:
-                pass
-
-            if key == 'Frames':
-                skip_name_list = []
             else:
-                skip_name_list = tu.get_function_dict()[key]['allow_empty']
-
-            for entry in settings_widget:
-                if key not in skip_list:
-                    for name in entry:
-                        if not entry[name] and name not in skip_name_list:
-                            error_list.append(
-                                '{0}:{1} is not allowed to be emtpy!'.format(
-                                    key,
-                                    name
-                                    )
-                                )
-                        else:
-                            pass
-                else:
-                    pass
-
-            for idx, entry in enumerate(settings_widget):
-                if key == 'Frames':
-                    settings_motion[idx] = entry
-                else:
-                    settings[key].update(entry)
-
-            if key == 'Frames':
-                settings['motion_frames'] = settings_motion
-            else:
-                pass
+                content_settings[key] = settings_widget
 
+        settings, error_list = tu.get_settings_from_content(
+            content_settings=content_settings
+            )
         if error_list:
             tu.message('\n'.join(error_list))
             self.enable(True)
@@ -802,72 +738,20 @@ class MainWindow(QMainWindow):
         else:
             pass
 
-        # Get mount information
-        for key in settings['Mount']:
-            device_name = key.replace(' ', '_')
-            save_file = os.path.join(self.settings_folder, device_name)
-            try:
-                with open(save_file, 'r') as read:
-                    lines = read.readlines()
-            except FileNotFoundError:
-                continue
-            for line in lines:
-                name = line.split('\t')[0]
-                settings['user_{0}'.format(device_name)] = name
-        settings['user_Later'] = None
-
-        if not re.match(
-                self.project_name_pattern,
-                settings['General']['Project name']
-                ):
+        error = tu.set_project_settings(
+            settings=settings,
+            settings_folder=self.settings_folder,
+            mount_directory=self.mount_directory,
+            project_name_pattern=self.project_name_pattern,
+            project_name_pattern_example=self.project_name_pattern_example
+            )
+        if error is not None:
             self.enable(True)
-            tu.message(
-                'Project name needs to match pattern:\n{0}\n For example: {1}'.format(
-                    self.project_name_pattern,
-                    self.project_name_pattern_example
-                    )
-                )
+            tu.message(error)
             return None
         else:
             pass
 
-        # Project folder names
-        settings['project_folder'] = os.path.join(
-            settings['General']['Project directory'],
-            settings['General']['Project name']
-            )
-        settings['compress_folder'] = os.path.join(
-            settings['General']['Project directory'],
-            settings['General']['Project name']
-            )
-        settings['motion_folder'] = os.path.join(
-            settings['General']['Project directory'],
-            settings['General']['Project name']
-            )
-        settings['ctf_folder'] = os.path.join(
-            settings['General']['Project directory'],
-            settings['General']['Project name']
-            )
-        settings['scratch_folder'] = os.path.join(
-            settings['General']['Scratch directory'],
-            settings['General']['Project name']
-            )
-        settings['Copy_hdd_folder'] = self.mount_directory
-        settings['Copy_backup_folder'] = self.mount_directory
-        settings['Copy_work_folder'] = self.mount_directory
-        settings['settings_folder'] = os.path.join(
-            settings['project_folder'],
-            'settings'
-            )
-        settings['queue_folder'] = os.path.join(
-            settings['project_folder'],
-            'queue'
-            )
-        settings['error_folder'] = os.path.join(
-            settings['project_folder'],
-            'error'
-            )
-
         # Check for continue mode
         if os.path.exists(settings['project_folder']):
             result = self.continue_dialog(
@@ -888,16 +772,13 @@ class MainWindow(QMainWindow):
             result = True
 
         # Create project and settings folder
-        for name in [
-                'project_folder', 'settings_folder',
-                'scratch_folder', 'queue_folder', 'error_folder'
-                ]:
-            try:
-                tu.mkdir_p(settings[name])
-            except FileNotFoundError:
-                tu.message('Project name cannot be empty')
-                self.enable(True)
-                return None
+        error = tu.create_project_folders(settings=settings)
+        if error is not None:
+            tu.message(error)
+            self.enable(True)
+            return None
+        else:
+            pass
 
         # Start or stop procedure
         if result:
@@ -979,6 +860,7 @@ class MainWindow(QMainWindow):
         self.enable(True)
         self.content['Button'].start_button.setText('Start')
         self.content['Button'].start_button.setEnabled(True)
+        self.plot_renderer.flush()
 
     @pyqtSlot(bool)
     def enable(self, var, use_all=False):
@@ -1025,6 +907,9 @@ class MainWindow(QMainWindow):
         else:
             pass
 
+        self.capacity_monitor.stop_monitor()
+        self.mount_worker.mount_monitor.stop_monitor()
+        self.plot_renderer.stop_renderer()
         self.thread_mount.quit()
         self.thread_mount.wait()
         self.thread_process.quit()
@@ -1037,6 +922,7 @@ class MainWindow(QMainWindow):
             calculator.kill_thread = True
             thread.quit()
             thread.wait()
+            calculator.close_channels()
         message = 'Bye Bye'
         print(message)
         super(MainWindow, self).closeEvent(event)
@@ -0,0 +1,149 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+try:
+    from PyQt4.QtGui import (
+        QVBoxLayout, QWidget, QLabel, QTableWidget, QTableWidgetItem,
+        QColor, QAbstractItemView
+        )
+    from PyQt4.QtCore import pyqtSlot
+except ImportError:
+    from PyQt5.QtWidgets import (
+        QVBoxLayout, QWidget, QLabel, QTableWidget, QTableWidgetItem,
+        QAbstractItemView
+        )
+    from PyQt5.QtGui import QColor
+    from PyQt5.QtCore import pyqtSlot
+
+
+class MetricsContainer(QWidget):
+    """
+    Throughput of the pipeline stages.
+    The stage that needs the longest to work off its queue is marked as
+    bottleneck, so the number of threads in the Pipeline can be adjusted.
+
+    Inherits:
+    QWidget
+
+    Signals:
+    None
+    """
+    header = [
+        'Stage',
+        'Threads',
+        'Queue',
+        'Items/h',
+        'Wait p50',
+        'Wait p95',
+        'Service p50',
+        'Service p95',
+        'Queue growth/h',
+        'Time to drain',
+        ]
+
+    def __init__(self, process_worker, parent=None, **kwargs):
+        """
+        Layout for the metrics container.
+
+        Arguments:
+        process_worker - ProcessWorker object
+        parent - Parent widget (default None)
+
+        Returns:
+        None
+        """
+        super(MetricsContainer, self).__init__(parent)
+
+        layout_v = QVBoxLayout(self)
+        self.bottleneck = QLabel('Bottleneck: --', self)
+        self.bottleneck.setStyleSheet('color: purple')
+        layout_v.addWidget(self.bottleneck)
+
+        self.table = QTableWidget(0, len(self.header), self)
+        self.table.setHorizontalHeaderLabels(self.header)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout_v.addWidget(self.table, stretch=1)
+
+        process_worker.sig_metrics.connect(self.update_metrics)
+
+    @staticmethod
+    def format_seconds(value):
+        """
+        Time text for the table.
+
+        Arguments:
+        value - Time in seconds or None
+
+        Returns:
+        Text
+        """
+        if value is None:
+            return '--'
+        elif value < 120:
+            return '{0:.1f}s'.format(value)
+        elif value < 7200:
+            return '{0:.1f}min'.format(value / 60)
+        else:
+            return '{0:.1f}h'.format(value / 3600)
+
+    @pyqtSlot(object)
+    def update_metrics(self, metrics):
+        """
+        Show the metrics sent by the process worker.
+
+        Arguments:
+        metrics - Dictionary with the stages and the bottleneck
+
+        Returns:
+        None
+        """
+        bottleneck = metrics['bottleneck']
+        if bottleneck is None:
+            self.bottleneck.setText('Bottleneck: --')
+            self.bottleneck.setStyleSheet('color: purple')
+        else:
+            self.bottleneck.setText('Bottleneck: {0}'.format(bottleneck))
+            self.bottleneck.setStyleSheet('color: red')
+
+        stages = sorted(metrics['stages'].items())
+        self.table.setRowCount(len(stages))
+        for row, (stage, values) in enumerate(stages):
+            if values['drain_hours'] is None:
+                drain = 'growing' if values['queue_size'] else '--'
+            else:
+                drain = self.format_seconds(values['drain_hours'] * 3600)
+            text_list = [
+                stage,
+                '{0}'.format(values['threads']),
+                '{0}'.format(values['queue_size']),
+                '{0:.0f}'.format(values['items_per_hour']),
+                self.format_seconds(values['wait_p50']),
+                self.format_seconds(values['wait_p95']),
+                self.format_seconds(values['service_p50']),
+                self.format_seconds(values['service_p95']),
+                '{0:+.0f}'.format(values['growth_per_hour']),
+                drain,
+                ]
+            for column, text in enumerate(text_list):
+                item = QTableWidgetItem(text)
+                if stage == bottleneck:
+                    item.setForeground(QColor('red'))
+                else:
+                    pass
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
@@ -16,12 +16,13 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import shutil
-import os
 import pexpect as pe
 try:
     from PyQt4.QtCore import QObject, pyqtSlot, pyqtSignal
 except ImportError:
     from PyQt5.QtCore import QObject, pyqtSlot, pyqtSignal
+from transphire import quotatracker as qt
+from transphire.sshchannel import SshChannel
 
 
 class MountCalculator(QObject):
@@ -39,12 +40,13 @@ class MountCalculator(QObject):
     """
     sig_finished = pyqtSignal(str, str, str)
 
-    def __init__(self, name, parent=None):
+    def __init__(self, name, quota_tracker=None, parent=None):
         """
         Initialize object variables.
 
         Arguments:
         name - Name of the mount point
+        quota_tracker - QuotaTracker to avoid scanning the mount point every time
         parent - Parent widget (default None)
 
         Return:
@@ -52,9 +54,11 @@ class MountCalculator(QObject):
         """
         super(MountCalculator, self).__init__(parent)
         self.name = name
+        self.quota_tracker = quota_tracker
         self.ssh_dict = None
         self.quota_command_dict = None
         self.password_dict = None
+        self.channel_dict = {}
         self.kill_thread = False
         self.running = False
 
@@ -166,6 +170,8 @@ class MountCalculator(QObject):
     def calculate_get_quota(self, key, quota, mount_folder):
         """
         Calculate the quota by calculating the size of every file.
+        With a quota tracker, the files are only scanned for the first time
+        and after the reconcile interval.
 
         Arguments:
         key - Mount point key
@@ -183,7 +189,24 @@ class MountCalculator(QObject):
         self.running = True
         total_quota = float(quota)
         try:
-            used_quota = self.get_folder_size(mount_folder, 0) / 1024 ** 4
+            if self.quota_tracker is None:
+                used_size = qt.get_folder_size(
+                    mount_folder,
+                    stop_check=lambda: self.kill_thread
+                    )
+            elif self.quota_tracker.needs_scan(mount_folder):
+                token = self.quota_tracker.begin_scan(mount_folder)
+                used_size = qt.get_folder_size(
+                    mount_folder,
+                    stop_check=lambda: self.kill_thread
+                    )
+                if not self.kill_thread:
+                    self.quota_tracker.seed(mount_folder, used_size, token)
+                else:
+                    pass
+            else:
+                used_size = self.quota_tracker.get_used(mount_folder)
+            used_quota = used_size / 1024 ** 4
         except PermissionError:
             self.sig_finished.emit(
                 'DENIED',
@@ -224,53 +247,70 @@ class MountCalculator(QObject):
         Return:
         None
         """
-        command = 'ssh {0}@{1} {2}'.format(
-            user,
-            self.ssh_dict[device],
-            self.quota_command_dict[device]
-            )
-        child = pe.spawnu(command)
-
+        channel = self.get_channel(user=user, device=device)
         try:
-            idx = child.expect(
-                [
-                    "{0}@{1}'s password:".format(user, self.ssh_dict[device]),
-                    'RSA.*'
-                    ],
-                timeout=4
-                )
-        except pe.exceptions.TIMEOUT:
-            print('SSH quota command failed!')
+            text = channel.run(self.quota_command_dict[device])
+        except pe.exceptions.TIMEOUT as err:
+            print('SSH quota command failed!', err)
             raise
 
-        if idx == 0:
-            child.sendline(self.password_dict[device])
-        elif idx == 1:
-            child.sendline('yes')
-            child.expect([
-                "{0}@{1}'s password:".format(user, self.ssh_dict[device]),
-                'RSA.*'
-                ])
-            child.sendline(self.password_dict[device])
-        else:
-            print('SSH quota command failed!')
-            raise pe.exceptions.TIMEOUT
-
-        child.expect(pe.EOF)
         if self.quota_command_dict[device].startswith('quota'):
             used_quota, total_quota = self.get_quota_quota_command(
-                text=child.before.split('\n'),
+                text=text.split('\n'),
                 folder=folder
                 )
         else:
             print('To get the quota via SSH failed, do not know how to handle {0}'.format(
                 self.quota_command_dict[device]
                 ))
-            print('Command:\n{0}'.format(child.before))
+            print('Command:\n{0}'.format(text))
             print('Please write a wrapper for this case or write the content to the author of TranSPHIRE')
             raise pe.exceptions.TIMEOUT
         return used_quota, total_quota
 
+    def get_channel(self, user, device):
+        """
+        Persistent ssh connection of a device.
+
+        Arguments:
+        user - User name
+        device - Device name
+
+        Return:
+        SshChannel
+        """
+        channel = self.channel_dict.get(device)
+        if channel is None or \
+                channel.user != user or \
+                channel.host != self.ssh_dict[device]:
+            if channel is not None:
+                channel.close()
+            else:
+                pass
+            channel = SshChannel(
+                user=user,
+                host=self.ssh_dict[device],
+                password=self.password_dict[device]
+                )
+            self.channel_dict[device] = channel
+        else:
+            channel.password = self.password_dict[device]
+        return channel
+
+    def close_channels(self):
+        """
+        Close the persistent ssh connections.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        for channel in self.channel_dict.values():
+            channel.close()
+        self.channel_dict = {}
+
     @staticmethod
     def get_quota_quota_command(text, folder):
         """
@@ -328,24 +368,3 @@ class MountCalculator(QObject):
                 size = value
             size_list.append(float(size) / adjust)
         return size_list[0], size_list[1]
-
-    def get_folder_size(self, folder, size):
-        """
-        Get the size of the folder recursively
-
-        Arguments:
-        folder - Folder to check contents
-        size - Current caclulated size
-
-        Return:
-        Calculated size
-        """
-        for entry in os.scandir(folder):
-            if self.kill_thread:
-                return size
-            elif entry.is_dir():
-                size = self.get_folder_size(entry.path, size)
-            else:
-                size += entry.stat().st_size
-
-        return size
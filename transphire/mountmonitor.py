@@ -0,0 +1,334 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import json
+import time as ti
+import subprocess as sp
+try:
+    from PyQt4.QtCore import QThread, QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QThread, QMutex, QWaitCondition
+from transphire import transphire_mount_probe
+
+
+# Upper limits of the latency histogram bins in seconds
+LATENCY_BINS = [0.01, 0.1, 1, 10]
+
+
+def probe_folders(probe_list, timeout=10):
+    """
+    Probe several folders in parallel, each in its own process.
+    A probe that does not answer within the timeout is killed and
+    reported as hung; the caller is never blocked longer than that.
+
+    probe_list - List of [folder, mode, remove], see transphire_mount_probe
+    timeout - Time in seconds to wait for the probes
+
+    Returns:
+    List of result dictionaries with state, message and latency
+    """
+    process_list = []
+    start = ti.time()
+    for folder, mode, remove in probe_list:
+        command = [
+            sys.executable,
+            os.path.abspath(transphire_mount_probe.__file__),
+            folder,
+            '--mode',
+            mode
+            ]
+        if remove:
+            command.append('--remove')
+        else:
+            pass
+        process_list.append(sp.Popen(
+            command,
+            stdin=sp.DEVNULL,
+            stdout=sp.PIPE,
+            stderr=sp.DEVNULL
+            ))
+
+    result_list = []
+    for process in process_list:
+        try:
+            output, _ = process.communicate(
+                timeout=max(timeout - (ti.time() - start), 0.01)
+                )
+        except sp.TimeoutExpired:
+            # A process stuck in the file system might not die at once.
+            # Popen reaps it later, do not wait for it here.
+            process.kill()
+            result_list.append({
+                'state': 'hung',
+                'message': 'No answer within {0:.0f} sec'.format(timeout),
+                'latency': timeout,
+                })
+            continue
+        try:
+            result = json.loads(output.decode('utf-8'))
+        except ValueError:
+            result = {
+                'state': 'error',
+                'message': 'Probe failed with status {0}'.format(
+                    process.returncode
+                    ),
+                'latency': ti.time() - start,
+                }
+        result_list.append(result)
+    return result_list
+
+
+class MountMonitor(QThread):
+    """
+    Probe mount points on an own thread.
+
+    Readers get the last state of a folder from memory, so a hung share
+    never blocks the GUI or the processing threads.
+    The probe latencies are collected in a histogram per folder.
+
+    Inherits from:
+    QThread
+    """
+
+    def __init__(self, interval=10, timeout=10, parent=None):
+        """
+        Initialize object variables.
+
+        Arguments:
+        interval - Time in seconds between two probes
+        timeout - Time in seconds until a probe counts as hung
+        parent - Parent widget (default None)
+
+        Return:
+        None
+        """
+        super(MountMonitor, self).__init__(parent)
+        self.interval = interval
+        self.timeout = timeout
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.folder_dict = {}
+        self.running = True
+
+    def add_folder(self, folder, mode='point', remove=False):
+        """
+        Add a folder to probe.
+
+        Arguments:
+        folder - Folder to probe
+        mode - point: folder is a mount point, tree: folder is on a mount point
+        remove - Remove the folder, if it is an empty folder and not mounted
+
+        Return:
+        None
+        """
+        folder = os.path.abspath(folder)
+        self.lock.lock()
+        try:
+            if folder not in self.folder_dict:
+                self.folder_dict[folder] = {
+                    'mode': mode,
+                    'remove': remove,
+                    'state': None,
+                    'histogram': [0] * (len(LATENCY_BINS) + 1),
+                    }
+                self.condition.wakeAll()
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def remove_folder(self, folder):
+        """
+        Stop probing a folder.
+
+        Arguments:
+        folder - Folder to remove
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.folder_dict.pop(os.path.abspath(folder), None)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get_state(self, folder):
+        """
+        Last probe result of a folder.
+
+        Arguments:
+        folder - Probed folder
+
+        Return:
+        Dictionary with state, message, latency, time and histogram;
+        None, if the folder has not been probed yet.
+        """
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(os.path.abspath(folder))
+            if entry is None or entry['state'] is None:
+                state = None
+            else:
+                state = dict(entry['state'])
+                state['histogram'] = list(entry['histogram'])
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return state
+
+    def is_mounted(self, folder):
+        """
+        Check, if the last probe found the folder mounted.
+
+        Arguments:
+        folder - Probed folder
+
+        Return:
+        True, if mounted
+        """
+        state = self.get_state(folder)
+        return bool(state is not None and state['state'] == 'mounted')
+
+    def get_histograms(self):
+        """
+        Latency histograms of all folders.
+
+        Arguments:
+        None
+
+        Return:
+        List of [folder, state, histogram]
+        """
+        self.lock.lock()
+        try:
+            histograms = [
+                [
+                    folder,
+                    entry['state']['state'] if entry['state'] else None,
+                    list(entry['histogram'])
+                    ]
+                for folder, entry in sorted(self.folder_dict.items())
+                ]
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return histograms
+
+    def poll(self):
+        """
+        Probe all folders once.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            probe_list = [
+                [folder, entry['mode'], entry['remove']]
+                for folder, entry in self.folder_dict.items()
+                ]
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+        if not probe_list:
+            return None
+        else:
+            pass
+
+        result_list = probe_folders(probe_list, timeout=self.timeout)
+
+        self.lock.lock()
+        try:
+            for (folder, _, _), result in zip(probe_list, result_list):
+                entry = self.folder_dict.get(folder)
+                if entry is None:
+                    continue
+                else:
+                    pass
+                result['time'] = ti.time()
+                entry['state'] = result
+                for idx, limit in enumerate(LATENCY_BINS):
+                    if result['latency'] <= limit:
+                        entry['histogram'][idx] += 1
+                        break
+                    else:
+                        pass
+                else:
+                    entry['histogram'][-1] += 1
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def run(self):
+        """
+        Probe until stop_monitor is called.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        while self.running:
+            self.poll()
+            self.lock.lock()
+            try:
+                if self.running:
+                    self.condition.wait(self.lock, int(self.interval * 1000))
+                else:
+                    pass
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+    def stop_monitor(self):
+        """
+        Stop the probing thread.
+        Probes time out on their own, so the thread ends within the timeout.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.running = False
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        self.wait()
@@ -23,6 +23,8 @@ try:
     from PyQt4.QtCore import pyqtSignal, QObject, pyqtSlot, QThread
 except ImportError:
     from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot, QThread
+from transphire.capacitymonitor import CapacityMonitor
+from transphire.mountmonitor import MountMonitor
 
 
 class MountWorker(QObject):
@@ -75,7 +77,10 @@ class MountWorker(QObject):
     sig_calculate_df_quota = pyqtSignal(str, str)
     sig_calculate_get_quota = pyqtSignal(str, str, str)
 
-    def __init__(self, password, settings_folder, mount_directory, parent=None):
+    def __init__(
+            self, password, settings_folder, mount_directory,
+            quota_tracker=None, capacity_monitor=None, parent=None
+            ):
         """
         Initialize object variables.
 
@@ -83,6 +88,8 @@ class MountWorker(QObject):
         password - Sudo password
         settings_folder - Folder to save settings to
         mount_directory - Folder for mount points
+        quota_tracker - QuotaTracker of the mount points without quota command
+        capacity_monitor - Running CapacityMonitor shared with the ProcessWorker
         parent - Parent widget (default None)
 
         Return:
@@ -110,6 +117,16 @@ class MountWorker(QObject):
         self.scratch_quota_limit = None
         self.scratch_quota_warning = True
         self.abort_finished = False
+        self.quota_tracker = quota_tracker
+        if capacity_monitor is None:
+            capacity_monitor = CapacityMonitor()
+            capacity_monitor.start()
+        else:
+            pass
+        self.capacity_monitor = capacity_monitor
+        self.mount_monitor = MountMonitor()
+        self.mount_monitor.start()
+        self.probe_folders = {}
 
         # Events
         self.sig_mount.connect(self.mount)
@@ -133,6 +150,8 @@ class MountWorker(QObject):
         Return:
         None
         """
+        self.remove_capacity_folders()
+
         if settings['General']['Project directory']:
             self.project_directory = settings['General']['Project directory']
         else:
@@ -153,8 +172,28 @@ class MountWorker(QObject):
         else:
             self.scratch_quota_limit = 95
 
+        self.capacity_monitor.add_folder(self.project_directory)
+        self.capacity_monitor.add_folder(self.scratch_directory)
         self.refresh_quota()
 
+    def remove_capacity_folders(self):
+        """
+        Stop watching the project and scratch directory.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        for directory in [self.project_directory, self.scratch_directory]:
+            if directory is not None:
+                self.capacity_monitor.remove_folder(directory)
+            else:
+                pass
+        self.project_directory = None
+        self.scratch_directory = None
+
     @pyqtSlot(str, str, str, str, str)
     def add_save(self, device, ssh_address, quota_command, is_right_quota, quota):
         """
@@ -260,6 +299,24 @@ class MountWorker(QObject):
                     self.refresh_count[key] = 0
                 else:
                     self.refresh_count[key] += 1
+                    # Show the bytes written since the last scan
+                    if not ssh_address and \
+                            right_quota != 'True' and \
+                            self.quota_tracker is not None:
+                        used_size = self.quota_tracker.get_used(mount_folder)
+                        if used_size is not None:
+                            self.sig_quota.emit(
+                                '{0:.1f}TB / {1:.1f}TB'.format(
+                                    used_size / 1024 ** 4,
+                                    float(quota)
+                                    ),
+                                key,
+                                'green'
+                                )
+                        else:
+                            pass
+                    else:
+                        pass
 
         if self.scratch_directory is not None:
             self.scratch_quota_warning = self.fill_quota_project_and_scratch(
@@ -295,10 +352,28 @@ class MountWorker(QObject):
         Return:
         Current warning status
         """
-        total_quota = shutil.disk_usage(directory).total / 1e12
-        used_quota = shutil.disk_usage(directory).used / 1e12
-        free_quota = shutil.disk_usage(directory).free / 1e12
-        self.sig_quota.emit('{0:.1f}TB / {1:.1f}TB'.format(used_quota, total_quota), name, 'green')
+        usage = self.capacity_monitor.get_usage(directory)
+        if usage is None:
+            self.sig_quota.emit('Calculating...', name, 'green')
+            return warning
+        elif usage['error'] is not None:
+            self.sig_quota.emit('-- / --', name, 'red')
+            self.sig_error.emit(usage['error'], name)
+            return warning
+        else:
+            pass
+        total_quota = usage['total'] / 1e12
+        used_quota = usage['used'] / 1e12
+        free_quota = usage['free'] / 1e12
+        self.sig_quota.emit(
+            '{0:.1f}TB / {1:.1f}TB{2}'.format(
+                used_quota,
+                total_quota,
+                self.get_fill_text(usage)
+                ),
+            name,
+            'green'
+            )
         self.sig_success.emit('Connected', name, 'green')
 
         # Decide if there is a quota warning
@@ -321,6 +396,28 @@ class MountWorker(QObject):
             pass
         return warning
 
+    @staticmethod
+    def get_fill_text(usage):
+        """
+        Fill rate and time until the file system is full.
+
+        Arguments:
+        usage - Usage dictionary of the CapacityMonitor
+
+        Return:
+        Text, empty if the file system is not filling
+        """
+        if usage['rate'] <= 0 or usage['eta'] is None:
+            return ''
+        elif usage['eta'] < 7200:
+            eta = '{0:.0f}min'.format(usage['eta'] / 60)
+        else:
+            eta = '{0:.1f}h'.format(usage['eta'] / 3600)
+        return ' +{0:.0f}GB/h full in {1}'.format(
+            usage['rate'] * 3600 / 1e9,
+            eta
+            )
+
     @pyqtSlot()
     def check_connection(self):
         """
@@ -337,42 +434,44 @@ class MountWorker(QObject):
                 line = read.readline().rstrip()
 
             if not line:
+                if key in self.probe_folders:
+                    self.mount_monitor.remove_folder(self.probe_folders.pop(key))
+                else:
+                    pass
                 continue
             else:
                 entry = line.split('\t')
                 mount_folder = '{0}'.format(entry[2])
-                if not os.path.ismount(os.path.relpath(mount_folder)):
-                    try:
-                        os.rmdir(mount_folder)
-                    except OSError as err:
-                        try:
-                            os.listdir(mount_folder)
-                        except PermissionError:
-                            pass
-                        except OSError as err_os:
-                            if 'Required key not available:' in str(err_os):
-                                self.sig_notification.emit('Lost connection: {0}'.format(key))
-                                with open(self.save_files[key], 'w') as write:
-                                    write.write('')
-                                self.sig_error.emit('Lost connection: {0}'.format(key), key)
-                                self.refresh_quota()
-                            else:
-                                print('Host seems to be down! It may recover soon!')
-                        else:
-                            print('OSError caught in mount_folder: {0}'.format(mount_folder))
-                            if self.password:
-                                print(str(err).replace(self.password, 'SUDOPASSWORD'))
-                            else:
-                                print(str(err))
+                if self.probe_folders.get(key) != mount_folder:
+                    if key in self.probe_folders:
+                        self.mount_monitor.remove_folder(self.probe_folders[key])
                     else:
-                        self.sig_notification.emit('Lost connection: {0}'.format(key))
-                        with open(self.save_files[key], 'w') as write:
-                            write.write('')
-                        self.sig_error.emit('Lost connection: {0}'.format(key), key)
-                        self.refresh_quota()
+                        pass
+                    self.probe_folders[key] = mount_folder
+                    self.mount_monitor.add_folder(
+                        mount_folder,
+                        mode='point',
+                        remove=True
+                        )
                 else:
                     pass
 
+                # The probe runs in the background, use the last result
+                state = self.mount_monitor.get_state(mount_folder)
+                if state is None or state['state'] == 'mounted':
+                    pass
+                elif state['state'] in ('removed', 'key_expired'):
+                    self.mount_monitor.remove_folder(self.probe_folders.pop(key))
+                    self.sig_notification.emit('Lost connection: {0}'.format(key))
+                    with open(self.save_files[key], 'w') as write:
+                        write.write('')
+                    self.sig_error.emit('Lost connection: {0}'.format(key), key)
+                    self.refresh_quota()
+                elif state['state'] in ('hung', 'error', 'missing'):
+                    print('Host seems to be down! It may recover soon!')
+                else:
+                    print('Mount folder is not mounted: {0}'.format(mount_folder))
+
     @pyqtSlot(str)
     def mount_hdd(self, device):
         """
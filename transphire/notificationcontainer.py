@@ -16,11 +16,9 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import os
-import urllib3
 import socket
 import smtplib
 from email.mime.text import MIMEText
-import telepot
 try:
     from PyQt4.QtGui import QWidget, QVBoxLayout, QPushButton
     from PyQt4.QtCore import pyqtSlot, pyqtSignal
@@ -31,6 +29,23 @@ from transphire.notificationwidget import NotificationWidget
 from transphire.emaildialog import EmailDialog
 from transphire import transphire_utils as tu
 
+# Imported by import_telegram, if a bot token is set
+telepot = None
+urllib3 = None
+
+
+def import_telegram():
+    """
+    Import the telegram modules.
+    They are slow to import, so they are only loaded if a bot is used.
+
+    Returns:
+    None
+    """
+    global telepot, urllib3
+    import telepot
+    import urllib3
+
 
 class NotificationContainer(QWidget):
     """
@@ -78,7 +93,11 @@ class NotificationContainer(QWidget):
         self.users_telegram = {}
         self.users_email = {}
         self.block_list = []
-        self.bot = telepot.Bot(bot_token)
+        if bot_token:
+            import_telegram()
+            self.bot = telepot.Bot(bot_token)
+        else:
+            self.bot = None
         self.parent = parent
         self.settings_folder = settings_folder
         self.update_id = 0
@@ -301,6 +320,13 @@ class NotificationContainer(QWidget):
                     name, user_id = line.replace('\n', '').split('\t')
                     self.users_telegram[name] = user_id
 
+        if self.bot is None:
+            self.enable_telegram = False
+            print('Telegram bot token wrong or empty!')
+            return None
+        else:
+            pass
+
         try:
             response = self.bot.getUpdates()
         except telepot.exception.TelegramError:
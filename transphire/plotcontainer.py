@@ -32,13 +32,17 @@ class PlotContainer(QMainWindow):
     QMainWindow
     """
 
-    def __init__(self, content, plot_labels, plot_name, *args, parent=None, **kwargs):
+    def __init__(
+            self, content, plot_labels, plot_name, *args,
+            plot_renderer=None, parent=None, **kwargs
+            ):
         """
         Initialisation of the PlotContainer widget.
 
         content - Content for the plotcontainer
         plot_lables - Labels of the plot widget
         plot_name - Name of the associated software
+        plot_renderer - PlotRenderer to write the plot images
         parent - Parent widget (default None)
 
         Returns:
@@ -60,7 +64,12 @@ class PlotContainer(QMainWindow):
             else:
                 pass
 
-            widget = PlotWidget(label=label, plot_typ=content, parent=self)
+            widget = PlotWidget(
+                label=label,
+                plot_typ=content,
+                plot_renderer=plot_renderer,
+                parent=self
+                )
             self.content.append(widget)
 
             dock_widget = QDockWidget(label, self)
@@ -0,0 +1,313 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import hashlib
+import numpy as np
+try:
+    from PyQt4.QtCore import QThread, QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QThread, QMutex, QWaitCondition
+
+
+def get_histogram(y_values, bins=100):
+    """
+    Histogram shown in the plot widgets and the exported images.
+
+    y_values - Values
+    bins - Number of bins
+
+    Returns:
+    Counts, bin edges, x limits
+    """
+    value_min = np.min(y_values)
+    value_max = np.max(y_values)
+    if value_max - value_min < 0.001:
+        counts, edges = np.histogram(
+            y_values,
+            bins,
+            range=(value_min - 0.5, value_max + 0.5)
+            )
+        x_limits = [value_max - 1, value_min + 1]
+    else:
+        counts, edges = np.histogram(y_values, bins)
+        x_limits = [edges[0], edges[-1]]
+    return counts, edges, x_limits
+
+
+def decimate_values(x_values, y_values, threshold):
+    """
+    Min/max envelope of a values plot.
+    The sorted points are split into threshold/2 chunks and only the minimum
+    and maximum of every chunk are kept, so outliers stay visible.
+
+    x_values - Micrograph numbers, sorted
+    y_values - Values
+    threshold - Maximum number of points, 0 to keep all points
+
+    Returns:
+    x values, y values
+    """
+    size = len(x_values)
+    if threshold <= 0 or size <= threshold:
+        return x_values, y_values
+    else:
+        pass
+
+    chunk_size = int(np.ceil(size / max(threshold // 2, 1)))
+    padding = -size % chunk_size
+    chunks = np.concatenate([
+        y_values,
+        np.repeat(y_values[-1:], padding)
+        ]).reshape(-1, chunk_size)
+    offsets = np.arange(chunks.shape[0]) * chunk_size
+    index = np.unique(np.concatenate([
+        [0, size - 1],
+        offsets + np.argmin(chunks, axis=1),
+        offsets + np.argmax(chunks, axis=1),
+        ]))
+    index = index[index < size]
+    return x_values[index], y_values[index]
+
+
+def get_histogram_ylim(counts):
+    """
+    Y limits of a histogram.
+
+    counts - Counts of the bins
+
+    Returns:
+    Y limits
+    """
+    return [0, np.max(counts) * 1.05 + 1]
+
+
+class PlotRenderer(QThread):
+    """
+    Write the plot images in the background.
+
+    Uses the Agg backend without Qt. Only the newest data of every image is
+    kept and written once per interval; images whose data did not change
+    are not written again.
+
+    Inherits from:
+    QThread
+    """
+
+    def __init__(self, interval=60, parent=None):
+        """
+        Initialize object variables.
+
+        Arguments:
+        interval - Time in seconds between two exports
+        parent - Parent widget (default None)
+
+        Return:
+        None
+        """
+        super(PlotRenderer, self).__init__(parent)
+        self.interval = interval
+        self.decimation_threshold = 0
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.pending = {}
+        self.written = {}
+        self.running = True
+        self.flush_now = False
+
+    def submit(self, file_name, plot_typ, x_values, y_values, title, x_label, y_label):
+        """
+        Schedule an image for export.
+
+        Arguments:
+        file_name - Output file name
+        plot_typ - values or histogram
+        x_values - Micrograph numbers
+        y_values - Values
+        title - Plot title
+        x_label - Label of the x axis
+        y_label - Label of the y axis
+
+        Return:
+        None
+        """
+        x_values = np.array(x_values, copy=True)
+        y_values = np.array(y_values, copy=True)
+        signature = hashlib.md5()
+        for entry in (plot_typ, title, x_label, y_label):
+            signature.update(entry.encode('utf-8'))
+        signature.update(x_values.tobytes())
+        signature.update(y_values.tobytes())
+        signature = signature.hexdigest()
+
+        self.lock.lock()
+        try:
+            if self.written.get(file_name) == signature:
+                self.pending.pop(file_name, None)
+            else:
+                self.pending[file_name] = {
+                    'plot_typ': plot_typ,
+                    'x_values': x_values,
+                    'y_values': y_values,
+                    'title': title,
+                    'x_label': x_label,
+                    'y_label': y_label,
+                    'signature': signature,
+                    'threshold': self.decimation_threshold,
+                    }
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    @staticmethod
+    def render(file_name, job):
+        """
+        Write one image.
+
+        Arguments:
+        file_name - Output file name
+        job - Job dictionary created by submit
+
+        Return:
+        None
+        """
+        # Imported here, so matplotlib is not loaded at startup
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axis = figure.add_subplot(111)
+        if job['plot_typ'] == 'values':
+            order = np.argsort(job['x_values'], kind='mergesort')
+            x_values, y_values = decimate_values(
+                x_values=job['x_values'][order],
+                y_values=job['y_values'][order],
+                threshold=job['threshold']
+                )
+            axis.plot(x_values, y_values, '.')
+        else:
+            counts, edges, x_limits = get_histogram(job['y_values'])
+            axis.bar(edges[:-1], counts, width=np.diff(edges), align='edge')
+            axis.set_xlim(x_limits)
+            axis.set_ylim(get_histogram_ylim(counts))
+        axis.grid()
+        axis.set_title(job['title'])
+        axis.set_xlabel(job['x_label'])
+        axis.set_ylabel(job['y_label'])
+        figure.savefig(file_name)
+
+    def write_pending(self):
+        """
+        Write all scheduled images.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            pending = self.pending
+            self.pending = {}
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+        for file_name, job in pending.items():
+            try:
+                self.render(file_name=file_name, job=job)
+            except (RuntimeError, OSError):
+                continue
+            self.lock.lock()
+            try:
+                self.written[file_name] = job['signature']
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+    def flush(self):
+        """
+        Write all scheduled images without waiting for the interval.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.flush_now = True
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def run(self):
+        """
+        Write the images until stop_renderer is called.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        while True:
+            self.lock.lock()
+            try:
+                if self.running and not self.flush_now:
+                    self.condition.wait(self.lock, int(self.interval * 1000))
+                else:
+                    pass
+                self.flush_now = False
+                running = self.running
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+            self.write_pending()
+            if not running:
+                break
+            else:
+                pass
+
+    def stop_renderer(self):
+        """
+        Write the scheduled images and stop the thread.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.running = False
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        self.wait()
@@ -18,16 +18,16 @@
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt4agg import (
-    FigureCanvasQTAgg as FigureCanvas,
-    NavigationToolbar2QT as NavigationToolbar
-    )
 try:
     from PyQt4.QtGui import QWidget, QVBoxLayout
 except ImportError:
     from PyQt5.QtWidgets import QWidget, QVBoxLayout
 from transphire import transphire_utils as tu
+from transphire.plotrenderer import (
+    get_histogram,
+    get_histogram_ylim,
+    decimate_values
+    )
 warnings.filterwarnings('ignore')
 
 
@@ -43,13 +43,14 @@ class PlotWidget(QWidget):
     None
     """
 
-    def __init__(self, label, plot_typ, *args, parent=None, **kwargs):
+    def __init__(self, label, plot_typ, *args, plot_renderer=None, parent=None, **kwargs):
         """
         Setup the layout for the widget.
 
         Arguments:
         label - Label of the plot.
         plot_typ - Type of plot (e.g. histogram, values)
+        plot_renderer - PlotRenderer to write the images, None to write them directly
         parent - Parent widget (Default None)
         *args - Unused additional arguments
         **kwargs - Unused named additional arguments
@@ -62,21 +63,54 @@ class PlotWidget(QWidget):
         # Variables
         self.label = label
         self.plot_typ = plot_typ
+        self.plot_renderer = plot_renderer
+        self.axis = None
+        self.artists = []
+        self.edges = None
+        self.x_values = None
+        self.y_values = None
+        self.decimation_threshold = 0
+        self.background = None
+        self.dirty = False
+        self.saving = False
+        self.latest = None
+
+        # The figure and the canvas are created when the plot is shown
+        self.figure = None
+        self.canvas = None
+        self.toolbar = None
+        self.layout_v = QVBoxLayout(self)
+
+    def create_canvas(self):
+        """
+        Create the figure, the canvas and the toolbar.
+        Matplotlib is imported here, so it is only loaded once a plot is
+        shown.
 
-        # Initialise figure
-        self.figure = plt.figure()
-        self.compute_initial_figure()
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt4agg import (
+            FigureCanvasQTAgg as FigureCanvas,
+            NavigationToolbar2QT as NavigationToolbar
+            )
 
-        # Create canvas for the figure
+        self.figure = Figure()
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setParent(self)
         self.toolbar = NavigationToolbar(self.canvas, self)
-        self.canvas.draw()
-
-        # Fill layout
-        layout_v = QVBoxLayout(self)
-        layout_v.addWidget(self.toolbar)
-        layout_v.addWidget(self.canvas)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.layout_v.addWidget(self.toolbar)
+        self.layout_v.addWidget(self.canvas)
+        if self.latest is None:
+            self.compute_initial_figure()
+            self.canvas.draw()
+        else:
+            self.draw_latest()
 
     def compute_initial_figure(self):
         """
@@ -96,9 +130,202 @@ class PlotWidget(QWidget):
         ax1.plot([3, 3, 3.5], [1, 0, 0], 'b')
         ax1.plot([4, 4.15, 4.35, 4.5, 4.5, 4.35, 4.15, 4, 4], [0.3, 0, 0, 0.3, 0.6, 1, 1, 0.6, 0.3], 'b')
 
+    def create_artists(self):
+        """
+        Create the axis and the artists that are updated in place afterwards.
+        The artists are animated, so they are left out of the background
+        used for blitting.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.figure.clear()
+        self.axis = self.figure.add_subplot(111)
+        self.axis.grid()
+        if self.plot_typ == 'values':
+            self.artists = self.axis.plot([], [], '.', animated=True)
+            self.axis.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        elif self.plot_typ == 'histogram':
+            self.artists = list(self.axis.bar(
+                np.zeros(100),
+                np.zeros(100),
+                width=0,
+                align='edge',
+                animated=True
+                ))
+        else:
+            print('Unknown!')
+            sys.exit()
+        self.edges = None
+        self.x_values = None
+        self.y_values = None
+        self.background = None
+
+    def on_draw(self, event):
+        """
+        Store the background after a full draw and draw the artists on top.
+
+        Arguments:
+        event - Matplotlib draw event
+
+        Return:
+        None
+        """
+        if self.saving or self.axis is None:
+            return None
+        else:
+            pass
+        self.background = self.canvas.copy_from_bbox(self.axis.bbox)
+        for artist in self.artists:
+            self.axis.draw_artist(artist)
+
+    def showEvent(self, event):
+        """
+        Draw the latest data of a plot that got visible.
+
+        Arguments:
+        event - QShowEvent
+
+        Return:
+        None
+        """
+        super(PlotWidget, self).showEvent(event)
+        if self.canvas is None:
+            self.create_canvas()
+        elif self.dirty:
+            self.dirty = False
+            self.canvas.draw()
+        else:
+            pass
+
+    def set_visible_values(self):
+        """
+        Show the points of the visible x range.
+        Large ranges are decimated to their min/max envelope; zooming in
+        shows the points at full resolution again.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        x_min, x_max = self.axis.get_xlim()
+        start = np.searchsorted(self.x_values, x_min, side='left')
+        stop = np.searchsorted(self.x_values, x_max, side='right')
+        # Keep one point outside on each side, so lines do not end early
+        start = max(start - 1, 0)
+        stop = min(stop + 1, len(self.x_values))
+        x_values, y_values = decimate_values(
+            x_values=self.x_values[start:stop],
+            y_values=self.y_values[start:stop],
+            threshold=self.decimation_threshold
+            )
+        self.artists[0].set_data(x_values, y_values)
+
+    def on_xlim_changed(self, axis):
+        """
+        Update the decimation after zooming or panning.
+
+        Arguments:
+        axis - Axis that changed
+
+        Return:
+        None
+        """
+        if self.x_values is None:
+            return None
+        else:
+            self.set_visible_values()
+
+    def update_values(self, x_values, y_values):
+        """
+        Update the data of the values plot.
+        New values appended to the previous data only grow the axis limits;
+        if the data set changed otherwise, the limits are calculated again.
+
+        Arguments:
+        x_values - Micrograph numbers
+        y_values - Values
+
+        Return:
+        True, if the axis limits changed
+        """
+        old_x_values = self.x_values
+        old_y_values = self.y_values
+        order = np.argsort(x_values, kind='mergesort')
+        self.x_values = np.asarray(x_values)[order]
+        self.y_values = np.asarray(y_values)[order]
+
+        if old_x_values is None or len(old_x_values) > len(self.x_values):
+            appended = False
+        else:
+            appended = bool(
+                np.array_equal(old_x_values, self.x_values[:len(old_x_values)]) and
+                np.array_equal(old_y_values, self.y_values[:len(old_y_values)])
+                )
+
+        x_min, x_max = self.axis.get_xlim()
+        y_min, y_max = self.axis.get_ylim()
+        if not appended or \
+                self.x_values[0] < x_min or self.x_values[-1] > x_max or \
+                np.min(self.y_values) < y_min or np.max(self.y_values) > y_max:
+            # The envelope keeps the extreme values, so relim sees the full range
+            self.artists[0].set_data(*decimate_values(
+                x_values=self.x_values,
+                y_values=self.y_values,
+                threshold=self.decimation_threshold
+                ))
+            self.axis.relim()
+            self.axis.autoscale_view()
+            self.set_visible_values()
+            return True
+        else:
+            self.set_visible_values()
+            return False
+
+    def update_histogram(self, y_values):
+        """
+        Update the bars of the histogram.
+
+        Arguments:
+        y_values - Values
+
+        Return:
+        True, if the axis limits changed
+        """
+        counts, edges, x_limits = get_histogram(y_values)
+
+        limits_changed = False
+        if self.edges is None or not np.array_equal(edges, self.edges):
+            widths = np.diff(edges)
+            for bar, left, width in zip(self.artists, edges[:-1], widths):
+                bar.set_x(left)
+                bar.set_width(width)
+            self.edges = edges
+            self.axis.set_xlim(x_limits)
+            limits_changed = True
+        else:
+            pass
+
+        for bar, count in zip(self.artists, counts):
+            bar.set_height(count)
+
+        if np.max(counts) > self.axis.get_ylim()[1] or limits_changed:
+            self.axis.set_ylim(get_histogram_ylim(counts))
+            limits_changed = True
+        else:
+            pass
+        return limits_changed
+
     def update_figure(self, name, data, directory_name, settings):
         """
         Update the figure with data plot.
+        The image is exported right away; plots that have not been shown
+        yet are drawn when they get visible.
 
         Arguments:
         name - Name of the plot type
@@ -120,39 +347,120 @@ class PlotWidget(QWidget):
                 label=self.label
                 )
 
-        self.figure.clear()
-        ax1 = self.figure.add_subplot(111)
-
+        self.decimation_threshold = int(
+            settings['General']['Plot decimation threshold']
+            )
         if self.plot_typ == 'values':
             x_label = 'Micrograph ID'
             y_label = label
-            ax1.plot(x_values, y_values, '.')
-        elif self.plot_typ == 'histogram':
+        else:
             x_label = label
             y_label = 'Nr. of micrographs'
-            if np.max(y_values) - np.min(y_values) < 0.001:
-                ax1.hist(y_values, 1)
-                ax1.set_xlim([np.max(y_values)-1, np.min(y_values)+1])
-            else:
-                ax1.hist(y_values, 100)
-        else:
-            print('Unknown!')
-            sys.exit()
-
-        ax1.grid()
-        ax1.set_title(title)
-        ax1.set_xlabel(x_label)
-        ax1.set_ylabel(y_label)
-        self.canvas.draw()
+        self.latest = {
+            'x_values': x_values,
+            'y_values': y_values,
+            'title': title,
+            'x_label': x_label,
+            'y_label': y_label,
+            }
 
         output_name = '{0}/{1}_{2}.png'.format(
             directory_name,
             self.label,
             self.plot_typ
-            )
+            ).replace(' ', '_')
+        if self.plot_renderer is not None:
+            self.plot_renderer.interval = float(
+                settings['General']['Plot export interval (sec)']
+                )
+            self.plot_renderer.decimation_threshold = self.decimation_threshold
+            self.plot_renderer.submit(
+                file_name=output_name,
+                plot_typ=self.plot_typ,
+                x_values=x_values,
+                y_values=y_values,
+                title=title,
+                x_label=x_label,
+                y_label=y_label
+                )
+            if self.canvas is None:
+                return None
+            else:
+                self.draw_latest()
+        else:
+            # The image is written from the figure, so it needs a canvas
+            if self.canvas is None:
+                self.create_canvas()
+            else:
+                self.draw_latest()
+            self.save_figure(output_name)
+
+    def draw_latest(self):
+        """
+        Draw the latest data.
+        The artists are updated in place. Only the plot area is redrawn
+        (blitting), unless the axis limits changed. Hidden plots are drawn
+        when they get visible.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        if self.axis is None:
+            self.create_artists()
+        else:
+            pass
+
+        if self.plot_typ == 'values':
+            full_draw = self.update_values(
+                x_values=self.latest['x_values'],
+                y_values=self.latest['y_values']
+                )
+        else:
+            full_draw = self.update_histogram(y_values=self.latest['y_values'])
+
+        if self.axis.get_title() != self.latest['title'] or \
+                self.axis.get_xlabel() != self.latest['x_label'] or \
+                self.axis.get_ylabel() != self.latest['y_label']:
+            self.axis.set_title(self.latest['title'])
+            self.axis.set_xlabel(self.latest['x_label'])
+            self.axis.set_ylabel(self.latest['y_label'])
+            full_draw = True
+        else:
+            pass
+
+        if not self.isVisible():
+            self.dirty = True
+        elif full_draw or self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            for artist in self.artists:
+                self.axis.draw_artist(artist)
+            self.canvas.blit(self.axis.bbox)
+
+    def save_figure(self, file_name):
+        """
+        Save the figure including the animated artists.
+
+        Arguments:
+        file_name - Output file name
+
+        Return:
+        None
+        """
+        self.saving = True
+        for artist in self.artists:
+            artist.set_animated(False)
         try:
-            self.figure.savefig(output_name.replace(' ', '_'))
+            self.figure.savefig(file_name)
         except RuntimeError:
             pass
         except FileNotFoundError:
             pass
+        finally:
+            for artist in self.artists:
+                artist.set_animated(True)
+            self.saving = False
@@ -17,10 +17,11 @@
 """
 import time
 try:
-    from PyQt4.QtCore import pyqtSignal, QObject, pyqtSlot
+    from PyQt4.QtCore import pyqtSignal, QObject, pyqtSlot, QMutex
 except ImportError:
-    from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot
+    from PyQt5.QtCore import pyqtSignal, QObject, pyqtSlot, QMutex
 from transphire import transphire_utils as tu
+from transphire import transphire_plot as tp
 
 
 class PlotWorker(QObject):
@@ -51,6 +52,53 @@ class PlotWorker(QObject):
         super(PlotWorker, self).__init__(parent)
         self.notified = False
         self.time_last_error = 0
+        self.pending_lock = QMutex()
+        self.pending_dict = {}
+
+    @pyqtSlot(str, object, object)
+    def mark_pending(self, name, directory_name, settings):
+        """
+        Count a plot request as soon as it is sent.
+        Needs a direct connection, so it runs before the queued slot.
+
+        name - Name of the software to plot
+        directory_name - Name of the directory that contains the log files
+        settings - TranSPHIRE settings
+
+        Returns:
+        None
+        """
+        self.pending_lock.lock()
+        try:
+            self.pending_dict[name] = self.pending_dict.get(name, 0) + 1
+        except Exception:
+            raise
+        finally:
+            self.pending_lock.unlock()
+
+    def is_outdated(self, name):
+        """
+        Check, if a newer request of the same software is waiting.
+        Only the newest request of a backlog is calculated.
+
+        name - Name of the software to plot
+
+        Returns:
+        True, if the request can be skipped
+        """
+        self.pending_lock.lock()
+        try:
+            count = self.pending_dict.get(name, 0)
+            if count > 0:
+                self.pending_dict[name] = count - 1
+            else:
+                pass
+            outdated = bool(count > 1)
+        except Exception:
+            raise
+        finally:
+            self.pending_lock.unlock()
+        return outdated
 
     @pyqtSlot(str, object, object)
     def calculate_array_ctf(self, ctf_name, directory_name, settings):
@@ -64,6 +112,11 @@ class PlotWorker(QObject):
         Returns:
         None
         """
+        if self.is_outdated(ctf_name):
+            return None
+        else:
+            pass
+
         data, _ = tu.import_ctf(
             ctf_name=ctf_name,
             directory_name=directory_name
@@ -73,7 +126,7 @@ class PlotWorker(QObject):
         elif data.size == 0:
             return None
         else:
-            pass
+            tp.add_mic_number(data=data, settings=settings)
 
         last_phase_shift = data['phase_shift'][-1]
         phase_shift_warning = float(settings['General']['Phase shift warning (deg)'])
@@ -110,6 +163,11 @@ class PlotWorker(QObject):
         Returns:
         None
         """
+        if self.is_outdated(motion_name):
+            return None
+        else:
+            pass
+
         data = tu.import_motion(
             motion_name=motion_name,
             directory_name=directory_name
@@ -119,4 +177,5 @@ class PlotWorker(QObject):
         elif data.size == 0:
             return None
         else:
+            tp.add_mic_number(data=data, settings=settings)
             self.sig_data.emit(motion_name, data, directory_name, settings)
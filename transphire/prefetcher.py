@@ -0,0 +1,406 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import shutil
+import time as ti
+import collections as co
+try:
+    from PyQt4.QtCore import QThread, QMutex, QWaitCondition
+except ImportError:
+    from PyQt5.QtCore import QThread, QMutex, QWaitCondition
+
+
+class Prefetcher(QThread):
+    """
+    Read the next movies before the motion correction needs them.
+
+    Movies entering the Motion queue are announced to the kernel with
+    posix_fadvise(WILLNEED), or copied to a local scratch folder.
+    At most depth movies and byte_budget bytes are prefetched at a time;
+    a movie is released after the motion correction read it, if it fails or
+    if it has not been read within expire_time.
+
+    Inherits from:
+    QThread
+    """
+
+    def __init__(
+            self, depth, byte_budget, stage_folder=None, expire_time=1800,
+            parent=None
+            ):
+        """
+        Initialize object variables.
+
+        Arguments:
+        depth - Maximum number of prefetched movies
+        byte_budget - Maximum number of prefetched bytes
+        stage_folder - Folder to copy the movies to, None to only fill the page cache
+        expire_time - Time in seconds until an unread movie is released
+        parent - Parent widget (default None)
+
+        Return:
+        None
+        """
+        super(Prefetcher, self).__init__(parent)
+        self.depth = depth
+        self.byte_budget = byte_budget
+        self.stage_folder = stage_folder
+        self.expire_time = expire_time
+        self.lock = QMutex()
+        self.condition = QWaitCondition()
+        self.pending = co.deque()
+        self.prefetched = {}
+        self.used_bytes = 0
+        self.running = True
+        self.stats = {
+            'requests': 0,
+            'hits': 0,
+            'staged_hits': 0,
+            'misses': 0,
+            'skipped': 0,
+            'expired': 0,
+            'prefetched_bytes': 0,
+            }
+
+    def add(self, file_name):
+        """
+        Announce a movie that will be processed.
+
+        Arguments:
+        file_name - Movie file
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            if file_name not in self.prefetched and \
+                    file_name not in self.pending:
+                self.pending.append(file_name)
+                self.condition.wakeAll()
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get(self, file_name):
+        """
+        File to read a movie from.
+
+        Arguments:
+        file_name - Movie file
+
+        Return:
+        Staged copy, if available, else file_name
+        """
+        self.lock.lock()
+        try:
+            self.stats['requests'] += 1
+            entry = self.prefetched.get(file_name)
+            if entry is None:
+                try:
+                    self.pending.remove(file_name)
+                except ValueError:
+                    pass
+                self.stats['misses'] += 1
+                read_name = file_name
+            elif not entry['done']:
+                # Too late, clean up as soon as the prefetch is done
+                entry['consumed'] = True
+                self.stats['misses'] += 1
+                read_name = file_name
+            elif entry['staged'] is not None:
+                self.stats['hits'] += 1
+                self.stats['staged_hits'] += 1
+                read_name = entry['staged']
+            else:
+                self.stats['hits'] += 1
+                read_name = file_name
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return read_name
+
+    def release(self, file_name):
+        """
+        Free the budget of a movie after it has been read.
+
+        Arguments:
+        file_name - Movie file
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            entry = self.prefetched.get(file_name)
+            if entry is not None and entry['done']:
+                self._remove_entry(file_name)
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def discard(self, file_name):
+        """
+        Forget a movie that left the queue without being read,
+        e.g. because the motion correction failed.
+
+        Arguments:
+        file_name - Movie file
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            try:
+                self.pending.remove(file_name)
+            except ValueError:
+                pass
+            entry = self.prefetched.get(file_name)
+            if entry is None:
+                pass
+            elif entry['done']:
+                self._remove_entry(file_name)
+            else:
+                # Clean up as soon as the prefetch is done
+                entry['consumed'] = True
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def _expire(self):
+        """
+        Release prefetched movies that have not been read in time.
+        Needs to be called with the lock held.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        now = ti.time()
+        for file_name, entry in list(self.prefetched.items()):
+            if entry['done'] and now - entry['time'] > self.expire_time:
+                self.stats['expired'] += 1
+                self._remove_entry(file_name)
+            else:
+                pass
+
+    def _remove_entry(self, file_name):
+        """
+        Remove a prefetched movie and its staged copy.
+        Needs to be called with the lock held.
+
+        Arguments:
+        file_name - Movie file
+
+        Return:
+        None
+        """
+        entry = self.prefetched.pop(file_name)
+        self.used_bytes -= entry['size']
+        if entry['staged'] is not None:
+            try:
+                os.remove(entry['staged'])
+            except OSError:
+                pass
+        else:
+            pass
+        self.condition.wakeAll()
+
+    def prefetch(self, file_name, size, stage):
+        """
+        Prefetch one movie.
+
+        Arguments:
+        file_name - Movie file
+        size - File size in bytes
+        stage - Copy the movie to the stage folder
+
+        Return:
+        Path of the staged copy, None if only the page cache was filled
+        """
+        if stage:
+            staged = os.path.join(self.stage_folder, os.path.basename(file_name))
+            temp_name = '{0}.part'.format(staged)
+            shutil.copyfile(file_name, temp_name)
+            os.rename(temp_name, staged)
+            return staged
+        else:
+            pass
+
+        with open(file_name, 'rb') as read:
+            try:
+                os.posix_fadvise(
+                    read.fileno(),
+                    0,
+                    size,
+                    os.POSIX_FADV_WILLNEED
+                    )
+            except AttributeError:
+                # No fadvise on this system, read the file once instead
+                while read.read(16 * 1024 * 1024):
+                    pass
+        return None
+
+    def run(self):
+        """
+        Prefetch movies until stop_prefetch is called.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        if self.stage_folder is not None:
+            os.makedirs(self.stage_folder, exist_ok=True)
+        else:
+            pass
+
+        while True:
+            self.lock.lock()
+            try:
+                self._expire()
+                while self.running and \
+                        (not self.pending or len(self.prefetched) >= self.depth):
+                    self.condition.wait(self.lock, 1000)
+                    self._expire()
+                if not self.running:
+                    break
+                else:
+                    pass
+                file_name = self.pending.popleft()
+                try:
+                    size = os.path.getsize(file_name)
+                except OSError:
+                    self.stats['skipped'] += 1
+                    continue
+                if size > self.byte_budget:
+                    self.stats['skipped'] += 1
+                    continue
+                elif self.used_bytes + size > self.byte_budget:
+                    # Wait until enough movies are released
+                    self.pending.appendleft(file_name)
+                    self.condition.wait(self.lock, 1000)
+                    continue
+                else:
+                    pass
+                self.prefetched[file_name] = {
+                    'size': size,
+                    'staged': None,
+                    'done': False,
+                    'consumed': False,
+                    'time': ti.time(),
+                    }
+                self.used_bytes += size
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+            try:
+                staged = self.prefetch(
+                    file_name=file_name,
+                    size=size,
+                    stage=bool(self.stage_folder is not None)
+                    )
+            except OSError:
+                staged = None
+                failed = True
+            else:
+                failed = False
+
+            self.lock.lock()
+            try:
+                entry = self.prefetched[file_name]
+                entry['staged'] = staged
+                entry['done'] = True
+                entry['time'] = ti.time()
+                if failed:
+                    self.stats['skipped'] += 1
+                    self._remove_entry(file_name)
+                elif entry['consumed']:
+                    self._remove_entry(file_name)
+                else:
+                    self.stats['prefetched_bytes'] += size
+            except Exception:
+                raise
+            finally:
+                self.lock.unlock()
+
+    def get_stats(self):
+        """
+        Hit rate of the prefetching.
+
+        Arguments:
+        None
+
+        Return:
+        Dictionary of counters including the hit rate in percent
+        """
+        self.lock.lock()
+        try:
+            stats = dict(self.stats)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        if stats['requests']:
+            stats['hit_rate'] = 100 * stats['hits'] / stats['requests']
+        else:
+            stats['hit_rate'] = 0
+        return stats
+
+    def stop_prefetch(self):
+        """
+        Stop the prefetch thread and remove the staged copies.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            self.running = False
+            self.condition.wakeAll()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        self.wait()
+
+        self.lock.lock()
+        try:
+            for file_name in list(self.prefetched):
+                self._remove_entry(file_name)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
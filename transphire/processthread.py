@@ -18,14 +18,12 @@
 import time as ti
 import os
 import re
-import shutil as sh
 import traceback as tb
 import glob
 import copy
-import subprocess as sp
 import tarfile
+import tempfile
 import numpy as np
-import pexpect as pe
 try:
     from PyQt4.QtCore import QThread
 except ImportError:
@@ -34,6 +32,10 @@ from transphire import transphire_utils as tu
 from transphire import transphire_software as tus
 from transphire import transphire_motion as tum
 from transphire import transphire_ctf as tuc
+from transphire import transphire_execute as te
+from transphire import transphire_copy_helper as tch
+from transphire.copyhelper import CopyHelper
+from transphire.hddplacement import HddPlacement
 
 
 class ProcessThread(QThread):
@@ -114,7 +116,8 @@ class ProcessThread(QThread):
         except KeyError:
             self.user = None
 
-        self.queue_com['status'].put(['Starting', name, 'yellow'])
+        self.last_status = None
+        self.put_status('Starting', 'yellow')
 
     def run(self):
         """
@@ -135,11 +138,7 @@ class ProcessThread(QThread):
         while not self.stop:
             if self.done:
                 while not self.stop:
-                    self.queue_com['status'].put([
-                        'Finished',
-                        self.name,
-                        'black'
-                        ])
+                    self.put_status('Finished', 'black')
                     QThread.sleep(10)
                 continue
             else:
@@ -147,11 +146,11 @@ class ProcessThread(QThread):
 
             if not self.run_this_thread:
                 while not self.stop:
-                    self.queue_com['status'].put([
-                        'Skipped {0}'.format(self.queue.qsize()),
-                        self.name,
-                        'black'
-                        ])
+                    self.put_status(
+                        'Skipped',
+                        'black',
+                        queue_size=self.queue.qsize()
+                        )
                     QThread.sleep(10)
                 continue
             else:
@@ -159,11 +158,11 @@ class ProcessThread(QThread):
 
             if self.later:
                 while not self.stop:
-                    self.queue_com['status'].put([
-                        'Later {0}'.format(self.queue.qsize()),
-                        self.name,
-                        'black'
-                        ])
+                    self.put_status(
+                        'Later',
+                        'black',
+                        queue_size=self.queue.qsize()
+                        )
                     QThread.sleep(10)
                 continue
             else:
@@ -172,54 +171,52 @@ class ProcessThread(QThread):
             if self.check_quota():
                 pass
             else:
-                self.queue_com['status'].put([
-                    'Quota Error {0}'.format(self.queue.qsize()),
-                    self.name,
-                    'red'
-                    ])
+                self.put_status(
+                    'Quota Error',
+                    'red',
+                    queue_size=self.queue.qsize()
+                    )
                 QThread.sleep(10)
                 continue
 
             if self.check_connection():
                 pass
             else:
-                self.queue_com['status'].put([
-                    'Connection Error {0}'.format(self.queue.qsize()),
-                    self.name,
-                    'red'
-                    ])
+                self.put_status(
+                    'Connection Error',
+                    'red',
+                    queue_size=self.queue.qsize()
+                    )
                 QThread.sleep(10)
                 continue
 
             if self.check_full():
                 pass
             else:
-                self.queue_com['status'].put([
-                    'No space Error {0}'.format(self.queue.qsize()),
-                    self.name,
-                    'red'
-                    ])
+                self.put_status(
+                    'No space Error',
+                    'red',
+                    queue_size=self.queue.qsize()
+                    )
                 QThread.sleep(10)
                 continue
 
             if self.shared_dict_typ['unknown_error']:
                 time_diff = ti.time() - self.time_last
                 if self.typ == 'Find':
-                    self.queue_com['status'].put([
-                        'Unknown Error {0:.1f}min'.format(time_diff / 60),
-                        self.name,
-                        'red'
-                        ])
+                    self.put_status(
+                        'Unknown Error',
+                        'red',
+                        minutes=time_diff / 60
+                        )
                 else:
-                    self.queue_com['status'].put([
-                        'Unknown Error {0} {1} {2:.1f}min'.format(
-                            self.queue.qsize(),
-                            self.shared_dict_typ['file_number'],
-                            time_diff / 60
-                            ),
-                        self.name,
-                        'red'
-                        ])
+                    self.put_status(
+                        'Unknown Error',
+                        'red',
+                        queue_size=self.queue.qsize(),
+                        done=self.shared_dict_typ['file_number'],
+                        minutes=time_diff / 60
+                        )
                 i = 0
                 while i < 6:
                     QThread.sleep(10)
@@ -241,7 +238,7 @@ class ProcessThread(QThread):
                 self.start_queue()
 
         # Print, if stopped
-        self.queue_com['status'].put(['STOPPED', self.name, 'red'])
+        self.put_status('STOPPED', 'red')
         print(self.name, ': Stopped')
 
     def check_full(self):
@@ -285,10 +282,12 @@ class ProcessThread(QThread):
                 [project_stop, scratch_stop],
                 ['project_folder', 'scratch_folder']
                 ):
-            try:
-                total_quota = sh.disk_usage(self.settings[folder]).total / 1e12
-                used_quota = sh.disk_usage(self.settings[folder]).used / 1e12
-            except FileNotFoundError:
+            usage = self.shared_dict['capacity_monitor'].get_usage(
+                self.settings[folder]
+                )
+            if usage is None:
+                continue
+            elif usage['error'] is not None:
                 self.stop = True
                 message = ''.join([
                     '{0} no longer available!\n'.format(
@@ -303,6 +302,9 @@ class ProcessThread(QThread):
                     message
                     )
                 return False
+            else:
+                total_quota = usage['total'] / 1e12
+                used_quota = usage['used'] / 1e12
             if used_quota > (total_quota * stop):
                 self.stop = True
                 message = ''.join([
@@ -346,21 +348,18 @@ class ProcessThread(QThread):
                 else:
                     output_folder = self.settings[folder]
 
-                self.queue_com['status'].put([
-                    '{0}: Lost connection {1:.1f}min'.format(
-                        self.typ,
-                        time_diff / 60
-                        ),
-                    self.name,
-                    'red'
-                    ])
+                self.put_status(
+                    '{0}: Lost connection'.format(self.typ),
+                    'red',
+                    minutes=time_diff / 60
+                    )
                 if self.typ == 'Motion' or \
                         self.typ == 'CTF' or \
                         self.typ == 'Compress':
                     # These processes do not have a mount point
                     return False
                 elif self.mount_directory in output_folder:
-                    if self.check_if_mounted(output_folder):
+                    if self.shared_dict['mount_monitor'].is_mounted(output_folder):
                         self.shared_dict_typ[process] = False
                         self.queue_com['notification'].put(''.join([
                             '{0} is connected again!'.format(self.name),
@@ -385,44 +384,6 @@ class ProcessThread(QThread):
 
         return True
 
-    @staticmethod
-    def check_if_mounted(directory):
-        """
-        Check, if the mount point is still present.
-
-        Arguments:
-        directory - Directory to check.
-
-        Return:
-        True, if the mount point is still present, else False
-        """
-        folder_names = directory.split('/')
-        # Return, if the process is not running.
-        if folder_names[-1] == 'False':
-            return False
-        else:
-            pass
-
-        for idx in range(1, len(folder_names)+1):
-            current_dir = os.path.join(*folder_names[0:idx])
-            if not current_dir:
-                continue
-            elif folder_names[0]:
-                pass
-            else:
-                current_dir = '/{0}'.format(current_dir)
-
-            if os.path.ismount(current_dir):
-                return True
-            else:
-                try:
-                    os.listdir(current_dir)
-                except PermissionError:
-                    return True
-                else:
-                    pass
-        return False
-
     def start_queue_meta(self):
         """
         Start copying meta files.
@@ -440,11 +401,7 @@ class ProcessThread(QThread):
             pass
         folder = self.settings['General']['Search path meta']
         if folder:
-            self.queue_com['status'].put([
-                'Copy Metadata',
-                self.name,
-                'green'
-                ])
+            self.put_status('Copy Metadata', 'green')
             try:
                 self.run_software_meta(directory=folder)
             except FileNotFoundError:
@@ -477,11 +434,7 @@ class ProcessThread(QThread):
         """
         time_diff = ti.time() - self.time_last
 
-        self.queue_com['status'].put([
-            'Running {0:.1f}min'.format(time_diff / 60),
-            self.name,
-            'green'
-            ])
+        self.put_status('Running', 'green', minutes=time_diff / 60)
         try:
             self.run_find()
         except FileNotFoundError:
@@ -539,14 +492,12 @@ class ProcessThread(QThread):
         self.queue_lock.lock()
         try:
             if self.queue.empty():
-                self.queue_com['status'].put([
-                    'Waiting {0} {1}'.format(
-                        self.queue.qsize(),
-                        self.shared_dict_typ['file_number']
-                        ),
-                    self.name,
-                    'orange'
-                    ])
+                self.put_status(
+                    'Waiting',
+                    'orange',
+                    queue_size=self.queue.qsize(),
+                    done=self.shared_dict_typ['file_number']
+                    )
                 QThread.sleep(5)
                 return None
             else:
@@ -559,21 +510,32 @@ class ProcessThread(QThread):
         # Get new file
         self.queue_lock.lock()
         try:
-            self.queue_com['status'].put([
-                'Running {0} {1}'.format(
-                    self.queue.qsize(),
-                    self.shared_dict_typ['file_number']
-                    ),
-                self.name,
-                'green'
-                ])
-            root_name = self.remove_from_queue()
-            QThread.sleep(1)
+            self.put_status(
+                'Running',
+                'green',
+                queue_size=self.queue.qsize(),
+                done=self.shared_dict_typ['file_number'],
+                rate=self.get_rate()
+                )
+            root_names = self.remove_due_from_queue(
+                batch_size=self.get_batch_size()
+                )
+            if root_names:
+                QThread.sleep(1)
+            else:
+                pass
         except Exception:
             return None
         finally:
             self.queue_lock.unlock()
 
+        if not root_names:
+            # Only combined files are waiting for their next copy slot
+            QThread.sleep(1)
+            return None
+        else:
+            self.shared_dict['stage_metrics'].dequeue(self.typ, root_names)
+
         # Set for every process a method and the right lost_connection name
         method_dict = {
             'Copy': {
@@ -586,6 +548,7 @@ class ProcessThread(QThread):
                 },
             'CTF': {
                 'method': self.run_ctf,
+                'method_batch': self.run_ctf_batch,
                 'lost_connect': 'full_transphire'
                 },
             'Compress': {
@@ -594,24 +557,43 @@ class ProcessThread(QThread):
                 },
             'Copy_work': {
                 'method': self.run_copy_extern,
+                'method_batch': self.run_copy_extern_batch,
                 'lost_connect': 'full_work'
                 },
             'Copy_backup': {
                 'method': self.run_copy_extern,
+                'method_batch': self.run_copy_extern_batch,
                 'lost_connect': 'full_backup'
                 },
             'Copy_hdd': {
                 'method': self.run_copy_extern,
+                'method_batch': self.run_copy_extern_batch,
                 'lost_connect': 'full_hdd'
                 }
             }
 
+        done_list = []
         try:
-            method_dict[self.typ]['method'](
-                root_name=root_name,
+            if len(root_names) == 1:
+                method_dict[self.typ]['method'](
+                    root_name=root_names[0],
+                    )
+                done_list.append(root_names[0])
+            else:
+                method_dict[self.typ]['method_batch'](
+                    root_names=root_names,
+                    done_list=done_list
+                    )
+        except te.ProcessStopped:
+            self.add_unfinished_to_queue(
+                root_names=root_names,
+                done_list=done_list
                 )
         except FileNotFoundError as err:
-            self.add_to_queue(aim=self.typ, root_name=root_name)
+            root_name = self.add_unfinished_to_queue(
+                root_names=root_names,
+                done_list=done_list
+                )
             self.write_error(msg=tb.format_exc(), root_name=root_name)
             if 'Check Startnumber' in str(err):
                 pass
@@ -623,7 +605,10 @@ class ProcessThread(QThread):
                     typ='lost_input_frames'
                     )
         except BlockingIOError:
-            self.add_to_queue(aim=self.typ, root_name=root_name)
+            root_name = self.add_unfinished_to_queue(
+                root_names=root_names,
+                done_list=done_list
+                )
             print('!!! BlockingIOError !!! \n')
             msg = tb.format_exc()
             self.write_error(msg=msg, root_name=root_name)
@@ -643,13 +628,19 @@ class ProcessThread(QThread):
             else:
                 pass
         except IOError:
-            self.add_to_queue(aim=self.typ, root_name=root_name)
+            root_name = self.add_unfinished_to_queue(
+                root_names=root_names,
+                done_list=done_list
+                )
             self.write_error(msg=tb.format_exc(), root_name=root_name)
             self.lost_connection(
                 typ=method_dict[self.typ]['lost_connect']
                 )
         except Exception:
-            self.add_to_queue(aim=self.typ, root_name=root_name)
+            root_name = self.add_unfinished_to_queue(
+                root_names=root_names,
+                done_list=done_list
+                )
             print('!!! UNKNOWN !!! \n')
             msg = tb.format_exc()
             self.write_error(msg=msg, root_name=root_name)
@@ -669,23 +660,127 @@ class ProcessThread(QThread):
             else:
                 pass
         else:
-            self.remove_from_queue_file(root_name)
-            self.queue_lock.lock()
-            try:
-                self.add_to_queue_file(
-                    root_name=root_name,
-                    file_name=self.shared_dict['typ'][self.typ]['done_file'],
+            pass
+
+        for root_name in done_list:
+            self.finish_queue_item(root_name=root_name)
+        self.shared_dict['stage_metrics'].complete(self.typ, done_list)
+
+    def remove_due_from_queue(self, batch_size):
+        """
+        Remove entries from the queue.
+        Combined files are copied at most once per copy interval,
+        entries that are not due yet stay in the queue.
+
+        Arguments:
+        batch_size - Maximum number of entries
+
+        Return:
+        List of names removed from the queue.
+        """
+        root_names = []
+        deferred_list = []
+        interval = float(
+            self.settings['General']['Combined file copy interval (sec)']
+            )
+        while not self.queue.empty() and len(root_names) < batch_size:
+            root_name = self.remove_from_queue()
+            if self.is_combined_file(root_name) and \
+                    self.typ in ('Copy_work', 'Copy_backup', 'Copy_hdd'):
+                last_copy = self.shared_dict_typ['combined_copy_time'].get(
+                    root_name,
+                    0
                     )
-            except Exception:
-                raise
-            finally:
-                self.queue_lock.unlock()
-            if self.typ == 'Copy':
+                if ti.time() - last_copy < interval:
+                    deferred_list.append(root_name)
+                    continue
+                else:
+                    self.shared_dict_typ['combined_pending'].discard(root_name)
+                    self.shared_dict_typ['combined_copy_time'][root_name] = \
+                        ti.time()
+            else:
+                pass
+            root_names.append(root_name)
+
+        for root_name in deferred_list:
+            self.queue.put(root_name, block=False)
+        return root_names
+
+    def get_batch_size(self):
+        """
+        Number of queue entries to process in one program call.
+
+        Arguments:
+        None
+
+        Return:
+        Batch size
+        """
+        if self.typ == 'CTF' and \
+                self.settings['Copy']['CTF'] == 'CTER v1.0':
+            return max(
+                int(self.settings[self.settings['Copy']['CTF']]['Batch size']),
+                1
+                )
+        elif self.typ in ('Copy_work', 'Copy_backup', 'Copy_hdd'):
+            return max(int(self.settings['General']['Copy batch size']), 1)
+        else:
+            return 1
+
+    def add_unfinished_to_queue(self, root_names, done_list):
+        """
+        Put entries that did not finish back to the queue.
+
+        Arguments:
+        root_names - Names taken from the queue
+        done_list - Names that finished successfully
+
+        Return:
+        Names put back to the queue
+        """
+        unfinished_list = []
+        for root_name in root_names:
+            if root_name in done_list:
                 pass
             else:
-                self.queue_lock.lock()
-                self.shared_dict_typ['file_number'] += 1
-                self.queue_lock.unlock()
+                self.shared_dict['stage_metrics'].fail(self.typ, [root_name])
+                if self.typ == 'Motion' and \
+                        self.shared_dict['prefetcher'] is not None:
+                    # Free the prefetch budget, it is prefetched again later
+                    self.shared_dict['prefetcher'].discard(root_name)
+                else:
+                    pass
+                self.add_to_queue(aim=self.typ, root_name=root_name)
+                unfinished_list.append(root_name)
+        return ', '.join(unfinished_list)
+
+    def finish_queue_item(self, root_name):
+        """
+        Mark a queue entry as done.
+
+        Arguments:
+        root_name - Name of the finished entry
+
+        Return:
+        None
+        """
+        self.remove_from_queue_file(root_name)
+        self.queue_lock.lock()
+        try:
+            self.add_to_queue_file(
+                root_name=root_name,
+                file_name=self.shared_dict['typ'][self.typ]['done_file'],
+                )
+        except Exception:
+            raise
+        finally:
+            self.queue_lock.unlock()
+        if self.typ == 'Copy':
+            pass
+        else:
+            self.queue_lock.lock()
+            self.shared_dict_typ['file_number'] += 1
+            self.queue_lock.unlock()
 
     def write_error(self, msg, root_name):
         """
@@ -771,7 +866,20 @@ class ProcessThread(QThread):
         """
         self.shared_dict['typ'][aim]['queue_lock'].lock()
         try:
+            if self.is_combined_file(root_name):
+                # One pending copy of a combined file is enough
+                if root_name in self.shared_dict['typ'][aim]['combined_pending']:
+                    return None
+                else:
+                    self.shared_dict['typ'][aim]['combined_pending'].add(root_name)
+            else:
+                pass
             self.shared_dict['queue'][aim].put(root_name, block=False)
+            self.shared_dict['stage_metrics'].enqueue(aim, root_name)
+            if aim == 'Motion' and self.shared_dict['prefetcher'] is not None:
+                self.shared_dict['prefetcher'].add(root_name)
+            else:
+                pass
             self.add_to_queue_file(
                 root_name=root_name,
                 file_name=self.shared_dict['typ'][aim]['save_file']
@@ -1174,8 +1282,13 @@ class ProcessThread(QThread):
         else:
             pass
 
-        if overall_file_size > \
-                sh.disk_usage(self.settings['project_folder']).free:
+        # Copy from the camera has the highest priority, it is only counted
+        self.throttle(overall_file_size)
+
+        usage = self.shared_dict['capacity_monitor'].get_usage(
+            self.settings['project_folder']
+            )
+        if usage is not None and overall_file_size > usage['free']:
             self.stop = True
             message = '{0}: Not enough space in project folder'.format(
                 self.name
@@ -1183,7 +1296,10 @@ class ProcessThread(QThread):
             self.queue_com['notification'].put(message)
             raise IOError(message)
         else:
-            pass
+            self.shared_dict['capacity_monitor'].consume(
+                self.settings['project_folder'],
+                overall_file_size
+                )
 
         new_stack = '{0}.{1}'.format(
             new_name_stack,
@@ -1209,7 +1325,7 @@ class ProcessThread(QThread):
             out.write(newstack_command)
             with open(file_stderr, 'w') as err:
                 start_time = ti.time()
-                sp.Popen(newstack_command.split(), stdout=out, stderr=err).wait()
+                self.run_command(command=newstack_command, out=out, err=err)
                 stop_time = ti.time()
                 out.write('\nTime: {0} sec'.format(stop_time - start_time))
 
@@ -1665,8 +1781,13 @@ class ProcessThread(QThread):
                     queue_com=self.queue_com,
                     name=self.name
                     )
+                prefetcher = self.shared_dict['prefetcher']
+                if prefetcher is not None:
+                    file_read = prefetcher.get(file_input)
+                else:
+                    file_read = file_input
                 command = tum.get_motion_command(
-                    file_input=file_input,
+                    file_input=file_read,
                     file_output_scratch=file_output_scratch,
                     file_log_scratch=file_log_scratch,
                     queue_com=self.queue_com,
@@ -1674,13 +1795,22 @@ class ProcessThread(QThread):
                     settings=self.settings,
                     )
 
-                with open(file_stdout_scratch, 'w') as out:
-                    out.write(command)
-                    with open(file_stderr_scratch, 'w') as err:
-                        start_time = ti.time()
-                        sp.Popen(command.split(), stdout=out, stderr=err).wait()
-                        stop_time = ti.time()
-                        out.write('\nTime: {0} sec'.format(stop_time - start_time))
+                try:
+                    with open(file_stdout_scratch, 'w') as out:
+                        with open(file_stderr_scratch, 'w') as err:
+                            self.run_gpu_command(
+                                command=command,
+                                flag='-Gpu',
+                                out=out,
+                                err=err
+                                )
+                except Exception:
+                    raise
+                finally:
+                    if prefetcher is not None:
+                        prefetcher.release(file_input)
+                    else:
+                        pass
 
                 # Move DW file
                 if do_dw:
@@ -1704,7 +1834,12 @@ class ProcessThread(QThread):
                     out.write(command)
                     with open(file_stderr_scratch, 'w') as err:
                         start_time = ti.time()
-                        sp.Popen(command, shell=True, stdout=out, stderr=err).wait()
+                        self.run_command(
+                            command=command,
+                            out=out,
+                            err=err,
+                            shell=True
+                            )
                         stop_time = ti.time()
                         out.write('\nTime: {0} sec'.format(stop_time - start_time))
 
@@ -1843,6 +1978,144 @@ class ProcessThread(QThread):
         finally:
             self.queue_lock.unlock()
 
+    def is_stopped(self):
+        """
+        Check if the user pressed Stop.
+
+        Returns:
+        True, if the process should stop
+        """
+        return self.stop
+
+    def get_record_file(self):
+        """
+        File to write the resources used by the programs of this process to.
+
+        Returns:
+        File path
+        """
+        return os.path.join(
+            self.settings['resources_folder'],
+            '{0}.txt'.format(self.name)
+            )
+
+    def run_command(self, command, out, err, shell=False, file_number=1):
+        """
+        Run a program with the timeout of this process type.
+        The program is killed if the user presses Stop.
+
+        command - Command to run
+        out - Opened file for the program output
+        err - Opened file for error messages
+        shell - Run the command in a shell
+        file_number - Number of files the program handles, scales the timeout
+
+        Returns:
+        Exit status
+        """
+        return te.run_command(
+            command=command,
+            out=out,
+            err=err,
+            tool=self.typ,
+            settings=self.settings,
+            stop_check=self.is_stopped,
+            record_file=self.get_record_file(),
+            shell=shell,
+            file_number=file_number
+            )
+
+    def call_copy_helper(self, op, **kwargs):
+        """
+        Send a request to the copy helper and wait for it.
+        The helper runs as another user, so only the wall time and the
+        exit status are recorded.
+
+        op - Operation: copy, append, mkdir or fsync
+        kwargs - Arguments of the operation
+
+        Returns:
+        None
+        """
+        job = te.create_job(
+            command='copy helper {0} {1}'.format(
+                op,
+                ' '.join(str(value) for value in kwargs.values())
+                ),
+            tool=self.typ,
+            settings=self.settings
+            )
+        try:
+            self.get_copy_helper().call(op, stop_check=self.is_stopped, **kwargs)
+        except te.ProcessStopped:
+            job['stopped'] = True
+            job['status'] = 1
+            raise
+        except Exception:
+            job['status'] = 1
+            raise
+        else:
+            job['status'] = 0
+        finally:
+            job['stop_time'] = ti.time()
+            te.write_record(job=job, record_file=self.get_record_file())
+
+    def run_gpu_command(self, command, flag, out, err):
+        """
+        Run a GPU program on a slot leased from the GPU scheduler.
+        Without scheduler the device ids of the settings are used.
+
+        command - Command to run
+        flag - Command line flag for the device id
+        out - Opened file for the program output
+        err - Opened file for error messages
+
+        Returns:
+        None
+        """
+        scheduler = self.shared_dict['gpu_scheduler']
+        if scheduler is None:
+            slot_list = None
+        else:
+            devices = scheduler.get_devices(command=command, flag=flag)
+            if scheduler.keeps_devices(devices):
+                # Configured devices are kept, all of them are leased
+                slot_list = scheduler.lease_devices(
+                    owner=self.name,
+                    devices=devices
+                    )
+            else:
+                slot = scheduler.lease(owner=self.name)
+                if slot is not None:
+                    slot_list = [slot]
+                    command = scheduler.inject_device(
+                        command=command,
+                        flag=flag,
+                        device=slot['device']
+                        )
+                else:
+                    slot_list = None
+            if slot_list is None:
+                # The scheduler has been closed, the run stops
+                raise te.ProcessStopped(command)
+            else:
+                pass
+
+        try:
+            out.write(command)
+            start_time = ti.time()
+            self.run_command(command=command, out=out, err=err)
+            stop_time = ti.time()
+            out.write('\nTime: {0} sec'.format(stop_time - start_time))
+        except Exception:
+            raise
+        finally:
+            if slot_list is not None:
+                for slot in slot_list:
+                    scheduler.release(slot)
+            else:
+                pass
+
     def run_ctf(self, root_name):
         """
         Run CTF estimation.
@@ -1867,7 +2140,7 @@ class ProcessThread(QThread):
             )
 
         # Create the command
-        command, check_files = tuc.get_ctf_command(
+        command, check_files, input_lines = tuc.get_ctf_command(
             file_input=file_input,
             new_name=new_name,
             settings=self.settings,
@@ -1886,28 +2159,263 @@ class ProcessThread(QThread):
             )
 
         # Run the command
-        with open(out_file, 'w') as out:
-            out.write(command)
-            with open(err_file, 'w') as err:
-                start_time = ti.time()
-                sp.Popen(command, shell=True, stdout=out, stderr=err).wait()
-                stop_time = ti.time()
-                out.write('\nTime: {0} sec'.format(stop_time - start_time))
-
-        zero_list = [err_file]
-        non_zero_list = [out_file]
-        non_zero_list.extend(check_files)
+        if self.settings['Copy']['CTF'].startswith('Gctf'):
+            with open(out_file, 'w') as out:
+                with open(err_file, 'w') as err:
+                    self.run_gpu_command(
+                        command=command,
+                        flag='--gid',
+                        out=out,
+                        err=err
+                        )
+        else:
+            with open(out_file, 'w') as out:
+                out.write(command)
+                if input_lines is not None:
+                    out.write('\n{0}\n'.format('\n'.join(input_lines)))
+                else:
+                    pass
+                with open(err_file, 'w') as err:
+                    start_time = ti.time()
+                    if input_lines is None:
+                        self.run_command(command=command, out=out, err=err)
+                    else:
+                        job = self.shared_dict['ctffind_pool'].run(
+                            input_lines=input_lines,
+                            out=out,
+                            err=err,
+                            settings=self.settings,
+                            stop_check=self.is_stopped
+                            )
+                        te.write_record(
+                            job=job,
+                            record_file=self.get_record_file()
+                            )
+                        if job['stopped']:
+                            raise te.ProcessStopped(command)
+                        else:
+                            pass
+                    stop_time = ti.time()
+                    out.write('\nTime: {0} sec'.format(stop_time - start_time))
 
         root_path = os.path.join(os.path.dirname(root_name), file_name)
-        log_files, copied_log_files = tuc.find_logfiles(
+        copied_log_files = self.check_ctf_outputs(
+            root_path=root_path,
+            file_name=file_name,
+            out_file=out_file,
+            err_file=err_file,
+            check_files=check_files,
+            command=command
+            )
+
+        # Combine output files
+        output_name_partres, output_name_star = tuc.combine_ctf_outputs(
             root_path=root_path,
             file_name=file_name,
             settings=self.settings,
             queue_com=self.queue_com,
-            name=self.name
+            shared_dict=self.shared_dict,
+            name=self.name,
+            sum_file=sum_file
+            )
+        self.add_ctf_combined_to_queue(
+            output_name_partres=output_name_partres,
+            output_name_star=output_name_star
+            )
+        self.add_ctf_to_queue(
+            file_input=file_input,
+            copied_log_files=copied_log_files
             )
 
-        try:
+        # Plot CTF information
+        self.queue_com['plot_ctf'].put(True)
+
+    def run_ctf_batch(self, root_names, done_list):
+        """
+        Run CTF estimation for several files in one program call.
+
+        root_names - names of the files to process.
+        done_list - list to append the finished names to.
+
+        Returns:
+        None
+        """
+        # Group the inputs by folder and extension, one call per group
+        group_dict = {}
+        group_order = []
+        for entry in root_names:
+            if ';;;' in entry:
+                sum_file, file_input = entry.split(';;;')
+            else:
+                sum_file = entry
+                file_input = entry
+            root_name, extension = os.path.splitext(file_input)
+            key = (os.path.dirname(file_input), extension)
+            if key not in group_dict:
+                group_dict[key] = []
+                group_order.append(key)
+            else:
+                pass
+            group_dict[key].append([entry, sum_file, file_input, root_name])
+
+        batch_dir = os.path.join(
+            self.settings['ctf_folder'],
+            '.batch_{0}'.format(self.name.replace(' ', '_'))
+            )
+        finished_list = []
+        failed_list = []
+        for key in group_order:
+            entries = group_dict[key]
+
+            # Create the command
+            command, check_files = tuc.get_ctf_batch_command(
+                file_inputs=[entry[2] for entry in entries],
+                batch_dir=batch_dir,
+                settings=self.settings,
+                queue_com=self.queue_com,
+                name=self.name
+                )
+
+            # Log files
+            batch_out_file = '{0}.log'.format(batch_dir)
+            batch_err_file = '{0}.err'.format(batch_dir)
+
+            # Run the command
+            with open(batch_out_file, 'w') as out:
+                out.write(command)
+                with open(batch_err_file, 'w') as err:
+                    start_time = ti.time()
+                    self.run_command(
+                        command=command,
+                        out=out,
+                        err=err,
+                        file_number=len(entries)
+                        )
+                    stop_time = ti.time()
+                    out.write('\nTime: {0} sec for {1} files'.format(
+                        stop_time - start_time,
+                        len(entries)
+                        ))
+
+            tus.check_outputs(
+                zero_list=[],
+                non_zero_list=[batch_out_file] + check_files,
+                folder=self.settings['ctf_folder'],
+                command=command
+                )
+
+            # Split the batch into the single file layout
+            for entry, sum_file, file_input, root_name in entries:
+                file_name = os.path.basename(root_name)
+                output_dir = os.path.join(
+                    self.settings['ctf_folder'],
+                    file_name
+                    )
+                out_file = os.path.join(
+                    self.settings['ctf_folder'],
+                    '{0}.log'.format(file_name)
+                    )
+                err_file = os.path.join(
+                    self.settings['ctf_folder'],
+                    '{0}.err'.format(file_name)
+                    )
+                try:
+                    tuc.split_ctf_batch(
+                        batch_dir=batch_dir,
+                        file_input=file_input,
+                        output_dir=output_dir
+                        )
+                    tu.copy(batch_out_file, out_file)
+                    tu.copy(batch_err_file, err_file)
+                    root_path = os.path.join(
+                        os.path.dirname(root_name),
+                        file_name
+                        )
+                    copied_log_files = self.check_ctf_outputs(
+                        root_path=root_path,
+                        file_name=file_name,
+                        out_file=out_file,
+                        err_file=err_file,
+                        check_files=['{0}/partres.txt'.format(output_dir)],
+                        command=command
+                        )
+                except Exception:
+                    self.write_error(msg=tb.format_exc(), root_name=entry)
+                    failed_list.append(entry)
+                else:
+                    finished_list.append([
+                        entry,
+                        sum_file,
+                        file_input,
+                        root_path,
+                        file_name,
+                        copied_log_files
+                        ])
+
+        if finished_list:
+            # Combine output files once for the whole batch
+            _, _, _, root_path, file_name, _ = finished_list[-1]
+            output_name_partres, output_name_star = tuc.combine_ctf_outputs(
+                root_path=root_path,
+                file_name=file_name,
+                settings=self.settings,
+                queue_com=self.queue_com,
+                shared_dict=self.shared_dict,
+                name=self.name,
+                sum_file=finished_list[-1][1]
+                )
+            self.add_ctf_combined_to_queue(
+                output_name_partres=output_name_partres,
+                output_name_star=output_name_star
+                )
+            for entry, _, file_input, _, _, copied_log_files in finished_list:
+                self.add_ctf_to_queue(
+                    file_input=file_input,
+                    copied_log_files=copied_log_files
+                    )
+                done_list.append(entry)
+
+            # Plot CTF information
+            self.queue_com['plot_ctf'].put(True)
+        else:
+            pass
+
+        if failed_list:
+            raise Exception('CTF batch failed for: {0}'.format(
+                ', '.join(failed_list)
+                ))
+        else:
+            pass
+
+    def check_ctf_outputs(
+            self, root_path, file_name, out_file, err_file, check_files, command
+            ):
+        """
+        Check the CTF outputs and move the log files to the ctf folder.
+
+        root_path - Root path of the input file
+        file_name - Name of the file without extension
+        out_file - Log file
+        err_file - Error file
+        check_files - Files that need to exist after the estimation
+        command - Command that has been run
+
+        Returns:
+        List of output files
+        """
+        zero_list = [err_file]
+        non_zero_list = [out_file]
+        non_zero_list.extend(check_files)
+
+        log_files, copied_log_files = tuc.find_logfiles(
+            root_path=root_path,
+            file_name=file_name,
+            settings=self.settings,
+            queue_com=self.queue_com,
+            name=self.name
+            )
+
+        try:
             log_files.remove(err_file)
             copied_log_files.remove(err_file)
         except ValueError:
@@ -1942,18 +2450,18 @@ class ProcessThread(QThread):
         copied_log_files.extend(non_zero_list)
         copied_log_files.extend(zero_list)
         copied_log_files = list(set(copied_log_files))
+        return copied_log_files
 
-        # Combine output files
-        output_name_partres, output_name_star = tuc.combine_ctf_outputs(
-            root_path=root_path,
-            file_name=file_name,
-            settings=self.settings,
-            queue_com=self.queue_com,
-            shared_dict=self.shared_dict,
-            name=self.name,
-            sum_file=sum_file
-            )
+    def add_ctf_combined_to_queue(self, output_name_partres, output_name_star):
+        """
+        Add the combined CTF files to the copy queues.
 
+        output_name_partres - Combined partres file
+        output_name_star - Combined star file
+
+        Returns:
+        None
+        """
         if not self.settings['Copy']['Copy to work'] == 'False':
             self.add_to_queue(aim='Copy_work', root_name=output_name_partres)
             self.add_to_queue(aim='Copy_work', root_name=output_name_star)
@@ -1970,6 +2478,16 @@ class ProcessThread(QThread):
         else:
             pass
 
+    def add_ctf_to_queue(self, file_input, copied_log_files):
+        """
+        Add the CTF results of one file to the following queues.
+
+        file_input - Input file of the estimation
+        copied_log_files - Output files of the estimation
+
+        Returns:
+        None
+        """
         # Add to queue
         for aim in self.content_settings['aim']:
             *compare, aim_name = aim.split(':')
@@ -1997,9 +2515,6 @@ class ProcessThread(QThread):
             else:
                 pass
 
-        # Plot CTF information
-        self.queue_com['plot_ctf'].put(True)
-
     def run_compress(self, root_name):
         """
         Compress stack.
@@ -2063,7 +2578,7 @@ class ProcessThread(QThread):
                 out.write(command)
                 with open(err_file, 'w') as err:
                     start_time = ti.time()
-                    sp.Popen(command.split(), stdout=out, stderr=err).wait()
+                    self.run_command(command=command, out=out, err=err)
                     stop_time = ti.time()
                     out.write('\nTime: {0} sec'.format(stop_time - start_time))
 
@@ -2117,10 +2632,74 @@ class ProcessThread(QThread):
         Returns:
         None
         """
+        mount_name = self.settings['Copy'][self.typ]
+        sudo = self.settings['Mount'][mount_name]['Need sudo for copy?']
+
+        if sudo == 'True':
+            copy_method = self.copy_as_another_user
+        else:
+            copy_method = self.copy_as_user
+
+        new_name, hdd_folder, file_size = self.get_copy_extern_name(
+            root_name=root_name
+            )
+        if hdd_folder is None:
+            copy_method(root_name, new_name)
+            self.add_to_quota(root_name=root_name, new_name=new_name)
+        else:
+            placement = self.shared_dict['hdd_placement']
+            if self.is_combined_file(root_name):
+                pin = root_name
+            else:
+                pin = None
+            written = False
+            placement.lock_disk(hdd_folder)
+            try:
+                copy_method(root_name, new_name)
+                written = True
+                self.add_to_quota(root_name=root_name, new_name=new_name)
+            except Exception:
+                raise
+            finally:
+                placement.unlock_disk(hdd_folder)
+                placement.release(hdd_folder, file_size, written, pin=pin)
+
+    def add_to_quota(self, root_name, new_name):
+        """
+        Add a copied file to the used space of the target mount point.
+        Combined files are rewritten in place and are left to the next scan.
+
+        root_name - Root name of the copied file
+        new_name - Name of the copy
 
+        Returns:
+        None
+        """
+        if self.shared_dict['quota_tracker'] is None or \
+                self.is_combined_file(root_name):
+            return None
+        else:
+            pass
+        try:
+            file_size = os.path.getsize(root_name)
+        except OSError:
+            return None
+        self.shared_dict['quota_tracker'].add(new_name, file_size)
+
+    def get_copy_extern_name(self, root_name):
+        """
+        Name of the file on Work/Backup/HDD.
+        For HDDs the space is reserved and needs to be released after the copy.
+
+        root_name - Root name of the file to copy
+
+        Returns:
+        New file name
+        HDD folder, None if not copied to HDD
+        Bytes reserved on the HDD
+        """
         mount_folder_name = '{0}_folder'.format(self.typ)
         mount_name = self.settings['Copy'][self.typ]
-        sudo = self.settings['Mount'][mount_name]['Need sudo for copy?']
         protocol = self.settings['Mount'][mount_name]['Protocol']
         new_suffix = root_name.replace(
             self.settings['General']['Project directory'],
@@ -2129,34 +2708,244 @@ class ProcessThread(QThread):
         new_suffix = new_suffix.split('/')
         new_prefix = os.path.relpath(self.settings[mount_folder_name]).split('/')
 
-        if sudo == 'True':
-            copy_method = self.copy_as_another_user
+        if protocol == 'hdd':
+            placement = self.shared_dict['hdd_placement']
+            file_size = os.path.getsize(root_name)
+            if self.settings['General']['Rename micrographs'] == 'True':
+                prefix = self.settings['General']['Rename prefix']
+            else:
+                prefix = ''
+            if self.is_combined_file(root_name):
+                # Only the appended part is written to the pinned disk
+                pin = root_name
+                file_size = placement.get_written_size(pin, file_size)
+            else:
+                pin = None
+            hdd_folder = placement.place(
+                size=file_size,
+                group=HddPlacement.get_group(root_name, prefix=prefix),
+                pin=pin
+                )
+            if hdd_folder is None:
+                raise IOError('No space on HDD left!')
+            else:
+                new_name = os.path.join(
+                    *new_prefix,
+                    os.path.basename(hdd_folder),
+                    *new_suffix
+                    )
         else:
-            copy_method = self.copy_as_user
+            hdd_folder = None
+            file_size = 0
+            new_name = os.path.join(*new_prefix, *new_suffix)
 
-        if protocol == 'hdd':
-            for hdd_folder in glob.glob(
-                    '{0}/*'.format(
-                        self.settings[mount_folder_name]
-                        )
-                    ):
-                if os.path.getsize(root_name) > \
-                        sh.disk_usage(hdd_folder).free:
-                    new_name = None
+        return new_name, hdd_folder, file_size
+
+    def run_copy_extern_batch(self, root_names, done_list):
+        """
+        Copy several files to Work/Backup/HDD with one rsync per destination.
+
+        root_names - Root names of the files to copy
+        done_list - list to append the finished names to.
+
+        Returns:
+        None
+        """
+        mount_name = self.settings['Copy'][self.typ]
+        sudo = self.settings['Mount'][mount_name]['Need sudo for copy?']
+        placement = self.shared_dict['hdd_placement']
+
+        # Group by source and destination base directory
+        group_dict = {}
+        group_order = []
+        reserved_list = []
+        failed_list = []
+        try:
+            for root_name in root_names:
+                if self.is_combined_file(root_name):
+                    # Combined files are still written to, copy them alone
+                    self.run_copy_extern(root_name=root_name)
+                    done_list.append(root_name)
                     continue
                 else:
-                    new_name = os.path.join(
-                        *new_prefix,
-                        os.path.basename(hdd_folder),
-                        *new_suffix
-                        )
-                    break
-            if new_name is None:
-                raise IOError('No space on HDD left!')
+                    pass
+
+                new_name, hdd_folder, file_size = self.get_copy_extern_name(
+                    root_name=root_name
+                    )
+                if hdd_folder is not None:
+                    reserved_list.append([root_name, hdd_folder, file_size])
+                else:
+                    pass
+                relative_name = os.path.join(*[
+                    entry
+                    for entry in root_name.replace(
+                        self.settings['General']['Project directory'],
+                        ''
+                        ).split('/')
+                    if entry
+                    ])
+                key = (
+                    root_name[:-len(relative_name)] or '/',
+                    new_name[:-len(relative_name)] or './',
+                    hdd_folder
+                    )
+                if key not in group_dict:
+                    group_dict[key] = {}
+                    group_order.append(key)
+                else:
+                    pass
+                group_dict[key][relative_name] = root_name
+
+            for key in group_order:
+                source_dir, target_dir, hdd_folder = key
+                file_dict = group_dict[key]
+                if hdd_folder is not None:
+                    placement.lock_disk(hdd_folder)
+                else:
+                    pass
+                try:
+                    if sudo == 'True':
+                        copied_list = self.copy_files_as_another_user(
+                            source_dir=source_dir,
+                            target_dir=target_dir,
+                            relative_names=list(file_dict.keys())
+                            )
+                    else:
+                        copied_list = self.rsync_files(
+                            source_dir=source_dir,
+                            target_dir=target_dir,
+                            relative_names=list(file_dict.keys())
+                            )
+                except Exception:
+                    raise
+                finally:
+                    if hdd_folder is not None:
+                        placement.unlock_disk(hdd_folder)
+                    else:
+                        pass
+                for relative_name, root_name in file_dict.items():
+                    if relative_name in copied_list:
+                        done_list.append(root_name)
+                        self.add_to_quota(
+                            root_name=root_name,
+                            new_name=os.path.join(target_dir, relative_name)
+                            )
+                    else:
+                        failed_list.append(root_name)
+        except Exception:
+            raise
+        finally:
+            for root_name, hdd_folder, file_size in reserved_list:
+                placement.release(
+                    hdd_folder,
+                    file_size,
+                    bool(root_name in done_list)
+                    )
+
+        if failed_list:
+            raise IOError('Cannot copy files: {0}!'.format(
+                ', '.join(failed_list)
+                ))
         else:
-            new_name = os.path.join(*new_prefix, *new_suffix)
+            pass
+
+    def rsync_files(self, source_dir, target_dir, relative_names):
+        """
+        Copy files with one rsync call.
 
-        copy_method(root_name, new_name)
+        source_dir - Source base directory
+        target_dir - Target base directory
+        relative_names - File names relative to the source directory
+
+        Returns:
+        List of relative names rsync reported as transferred or up to date
+        """
+        list_file = tempfile.NamedTemporaryFile(
+            mode='w',
+            prefix='transphire_',
+            suffix='_files_from.txt',
+            delete=False
+            )
+        try:
+            with list_file:
+                list_file.write('{0}\n'.format('\n'.join(relative_names)))
+
+            governor = self.shared_dict['bandwidth_governor']
+            rate_limit = governor.get_rate_limit(self.typ)
+            if rate_limit:
+                bwlimit = '--bwlimit={0} '.format(max(int(rate_limit / 1024), 1))
+            else:
+                bwlimit = ''
+            # Keep mtimes and permissions like shutil.copy2, so reruns
+            # skip the unchanged files
+            command = 'rsync -ii -t -p {0}--files-from={1} {2}/ {3}/'.format(
+                bwlimit,
+                list_file.name,
+                source_dir.rstrip('/'),
+                target_dir.rstrip('/')
+                )
+            governor.acquire(
+                self.typ,
+                sum([
+                    os.path.getsize(os.path.join(source_dir, relative_name))
+                    for relative_name in relative_names
+                    ]),
+                stop_check=self.is_stopped
+                )
+            tu.mkdir_p(target_dir)
+            with tempfile.TemporaryFile(mode='w+') as out:
+                self.run_command(
+                    command=command,
+                    out=out,
+                    err=out,
+                    file_number=len(relative_names)
+                    )
+                out.seek(0)
+                output = out.read()
+        except Exception:
+            raise
+        finally:
+            os.remove(list_file.name)
+
+        # Itemized lines look like: >f+++++++++ Stack/file.mrc
+        copied_list = []
+        for line in output.splitlines():
+            match = re.match(r'^[<>ch.]f\S*\s+(.*)$', line.strip())
+            if match is not None:
+                copied_list.append(match.group(1))
+            else:
+                pass
+
+        if len(copied_list) != len(relative_names):
+            self.write_error(msg=output, root_name=command)
+        else:
+            pass
+
+        governor.add_transferred(
+            self.typ,
+            sum([
+                os.path.getsize(os.path.join(source_dir, relative_name))
+                for relative_name in copied_list
+                ])
+            )
+        return copied_list
+
+    @staticmethod
+    def is_combined_file(file_name):
+        """
+        Check, if the file is one of the combined files that grow during the run.
+
+        file_name - File to check
+
+        Returns:
+        True, if it is a combined file
+        """
+        return bool(
+            'Translation_file.txt' in file_name or
+            '_transphire_partres.txt' in file_name or
+            '_transphire.star' in file_name
+            )
 
     def copy_as_user(self, file_in, file_out):
         """
@@ -2168,103 +2957,256 @@ class ProcessThread(QThread):
         Returns:
         None
         """
-        self.check_ready_for_copy(file_out=file_out)
-
         tu.mkdir_p(os.path.dirname(file_out))
-        tu.copy(file_in, file_out)
+        if self.is_combined_file(file_in):
+            self.copy_combined(file_in=file_in, file_out=file_out, sudo=False)
+        else:
+            governor = self.shared_dict['bandwidth_governor']
+            if governor.is_limited(self.typ):
+                tu.copy(file_in, file_out, throttle=self.throttle)
+            else:
+                tu.copy(file_in, file_out)
+                governor.add_transferred(self.typ, os.path.getsize(file_out))
+
+    def throttle(self, size):
+        """
+        Wait for the bandwidth of the next bytes of this stage.
 
+        size - Number of bytes to transfer
 
-    def check_ready_for_copy(self, file_out):
+        Returns:
+        None
         """
-        Check, if the current file is ready to copy.
+        governor = self.shared_dict['bandwidth_governor']
+        if governor.is_limited(self.typ):
+            governor.acquire(self.typ, size, stop_check=self.is_stopped)
+        else:
+            pass
+        governor.add_transferred(self.typ, size)
 
-        file_out - File to copy
+    def get_rate(self):
+        """
+        Achieved transfer rate of the copy stages for the status widget.
 
         Returns:
-        True, if ready
-        """
-        if 'Translation_file.txt' in file_out:
-            while True:
-                is_locked = bool(not self.shared_dict['translate_lock'].tryLock())
-                if not is_locked:
-                    self.shared_dict['translate_lock'].unlock()
-                    break
-                else:
-                    QThread.msleep(100)
-        elif '_transphire_partres.txt' in file_out:
-            while True:
-                is_locked = bool(not self.shared_dict['ctf_partres_lock'].tryLock())
-                if not is_locked:
-                    self.shared_dict['ctf_partres_lock'].unlock()
-                    break
-                else:
-                    QThread.msleep(100)
-        elif '_transphire.star' in file_out:
-            while True:
-                is_locked = bool(not self.shared_dict['ctf_star_lock'].tryLock())
-                if not is_locked:
-                    self.shared_dict['ctf_star_lock'].unlock()
-                    break
-                else:
-                    QThread.msleep(100)
+        Rate in MB/s, None for the other stages
+        """
+        if self.typ in ('Copy', 'Copy_work', 'Copy_backup', 'Copy_hdd'):
+            return self.shared_dict['bandwidth_governor'].get_achieved_rate(
+                self.typ
+                ) / 1024**2
+        else:
+            return None
+
+    def put_status(self, state, color, queue_size=None, done=None, rate=None, minutes=None):
+        """
+        Send the status to the process worker.
+        The values are rounded to the shown precision and only sent if
+        they changed since the last call.
+
+        state - State, e.g. Running
+        color - Color of the text
+        queue_size - Number of files in the queue
+        done - Number of processed files
+        rate - Transfer rate in MB/s
+        minutes - Minutes since the last success
+
+        Returns:
+        None
+        """
+        status = {
+            'device': self.name,
+            'state': state,
+            'color': color,
+            'queue_size': queue_size,
+            'done': done,
+            'rate': None if rate is None else round(rate),
+            'minutes': None if minutes is None else round(minutes, 1),
+            }
+        if status != self.last_status:
+            self.last_status = status
+            self.queue_com['status'].put(status)
         else:
             pass
-        return True
 
-    def copy_as_another_user(self, file_in, file_out):
+    def copy_combined(self, file_in, file_out, sudo):
         """
-        Copy to device as another user via sudo.
+        Copy a combined file that grows during the run.
+        The writer is only blocked for a local snapshot.
+        Translation_file.txt is only appended to, so only the new lines are
+        transferred; the rewritten CTF files use the rsync delta transfer.
 
         file_in - Input file path
         file_out - Output file path
+        sudo - Copy as another user via the copy helper
 
         Returns:
         None
         """
-        self.shared_dict['global_lock'].lock()
-        self.check_ready_for_copy(file_out=file_out)
+        if 'Translation_file.txt' in file_in:
+            lock = self.shared_dict['translate_lock']
+        elif '_transphire_partres.txt' in file_in:
+            lock = self.shared_dict['ctf_partres_lock']
+        else:
+            lock = self.shared_dict['ctf_star_lock']
+
+        snapshot = os.path.join(
+            self.settings['queue_folder'],
+            '.{0}_{1}'.format(self.name, os.path.basename(file_in))
+            )
+        lock.lock()
+        try:
+            tu.copy(file_in, snapshot)
+        except Exception:
+            raise
+        finally:
+            lock.unlock()
+        # The sudo user has to be able to read the snapshot.
+        os.chmod(snapshot, 0o644)
 
         try:
-            self.mkdir_p_as_another_user(folder=os.path.dirname(file_out))
-            command = 'sudo -k -S -u {0} rsync {1} {2}'.format(
-                self.user,
-                file_in,
-                file_out
-                )
-            child = pe.spawnu(command)
-            child.sendline(self.password)
-            child.expect(pe.EOF)
+            if sudo:
+                if 'Translation_file.txt' in file_in:
+                    operation = 'append'
+                else:
+                    operation = 'copy'
+                self.call_copy_helper(
+                    operation,
+                    src=snapshot,
+                    dst=file_out
+                    )
+            elif 'Translation_file.txt' in file_in:
+                tch.append(src=snapshot, dst=file_out)
+            else:
+                command = 'rsync --no-whole-file --inplace {0} {1}'.format(
+                    snapshot,
+                    file_out
+                    )
+                with tempfile.TemporaryFile(mode='w+') as out:
+                    status = self.run_command(command=command, out=out, err=out)
+                    out.seek(0)
+                    output = out.read()
+                if status:
+                    raise IOError('Cannot copy file: {0}! {1}'.format(
+                        file_out,
+                        output
+                        ))
+                else:
+                    pass
         except Exception:
             raise
         finally:
-            self.shared_dict['global_lock'].unlock()
+            os.remove(snapshot)
+
+    def copy_as_another_user(self, file_in, file_out):
+        """
+        Copy to device as another user via the copy helper.
+
+        file_in - Input file path
+        file_out - Output file path
 
-        if 'rsync:' in child.before:
-            text = child.before.replace(self.password, 'PASSWORD')
-            raise IOError(
-                'Cannot copy file: {0}! {1}'.format(file_out, text)
+        Returns:
+        None
+        """
+        if self.is_combined_file(file_in):
+            self.copy_combined(file_in=file_in, file_out=file_out, sudo=True)
+        else:
+            self.throttle(os.path.getsize(file_in))
+            self.call_copy_helper(
+                'copy',
+                src=file_in,
+                dst=file_out
                 )
+
+    def copy_files_as_another_user(self, source_dir, target_dir, relative_names):
+        """
+        Copy several files in parallel as another user via the copy helper.
+
+        source_dir - Source base directory
+        target_dir - Target base directory
+        relative_names - File names relative to the source directory
+
+        Returns:
+        List of relative names that have been copied
+        """
+        helper = self.get_copy_helper()
+        job = te.create_job(
+            command='copy helper copy {0} files'.format(len(relative_names)),
+            tool=self.typ,
+            settings=self.settings,
+            file_number=len(relative_names)
+            )
+        request_dict = {}
+        for relative_name in relative_names:
+            self.throttle(os.path.getsize(os.path.join(source_dir, relative_name)))
+            request_id = helper.submit(
+                'copy',
+                src=os.path.join(source_dir, relative_name),
+                dst=os.path.join(target_dir, relative_name)
+                )
+            request_dict[request_id] = relative_name
+
+        try:
+            answers = helper.wait(
+                list(request_dict.keys()),
+                stop_check=self.is_stopped
+                )
+        except te.ProcessStopped:
+            job['stopped'] = True
+            job['status'] = 1
+            raise
+        except Exception:
+            job['status'] = 1
+            raise
         else:
-            pass
+            job['status'] = len([
+                error for error in answers.values() if error is not None
+                ])
+        finally:
+            job['stop_time'] = ti.time()
+            te.write_record(job=job, record_file=self.get_record_file())
+
+        copied_list = []
+        for request_id, error in answers.items():
+            if error is None:
+                copied_list.append(request_dict[request_id])
+            else:
+                self.write_error(msg=error, root_name=request_dict[request_id])
+        return copied_list
 
     def mkdir_p_as_another_user(self, folder):
         """
-        Create folders recursively as another user with the help of sudo.
+        Create folders recursively as another user via the copy helper.
 
         folder - Folder structure to create
 
         Returns:
         None
         """
-        command = 'sudo -k -S -u {0} mkdir -p {1}'.format(self.user, folder)
-        child = pe.spawnu(command)
-        child.sendline(self.password)
-        child.expect(pe.EOF)
-        if 'mkdir:' in child.before:
-            text = child.before.replace(self.password, 'PASSWORD')
-            raise IOError(
-                'Cannot create directory: {0}! {1}'.format(folder, text)
-                )
-        else:
-            pass
+        self.call_copy_helper('mkdir', path=folder)
+
+    def get_copy_helper(self):
+        """
+        Copy helper of the target user, started on first use.
+        One sudo authentication per user and TranSPHIRE run.
 
+        Returns:
+        Copy helper
+        """
+        self.shared_dict['copy_helper_lock'].lock()
+        try:
+            helper = self.shared_dict['copy_helper'].get(self.user)
+            if helper is None or not helper.is_alive():
+                helper = CopyHelper(
+                    user=self.user,
+                    password=self.password,
+                    workers=int(self.settings['General']['Copy helper workers'])
+                    )
+                self.shared_dict['copy_helper'][self.user] = helper
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.shared_dict['copy_helper_lock'].unlock()
+        return helper
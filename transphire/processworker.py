@@ -17,6 +17,7 @@
 """
 import os
 import glob
+import time as ti
 import copy as cp
 import queue as qu
 try:
@@ -24,7 +25,18 @@ try:
 except ImportError:
     from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QThread, QMutex
 from transphire.processthread import ProcessThread
+from transphire.ctffindpool import CtffindPool
+from transphire.gpuscheduler import GpuScheduler
+from transphire.hddplacement import HddPlacement
+from transphire.capacitymonitor import CapacityMonitor
+from transphire.prefetcher import Prefetcher
+from transphire.bandwidthgovernor import BandwidthGovernor
+from transphire.stagemetrics import StageMetrics
+from transphire.mountmonitor import MountMonitor, LATENCY_BINS, probe_folders
 from transphire import transphire_utils as tu
+from transphire import transphire_motion as tum
+from transphire import transphire_ctf as tuc
+from transphire import transphire_template as tt
 
 
 class ProcessWorker(QObject):
@@ -42,6 +54,8 @@ class ProcessWorker(QObject):
     sig_finished - Emitted, if run method finishes (No objects)
     sig_error - Emitted, if an error occured (text|str)
     sig_status - Emitted to change the status (text|str, device|str, color|str)
+    sig_status_data - Emitted with the structured status of a thread (status|object)
+    sig_metrics - Emitted with the metrics of the stages (metrics|object)
     sig_notification - Emitted to send a notification (text|str)
     sig_plot_ctf - Emitted to plot ctf information (ctf_name|str, ctf_settings|object, settings|object)
     sig_plot_motion - Emitted to plot motion information (motion_name|str, motion_settings|object, settings|object)
@@ -50,11 +64,16 @@ class ProcessWorker(QObject):
     sig_finished = pyqtSignal()
     sig_error = pyqtSignal(str)
     sig_status = pyqtSignal(str, str, str)
+    sig_status_data = pyqtSignal(object)
+    sig_metrics = pyqtSignal(object)
     sig_notification = pyqtSignal(str)
     sig_plot_ctf = pyqtSignal(str, object, object)
     sig_plot_motion = pyqtSignal(str, object, object)
 
-    def __init__(self, password, content_process, mount_directory, parent=None):
+    def __init__(
+            self, password, content_process, mount_directory,
+            quota_tracker=None, capacity_monitor=None, parent=None
+            ):
         """
         Initialize object variables.
 
@@ -62,6 +81,8 @@ class ProcessWorker(QObject):
         password - Sudo password
         content_process - Pipeline content
         mount_directory - Folder containing the mount points
+        quota_tracker - QuotaTracker to add the copied bytes to
+        capacity_monitor - Running CapacityMonitor shared with the MountWorker
         parent - Parent widget (default None)
 
         Return:
@@ -73,8 +94,18 @@ class ProcessWorker(QObject):
         self.password = password
         self.content_process = content_process
         self.mount_directory = mount_directory
+        self.quota_tracker = quota_tracker
+        if capacity_monitor is None:
+            capacity_monitor = CapacityMonitor()
+            capacity_monitor.start()
+        else:
+            pass
+        self.capacity_monitor = capacity_monitor
         self.stop = False
         self.settings = {}
+        self.plot_dirty = {}
+        self.plot_time = {}
+        self.status_dict = {}
 
         # Events
         self.sig_start.connect(self.run)
@@ -92,6 +123,7 @@ class ProcessWorker(QObject):
         """
         # Set settings
         self.settings = settings
+        self.status_dict = {}
         content_process = cp.deepcopy(self.content_process)
 
         # Set stop variable to the return value of the pre_check
@@ -165,6 +197,7 @@ class ProcessWorker(QObject):
         use_threads_list = ['Meta', 'Find', 'Copy']
 
         # Fill folder list and threads list
+        probe_timeout = float(self.settings['General']['Mount check timeout (sec)'])
         for name in ['work', 'backup']:
             short_name = 'Copy_{0}'.format(name)
             long_name = 'Copy to {0}'.format(name)
@@ -176,41 +209,35 @@ class ProcessWorker(QObject):
             if self.settings['Copy'][long_name] != 'False':
                 if self.settings['Copy'][long_name] == 'Later':
                     pass
-                elif not os.path.ismount(self.settings[folder_name]):
-                    try:
-                        os.listdir(self.settings[folder_name])
-                    except PermissionError:
+                else:
+                    result = probe_folders(
+                        [[self.settings[folder_name], 'point', False]],
+                        timeout=probe_timeout
+                        )[0]
+                    if result['state'] == 'mounted':
                         pass
-                    except FileNotFoundError:
+                    elif result['state'] == 'key_expired':
                         self.sig_error.emit(
-                            '{0} folder {1} not mounted!'.format(
-                                name,
-                                self.settings['Copy'][long_name]
-                                )
+                            '\n'.join([
+                                '{0} folder {1} no longer mounted! '.format(
+                                    name,
+                                    self.settings['Copy'][long_name]
+                                    ),
+                                'Use kinit to refresh the key'
+                                ])
                             )
                         self.sig_finished.emit()
                         return None
-                    except OSError as err:
-                        if 'Required key' in str(err):
-                            self.sig_error.emit(
-                                '\n'.join([
-                                    '{0} folder {1} no longer mounted! '.format(
-                                        name,
-                                        self.settings['Copy'][long_name]
-                                        ),
-                                    'Use kinit to refresh the key'
-                                    ])
+                    elif result['state'] in ('hung', 'error'):
+                        self.sig_error.emit(
+                            '{0} folder {1} not reachable: {2}'.format(
+                                name,
+                                self.settings['Copy'][long_name],
+                                result['message']
                                 )
-                            self.sig_finished.emit()
-                            return None
-                        else:
-                            print(
-                                '\n'.join([
-                                    'Unknown Error occured!',
-                                    'Please contact the TranSPHIRE authors!'
-                                    ])
                             )
-                            raise
+                        self.sig_finished.emit()
+                        return None
                     else:
                         self.sig_error.emit(
                             '{0} folder {1} not mounted!'.format(
@@ -220,9 +247,6 @@ class ProcessWorker(QObject):
                             )
                         self.sig_finished.emit()
                         return None
-
-                else:
-                    pass
                 try:
                     self.settings[user_name] = self.settings[
                         'user_{0}'.format(
@@ -243,29 +267,27 @@ class ProcessWorker(QObject):
             if self.settings['Copy']['Copy to HDD'] == 'Later':
                 pass
             else:
-                try:
-                    for folder in glob.glob('{0}/*'.format(self.settings['Copy_hdd_folder'])):
-                        if not os.path.ismount(folder):
-                            try:
-                                os.listdir(folder)
-                            except PermissionError:
-                                pass
-                            else:
-                                self.sig_error.emit(
-                                    'HDD not mounted or not well unmounted!' +
-                                    'Please remount if you want to use HDD'
-                                    )
-                                self.sig_finished.emit()
-                                return None
-                        else:
-                            pass
-                except FileNotFoundError:
+                result_list = probe_folders(
+                    [
+                        [folder, 'point', False]
+                        for folder in glob.glob(
+                            '{0}/*'.format(self.settings['Copy_hdd_folder'])
+                            )
+                        ],
+                    timeout=probe_timeout
+                    )
+                if [
+                        result for result in result_list
+                        if result['state'] != 'mounted'
+                        ]:
                     self.sig_error.emit(
                         'HDD not mounted or not well unmounted!' +
-                        'Please remount if you want to use HDD!'
+                        'Please remount if you want to use HDD'
                         )
                     self.sig_finished.emit()
                     return None
+                else:
+                    pass
             use_threads_list.append('Copy_hdd')
         else:
             pass
@@ -362,6 +384,8 @@ class ProcessWorker(QObject):
                         'error_lock': QMutex(),
                         'bad_lock': QMutex(),
                         'share_lock': QMutex(),
+                        'combined_pending': set(),
+                        'combined_copy_time': {},
                         'spot_dict': self.fill_spot_dict(),
                         'number_file': '{0}/last_filenumber.txt'.format(
                             self.settings['project_folder']
@@ -394,9 +418,131 @@ class ProcessWorker(QObject):
             'ctf_star_lock': QMutex(),
             'ctf_partres_lock': QMutex(),
             'global_lock': QMutex(),
+            'ctffind_pool': None,
+            'gpu_scheduler': None,
+            'copy_helper': {},
+            'hdd_placement': None,
+            'quota_tracker': self.quota_tracker,
+            'prefetcher': None,
+            'bandwidth_governor': BandwidthGovernor(
+                total_rate=float(
+                    self.settings['General']['Bandwidth total (MB/s)']
+                    ) * 1024**2,
+                rate_dict={
+                    'Copy_work': float(
+                        self.settings['General']['Bandwidth work (MB/s)']
+                        ) * 1024**2,
+                    'Copy_backup': float(
+                        self.settings['General']['Bandwidth backup (MB/s)']
+                        ) * 1024**2,
+                    'Copy_hdd': float(
+                        self.settings['General']['Bandwidth HDD (MB/s)']
+                        ) * 1024**2,
+                    },
+                priority_dict={
+                    'Copy': 0,
+                    'Copy_work': int(self.settings['General']['Priority work']),
+                    'Copy_backup': int(self.settings['General']['Priority backup']),
+                    'Copy_hdd': int(self.settings['General']['Priority HDD']),
+                    }
+                ),
+            'mount_monitor': MountMonitor(
+                interval=float(
+                    self.settings['General']['Mount check interval (sec)']
+                    ),
+                timeout=probe_timeout
+                ),
+            'capacity_monitor': self.capacity_monitor,
+            'copy_helper_lock': QMutex(),
+            'stage_metrics': StageMetrics(),
             'typ': typ_dict
             }
 
+        # Keep CTFFIND sessions warm for the CTF threads
+        ctf_name = self.settings['Copy']['CTF']
+        if 'CTF' in use_threads_list and \
+                ctf_name in ('CTFFIND4 v4.1.8', 'CTFFIND4 v4.1.10'):
+            shared_dict['ctffind_pool'] = CtffindPool(
+                executable=self.settings['Path'][ctf_name],
+                size=len([
+                    entry for entry in full_content
+                    if entry[1][idx_values]['name'] == 'CTF'
+                    ])
+                )
+        else:
+            pass
+
+        # Spread the GPU programs over the available devices
+        if 'Motion' in use_threads_list or \
+                ('CTF' in use_threads_list and ctf_name.startswith('Gctf')):
+            detected = bool(self.settings['General']['GPU devices'] == 'auto')
+            if detected:
+                devices = GpuScheduler.detect_devices()
+            else:
+                devices = self.settings['General']['GPU devices'].split()
+            if devices:
+                shared_dict['gpu_scheduler'] = GpuScheduler(
+                    devices=devices,
+                    slots_per_device=self.settings['General']['GPU slots per device'],
+                    detected=detected
+                    )
+            else:
+                pass
+        else:
+            pass
+
+        # Spread the HDD copies over the available disks
+        if 'Copy_hdd' in use_threads_list:
+            shared_dict['hdd_placement'] = HddPlacement(
+                hdd_folder=self.settings['Copy_hdd_folder'],
+                keep_together=bool(
+                    self.settings['General']['HDD keep micrograph together'] == 'True'
+                    )
+                )
+        else:
+            pass
+
+        # Watch the free space of the project and scratch folder
+        shared_dict['capacity_monitor'].set_interval(
+            float(self.settings['General']['Capacity check interval (sec)'])
+            )
+        for folder in ['project_folder', 'scratch_folder']:
+            shared_dict['capacity_monitor'].add_folder(self.settings[folder])
+        shared_dict['capacity_monitor'].poll()
+
+        # Probe the mount points in the background
+        for folder in [
+                self.settings['General']['Search path frames'],
+                self.settings['General']['Search path meta'],
+                self.settings['Copy_work_folder'],
+                self.settings['Copy_backup_folder'],
+                self.settings['Copy_hdd_folder'],
+                ]:
+            if self.mount_directory in folder:
+                shared_dict['mount_monitor'].add_folder(folder, mode='tree')
+            else:
+                pass
+        shared_dict['mount_monitor'].start()
+
+        # Read the next movies before the motion correction needs them
+        prefetch_depth = int(self.settings['General']['Prefetch depth'])
+        if 'Motion' in use_threads_list and prefetch_depth > 0:
+            if self.settings['General']['Prefetch to scratch'] == 'True':
+                stage_folder = os.path.join(
+                    self.settings['scratch_folder'],
+                    'Prefetch'
+                    )
+            else:
+                stage_folder = None
+            shared_dict['prefetcher'] = Prefetcher(
+                depth=prefetch_depth,
+                byte_budget=float(self.settings['General']['Prefetch budget (GB)']) * 1024**3,
+                stage_folder=stage_folder
+                )
+            shared_dict['prefetcher'].start()
+        else:
+            pass
+
         # Fill process queues
         for entry in content_process:
             for process in entry:
@@ -459,17 +605,27 @@ class ProcessWorker(QObject):
             QThread.sleep(1)
 
         # Run until the user stops the processes
+        # Check the stop flag often, so running programs are killed fast.
         go_on = True
+        last_check = 0
         while go_on:
-            try:
-                self.check_queue(queue_com=queue_com)
-            except BrokenPipeError:
+            if ti.time() - last_check > 3:
+                try:
+                    self.check_queue(queue_com=queue_com)
+                except BrokenPipeError:
+                    pass
+                self.emit_metrics(
+                    shared_dict=shared_dict,
+                    thread_list=thread_list
+                    )
+                last_check = ti.time()
+            else:
                 pass
             if self.stop:
                 go_on = False
             else:
                 pass
-            QThread.sleep(3)
+            QThread.msleep(100)
 
         # Indicate to stop all processes
         for key, settings_content in full_content:
@@ -488,6 +644,11 @@ class ProcessWorker(QObject):
         for thread, name, setting in thread_list:
             thread.stop = True
 
+        if shared_dict['gpu_scheduler'] is not None:
+            shared_dict['gpu_scheduler'].close()
+        else:
+            pass
+
         # Wait for all threads to finish
         for thread, name, setting in thread_list:
             typ = setting['name']
@@ -504,8 +665,111 @@ class ProcessWorker(QObject):
                 'purple'
                 )
 
+        # Plot the last results
+        self.emit_plots(force=True)
+
+        if shared_dict['ctffind_pool'] is not None:
+            shared_dict['ctffind_pool'].close()
+        else:
+            pass
+
+        for helper in shared_dict['copy_helper'].values():
+            helper.close()
+
+        for folder in ['project_folder', 'scratch_folder']:
+            shared_dict['capacity_monitor'].remove_folder(self.settings[folder])
+        shared_dict['mount_monitor'].stop_monitor()
+
+        if shared_dict['prefetcher'] is not None:
+            shared_dict['prefetcher'].stop_prefetch()
+            self.write_prefetch_stats(prefetcher=shared_dict['prefetcher'])
+        else:
+            pass
+        self.write_mount_health(monitor=shared_dict['mount_monitor'])
+
+        if shared_dict['gpu_scheduler'] is not None:
+            self.write_gpu_usage(scheduler=shared_dict['gpu_scheduler'])
+        else:
+            pass
+
         self.sig_finished.emit()
 
+    def write_gpu_usage(self, scheduler):
+        """
+        Write the GPU slot usage of this session to the settings folder.
+
+        Arguments:
+        scheduler - GPU scheduler
+
+        Return:
+        None
+        """
+        file_name = os.path.join(
+            self.settings['settings_folder'],
+            'gpu_usage.txt'
+            )
+        with open(file_name, 'a') as append:
+            append.write('device\tslot\tprograms\tbusy (sec)\tusage (%)\n')
+            for entry in scheduler.get_usage():
+                append.write('{0}\t{1}\t{2}\t{3:.1f}\t{4:.1f}\n'.format(
+                    *entry
+                    ))
+
+    def write_prefetch_stats(self, prefetcher):
+        """
+        Write the prefetch hit rate of this session to the settings folder.
+
+        Arguments:
+        prefetcher - Prefetcher
+
+        Return:
+        None
+        """
+        file_name = os.path.join(
+            self.settings['settings_folder'],
+            'prefetch_stats.txt'
+            )
+        stats = prefetcher.get_stats()
+        with open(file_name, 'a') as append:
+            append.write(
+                'requests\thits\tstaged hits\tmisses\tskipped\texpired\tprefetched (GB)\thit rate (%)\n'
+                )
+            append.write('{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6:.1f}\t{7:.1f}\n'.format(
+                stats['requests'],
+                stats['hits'],
+                stats['staged_hits'],
+                stats['misses'],
+                stats['skipped'],
+                stats['expired'],
+                stats['prefetched_bytes'] / 1024**3,
+                stats['hit_rate']
+                ))
+
+    def write_mount_health(self, monitor):
+        """
+        Write the mount probe latencies of this session to the settings folder.
+
+        Arguments:
+        monitor - Mount monitor
+
+        Return:
+        None
+        """
+        file_name = os.path.join(
+            self.settings['settings_folder'],
+            'mount_health.txt'
+            )
+        header = ['folder', 'state'] + [
+            '<={0}s'.format(limit) for limit in LATENCY_BINS
+            ] + ['>{0}s'.format(LATENCY_BINS[-1])]
+        with open(file_name, 'a') as append:
+            append.write('{0}\n'.format('\t'.join(header)))
+            for folder, state, histogram in monitor.get_histograms():
+                append.write('{0}\n'.format('\t'.join(
+                    [folder, '{0}'.format(state)] +
+                    ['{0}'.format(value) for value in histogram]
+                    )))
+
     def pre_check_programs(self):
         """
         Check, if all programs the user wants to use are available.
@@ -535,6 +799,69 @@ class ProcessWorker(QObject):
             else:
                 pass
 
+        if not error:
+            error = self.pre_check_templates()
+        else:
+            pass
+
+        return error
+
+    def pre_check_templates(self):
+        """
+        Compile the program commands once and check their flags against
+        the program help, so invalid settings fail before the first movie.
+
+        Arguments:
+        None
+
+        Return:
+        True, if a command is not valid, else False
+        """
+        error = False
+        self.settings['command_templates'] = {}
+        compile_list = [
+            [self.settings['Copy']['Motion'], tum.compile_motion_templates],
+            [self.settings['Copy']['CTF'], tuc.compile_ctf_templates],
+            ]
+        for name, compile_function in compile_list:
+            if name == 'False' or name == 'Later':
+                continue
+            else:
+                pass
+
+            try:
+                templates = compile_function(settings=self.settings)
+            except Exception as err:
+                self.sig_error.emit(
+                    '{0} command not valid: {1}'.format(name, str(err))
+                    )
+                error = True
+                continue
+            else:
+                self.settings['command_templates'].update(templates)
+
+            help_text = tt.get_help_text(self.settings['Path'][name])
+            for key in templates:
+                if templates[key] is None or key.endswith('_input'):
+                    continue
+                else:
+                    pass
+                unknown = tt.validate(
+                    template=templates[key],
+                    help_text=help_text
+                    )
+                if unknown:
+                    self.sig_error.emit(
+                        '{0} does not know the options: {1}! {2}'.format(
+                            name,
+                            ', '.join(unknown),
+                            'Please adjust the settings!'
+                            )
+                        )
+                    error = True
+                else:
+                    pass
+
         return error
 
     def check_queue(self, queue_com):
@@ -547,35 +874,23 @@ class ProcessWorker(QObject):
         Return:
         None
         """
+        status_dict = {}
         for key in queue_com:
             while not queue_com[key].empty():
                 if key == 'status':
-                    status, device, color = queue_com['status'].get()
-                    self.sig_status.emit(status, device, color)
+                    # Only the latest status of every thread is shown
+                    status = queue_com['status'].get()
+                    status_dict[status['device']] = status
                 elif key == 'notification':
                     notification = queue_com['notification'].get()
                     self.sig_notification.emit(notification)
                 elif key == 'error':
                     error = queue_com['error'].get()
                     self.sig_error.emit(error)
-                elif key == 'plot_ctf':
-                    queue_com['plot_ctf'].get()
-                    self.sig_plot_ctf.emit(
-                        self.settings['Copy']['CTF'],
-                        self.settings['CTF_folder'][
-                            self.settings['Copy']['CTF']
-                            ],
-                        self.settings
-                        )
-                elif key == 'plot_motion':
-                    queue_com['plot_motion'].get()
-                    self.sig_plot_motion.emit(
-                        self.settings['Copy']['Motion'],
-                        self.settings['Motion_folder'][
-                            self.settings['Copy']['Motion']
-                            ],
-                        self.settings
-                        )
+                elif key in ('plot_ctf', 'plot_motion'):
+                    # Many finished jobs result in one plot refresh
+                    queue_com[key].get()
+                    self.plot_dirty[key] = True
                 else:
                     print(
                         'Processworker - check_queue:',
@@ -585,6 +900,121 @@ class ProcessWorker(QObject):
                         ' Please contact the TranSPHIRE authors'
                         )
 
+        for device, status in status_dict.items():
+            if self.status_dict.get(device) == status:
+                continue
+            else:
+                pass
+            self.status_dict[device] = status
+            self.sig_status.emit(
+                self.get_status_text(status),
+                device,
+                status['color']
+                )
+            self.sig_status_data.emit(status)
+        self.emit_plots()
+
+    @staticmethod
+    def get_status_text(status):
+        """
+        Text of a status shown in the status widget.
+
+        Arguments:
+        status - Status dictionary sent by ProcessThread.put_status
+
+        Return:
+        Text
+        """
+        text_list = [status['state']]
+        if status['queue_size'] is not None:
+            text_list.append('{0}'.format(status['queue_size']))
+        else:
+            pass
+        if status['done'] is not None:
+            text_list.append('{0}'.format(status['done']))
+        else:
+            pass
+        if status['rate'] is not None:
+            text_list.append('{0:.0f}MB/s'.format(status['rate']))
+        else:
+            pass
+        if status['minutes'] is not None:
+            text_list.append('{0:.1f}min'.format(status['minutes']))
+        else:
+            pass
+        return ' '.join(text_list)
+
+    def emit_metrics(self, shared_dict, thread_list):
+        """
+        Send the metrics of the queued stages to the metrics panel.
+
+        Arguments:
+        shared_dict - Shared dictionary
+        thread_list - List of [thread, name, content settings]
+
+        Return:
+        None
+        """
+        thread_count = {}
+        for _, _, content_settings in thread_list:
+            stage = content_settings['name']
+            thread_count[stage] = thread_count.get(stage, 0) + 1
+
+        metrics_dict = {}
+        for stage in thread_count:
+            if stage in ('Find', 'Meta'):
+                continue
+            else:
+                pass
+            metrics_dict[stage] = shared_dict['stage_metrics'].get_metrics(
+                stage=stage,
+                queue_size=shared_dict['queue'][stage].qsize()
+                )
+            metrics_dict[stage]['threads'] = thread_count[stage]
+        self.sig_metrics.emit({
+            'stages': metrics_dict,
+            'bottleneck': StageMetrics.get_bottleneck(metrics_dict),
+            })
+
+    def emit_plots(self, force=False):
+        """
+        Request a plot refresh for programs with new results.
+        A program is refreshed at most once per plot refresh interval.
+
+        Arguments:
+        force - Refresh all programs with new results now
+
+        Return:
+        None
+        """
+        interval = float(self.settings['General']['Plot refresh interval (sec)'])
+        for key, dirty in self.plot_dirty.items():
+            if not dirty:
+                continue
+            elif not force and \
+                    ti.time() - self.plot_time.get(key, 0) < interval:
+                continue
+            else:
+                pass
+            self.plot_dirty[key] = False
+            self.plot_time[key] = ti.time()
+            if key == 'plot_ctf':
+                self.sig_plot_ctf.emit(
+                    self.settings['Copy']['CTF'],
+                    self.settings['CTF_folder'][
+                        self.settings['Copy']['CTF']
+                        ],
+                    self.settings
+                    )
+            else:
+                self.sig_plot_motion.emit(
+                    self.settings['Copy']['Motion'],
+                    self.settings['Motion_folder'][
+                        self.settings['Copy']['Motion']
+                        ],
+                    self.settings
+                    )
+
     def fill_spot_dict(self):
         """
         Fill the spot dictionary.
@@ -643,6 +1073,11 @@ class ProcessWorker(QObject):
                 if line.startswith(self.settings['project_folder']):
                     share_list.append(line)
                     queue.put(line)
+                    shared_dict['stage_metrics'].enqueue(key, line)
+                    if key == 'Motion' and shared_dict['prefetcher'] is not None:
+                        shared_dict['prefetcher'].add(line)
+                    else:
+                        pass
                 else:
                     pass
         else:
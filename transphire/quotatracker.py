@@ -0,0 +1,230 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import time as ti
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from PyQt4.QtCore import QMutex
+except ImportError:
+    from PyQt5.QtCore import QMutex
+
+
+class QuotaTracker(object):
+    """
+    Used space of mount points without a quota command.
+
+    The used space is seeded by one scan of the mount point.
+    Afterwards, the bytes written by the copy threads are added, so the
+    share only needs to be scanned again after the reconcile interval.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, reconcile_interval=6 * 3600):
+        """
+        Initialize object variables.
+
+        Arguments:
+        reconcile_interval - Time in seconds after which a new scan corrects the drift
+
+        Return:
+        None
+        """
+        super(QuotaTracker, self).__init__()
+        self.reconcile_interval = reconcile_interval
+        self.lock = QMutex()
+        self.folder_dict = {}
+
+    def begin_scan(self, mount_folder):
+        """
+        Remember the written bytes at the start of a scan.
+
+        Arguments:
+        mount_folder - Mount folder
+
+        Return:
+        Token to pass to seed
+        """
+        mount_folder = os.path.abspath(mount_folder)
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.setdefault(
+                mount_folder,
+                {'used': None, 'added': 0, 'scan_time': 0}
+                )
+            token = entry['added']
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return token
+
+    def seed(self, mount_folder, used, token):
+        """
+        Set the used space to the result of a scan.
+        Bytes written during the scan are kept, because the scan might have
+        missed them.
+
+        Arguments:
+        mount_folder - Mount folder
+        used - Used space in bytes
+        token - Token returned by begin_scan
+
+        Return:
+        None
+        """
+        mount_folder = os.path.abspath(mount_folder)
+        self.lock.lock()
+        try:
+            entry = self.folder_dict[mount_folder]
+            entry['used'] = used
+            entry['added'] -= token
+            entry['scan_time'] = ti.time()
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def needs_scan(self, mount_folder):
+        """
+        Check, if a mount folder needs to be scanned.
+
+        Arguments:
+        mount_folder - Mount folder
+
+        Return:
+        True, if it has not been scanned or the reconcile interval is over
+        """
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(os.path.abspath(mount_folder))
+            if entry is None or entry['used'] is None:
+                scan = True
+            else:
+                scan = bool(
+                    ti.time() - entry['scan_time'] > self.reconcile_interval
+                    )
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return scan
+
+    def get_used(self, mount_folder):
+        """
+        Used space of a mount folder.
+
+        Arguments:
+        mount_folder - Mount folder
+
+        Return:
+        Used space in bytes, None if it has not been scanned yet
+        """
+        self.lock.lock()
+        try:
+            entry = self.folder_dict.get(os.path.abspath(mount_folder))
+            if entry is None or entry['used'] is None:
+                used = None
+            else:
+                used = entry['used'] + entry['added']
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+        return used
+
+    def add(self, file_name, size):
+        """
+        Add the bytes of a written file to the mount folder containing it.
+        Files outside of the tracked mount folders are ignored.
+
+        Arguments:
+        file_name - Written file
+        size - File size in bytes
+
+        Return:
+        None
+        """
+        file_name = os.path.abspath(file_name)
+        self.lock.lock()
+        try:
+            for mount_folder, entry in self.folder_dict.items():
+                if file_name.startswith('{0}{1}'.format(mount_folder, os.sep)):
+                    entry['added'] += size
+                    break
+                else:
+                    pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+
+def get_tree_size(folder, stop_check=None):
+    """
+    Size of all files below a folder.
+
+    folder - Folder to check
+    stop_check - Function that returns True if the scan should stop
+
+    Returns:
+    Size in bytes
+    """
+    size = 0
+    folder_list = [folder]
+    while folder_list:
+        if stop_check is not None and stop_check():
+            break
+        else:
+            pass
+        for entry in os.scandir(folder_list.pop()):
+            if entry.is_dir(follow_symlinks=False):
+                folder_list.append(entry.path)
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def get_folder_size(folder, workers=8, stop_check=None):
+    """
+    Size of all files below a folder.
+    The subfolders are scanned in parallel.
+
+    folder - Folder to check
+    workers - Number of subfolders to scan at the same time
+    stop_check - Function that returns True if the scan should stop
+
+    Returns:
+    Size in bytes
+    """
+    size = 0
+    folder_list = []
+    for entry in os.scandir(folder):
+        if entry.is_dir(follow_symlinks=False):
+            folder_list.append(entry.path)
+        else:
+            size += entry.stat(follow_symlinks=False).st_size
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for folder_size in pool.map(
+                lambda x: get_tree_size(x, stop_check=stop_check),
+                folder_list
+                ):
+            size += folder_size
+    return size
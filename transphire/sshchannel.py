@@ -0,0 +1,249 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import shutil
+import tempfile
+import time as ti
+import subprocess as sp
+import pexpect as pe
+
+
+class SshChannel(object):
+    """
+    Persistent ssh connection to a host.
+
+    The password is only sent once to start an OpenSSH control master.
+    Every command afterwards is sent over the open connection, which
+    skips the connection setup and the login.
+    With the host 'local', commands run on this computer instead, so
+    the quota handling can be tried without a network.
+
+    Inherits from:
+    object
+    """
+
+    LOCAL = 'local'
+
+    def __init__(self, user, host, password, persist=600):
+        """
+        Initialize object variables.
+
+        Arguments:
+        user - User name
+        host - Host name, 'local' to run the commands locally
+        password - Password of the user
+        persist - Time in seconds the idle connection stays open
+
+        Return:
+        None
+        """
+        super(SshChannel, self).__init__()
+        self.user = user
+        self.host = host
+        self.password = password
+        self.persist = persist
+        if host == self.LOCAL:
+            self.control_dir = None
+        else:
+            # Short path, the socket path length is limited
+            self.control_dir = tempfile.mkdtemp(prefix='tr_ssh_')
+
+    def get_options(self):
+        """
+        Options to use the control connection.
+
+        Arguments:
+        None
+
+        Return:
+        List of ssh options
+        """
+        return [
+            '-o', 'ControlPath={0}/%C'.format(self.control_dir),
+            '-o', 'ControlPersist={0}'.format(self.persist),
+            '{0}@{1}'.format(self.user, self.host),
+            ]
+
+    def open(self, timeout=60):
+        """
+        Start the control master and log in.
+        Older OpenSSH versions keep the terminal open after the master went
+        to the background, so the login is checked with is_alive instead of
+        waiting for the end of the output.
+
+        Arguments:
+        timeout - Time in seconds to wait for the login
+
+        Return:
+        None
+        """
+        if self.host == self.LOCAL:
+            return None
+        else:
+            pass
+
+        command = ' '.join(
+            ['ssh', '-f', '-N', '-o', 'ControlMaster=yes'] +
+            self.get_options()
+            )
+        end_time = ti.time() + timeout
+        child = pe.spawnu(command)
+        try:
+            password_sent = False
+            while ti.time() < end_time:
+                try:
+                    idx = child.expect(
+                        ['assword:', r'\(yes/no', pe.EOF],
+                        timeout=1
+                        )
+                except pe.exceptions.TIMEOUT:
+                    idx = None
+
+                if idx == 0:
+                    child.sendline(self.password)
+                    password_sent = True
+                elif idx == 1:
+                    child.sendline('yes')
+                elif idx == 2:
+                    child.close()
+                    if child.exitstatus:
+                        raise pe.exceptions.TIMEOUT(
+                            'SSH login of {0} to {1} failed with status {2}!'.format(
+                                self.user,
+                                self.host,
+                                child.exitstatus
+                                )
+                            )
+                    else:
+                        break
+                elif password_sent and self.is_alive():
+                    return None
+                else:
+                    pass
+        except Exception:
+            raise
+        finally:
+            child.close(force=True)
+
+        while ti.time() < end_time:
+            if self.is_alive():
+                return None
+            else:
+                ti.sleep(1)
+        raise pe.exceptions.TIMEOUT(
+            'SSH login of {0} to {1} failed within {2} sec!'.format(
+                self.user,
+                self.host,
+                timeout
+                )
+            )
+
+    def is_alive(self):
+        """
+        Check, if the control master is running.
+
+        Arguments:
+        None
+
+        Return:
+        True, if commands can be sent
+        """
+        if self.host == self.LOCAL:
+            return True
+        else:
+            pass
+
+        try:
+            result = sp.run(
+                ['ssh', '-O', 'check'] + self.get_options(),
+                stdin=sp.DEVNULL,
+                stdout=sp.DEVNULL,
+                stderr=sp.DEVNULL,
+                timeout=10
+                )
+        except (OSError, sp.TimeoutExpired):
+            return False
+        return bool(result.returncode == 0)
+
+    def run(self, command, timeout=30):
+        """
+        Run a command on the host and return its output.
+        The connection is opened again if it has been closed.
+
+        Arguments:
+        command - Command to run
+        timeout - Time in seconds to wait for the command
+
+        Return:
+        Output of the command
+        """
+        if self.host == self.LOCAL:
+            args = command
+        else:
+            if not self.is_alive():
+                self.open()
+            else:
+                pass
+            args = ['ssh', '-o', 'BatchMode=yes'] + \
+                self.get_options() + \
+                [command]
+
+        try:
+            result = sp.run(
+                args,
+                shell=bool(self.host == self.LOCAL),
+                stdin=sp.DEVNULL,
+                stdout=sp.PIPE,
+                stderr=sp.STDOUT,
+                timeout=timeout
+                )
+        except sp.TimeoutExpired:
+            raise pe.exceptions.TIMEOUT(
+                'SSH command {0} on {1} timed out after {2} sec!'.format(
+                    command,
+                    self.host,
+                    timeout
+                    )
+                )
+        return result.stdout.decode('utf-8', 'replace')
+
+    def close(self):
+        """
+        Stop the control master.
+
+        Arguments:
+        None
+
+        Return:
+        None
+        """
+        if self.host == self.LOCAL:
+            return None
+        else:
+            pass
+
+        try:
+            sp.run(
+                ['ssh', '-O', 'exit'] + self.get_options(),
+                stdin=sp.DEVNULL,
+                stdout=sp.DEVNULL,
+                stderr=sp.DEVNULL,
+                timeout=10
+                )
+        except (OSError, sp.TimeoutExpired):
+            pass
+        shutil.rmtree(self.control_dir, ignore_errors=True)
@@ -0,0 +1,257 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import time as ti
+import collections as co
+try:
+    from PyQt4.QtCore import QMutex
+except ImportError:
+    from PyQt5.QtCore import QMutex
+
+
+def get_percentile(values, percent):
+    """
+    Percentile of a list of values (nearest rank).
+
+    values - List of values
+    percent - Percentile, e.g. 95
+
+    Returns:
+    Percentile, None if the list is empty
+    """
+    if not values:
+        return None
+    else:
+        pass
+    values = sorted(values)
+    index = int(round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class StageMetrics(object):
+    """
+    Timings of the queue entries of every stage.
+
+    The enqueue, dequeue and complete times of every entry give the wait
+    and service times; the completions and arrivals of the last window
+    give the throughput and the growth of the queues.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, window=900, samples=500, max_entries=100000):
+        """
+        Initialize object variables.
+
+        Arguments:
+        window - Time in seconds to calculate the rates
+        samples - Number of wait and service times kept per stage
+        max_entries - Number of open entries kept per stage, the oldest are dropped
+
+        Return:
+        None
+        """
+        super(StageMetrics, self).__init__()
+        self.window = window
+        self.max_entries = max_entries
+        self.lock = QMutex()
+        self.start_time = ti.time()
+        self.enqueue_dict = co.defaultdict(co.OrderedDict)
+        self.dequeue_dict = co.defaultdict(co.OrderedDict)
+        self.arrival_dict = co.defaultdict(co.deque)
+        self.complete_dict = co.defaultdict(co.deque)
+        self.wait_dict = co.defaultdict(lambda: co.deque(maxlen=samples))
+        self.service_dict = co.defaultdict(lambda: co.deque(maxlen=samples))
+
+    def enqueue(self, stage, root_name):
+        """
+        Entry was added to the queue of a stage.
+        Entries that are put back keep their first enqueue time.
+
+        Arguments:
+        stage - Stage name, e.g. Motion
+        root_name - Queue entry
+
+        Return:
+        None
+        """
+        now = ti.time()
+        self.lock.lock()
+        try:
+            if root_name not in self.enqueue_dict[stage]:
+                self.enqueue_dict[stage][root_name] = now
+                self.arrival_dict[stage].append(now)
+                while len(self.enqueue_dict[stage]) > self.max_entries:
+                    self.enqueue_dict[stage].popitem(last=False)
+            else:
+                pass
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def dequeue(self, stage, root_names):
+        """
+        Entries were taken from the queue of a stage.
+
+        Arguments:
+        stage - Stage name, e.g. Motion
+        root_names - Queue entries
+
+        Return:
+        None
+        """
+        now = ti.time()
+        self.lock.lock()
+        try:
+            for root_name in root_names:
+                self.dequeue_dict[stage][root_name] = now
+            while len(self.dequeue_dict[stage]) > self.max_entries:
+                self.dequeue_dict[stage].popitem(last=False)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def fail(self, stage, root_names):
+        """
+        Entries of a stage failed and are put back to the queue.
+        They keep their enqueue time, so the wait includes the retries.
+
+        Arguments:
+        stage - Stage name, e.g. Motion
+        root_names - Queue entries
+
+        Return:
+        None
+        """
+        self.lock.lock()
+        try:
+            for root_name in root_names:
+                self.dequeue_dict[stage].pop(root_name, None)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def complete(self, stage, root_names):
+        """
+        Entries of a stage are done.
+
+        Arguments:
+        stage - Stage name, e.g. Motion
+        root_names - Queue entries
+
+        Return:
+        None
+        """
+        now = ti.time()
+        self.lock.lock()
+        try:
+            for root_name in root_names:
+                start = self.dequeue_dict[stage].pop(root_name, None)
+                enqueued = self.enqueue_dict[stage].pop(root_name, None)
+                if start is not None:
+                    self.service_dict[stage].append(now - start)
+                    if enqueued is not None:
+                        self.wait_dict[stage].append(start - enqueued)
+                    else:
+                        pass
+                else:
+                    pass
+                self.complete_dict[stage].append(now)
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+    def get_metrics(self, stage, queue_size):
+        """
+        Metrics of one stage.
+
+        Arguments:
+        stage - Stage name, e.g. Motion
+        queue_size - Current number of entries in the queue
+
+        Return:
+        Dictionary with items per hour, wait and service percentiles,
+        queue growth per hour and the time to drain the queue in hours
+        """
+        now = ti.time()
+        window = min(self.window, max(now - self.start_time, 1))
+        self.lock.lock()
+        try:
+            for times in (self.arrival_dict[stage], self.complete_dict[stage]):
+                while times and now - times[0] > self.window:
+                    times.popleft()
+            arrivals = len(self.arrival_dict[stage])
+            completions = len(self.complete_dict[stage])
+            wait_list = list(self.wait_dict[stage])
+            service_list = list(self.service_dict[stage])
+        except Exception:
+            raise
+        finally:
+            self.lock.unlock()
+
+        items_per_hour = completions * 3600 / window
+        growth_per_hour = (arrivals - completions) * 3600 / window
+        if queue_size == 0:
+            drain_hours = 0
+        elif growth_per_hour < 0:
+            drain_hours = queue_size / -growth_per_hour
+        else:
+            drain_hours = None
+        return {
+            'queue_size': queue_size,
+            'items_per_hour': items_per_hour,
+            'growth_per_hour': growth_per_hour,
+            'drain_hours': drain_hours,
+            'wait_p50': get_percentile(wait_list, 50),
+            'wait_p95': get_percentile(wait_list, 95),
+            'service_p50': get_percentile(service_list, 50),
+            'service_p95': get_percentile(service_list, 95),
+            }
+
+    @staticmethod
+    def get_bottleneck(metrics_dict):
+        """
+        Stage that needs the longest to work off its queue.
+        A stage with a growing queue or without progress is worse than any
+        draining stage; ties are decided by the queue growth.
+
+        Arguments:
+        metrics_dict - Dictionary: stage -> metrics of get_metrics
+
+        Return:
+        Stage name, None if no queue is waiting
+        """
+        bottleneck = None
+        worst = None
+        for stage, metrics in metrics_dict.items():
+            if not metrics['queue_size']:
+                continue
+            elif metrics['drain_hours'] is None:
+                key = (1, metrics['growth_per_hour'], metrics['queue_size'])
+            else:
+                key = (0, metrics['drain_hours'], metrics['queue_size'])
+            if worst is None or key > worst:
+                worst = key
+                bottleneck = stage
+            else:
+                pass
+        return bottleneck
@@ -0,0 +1,316 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Startup benchmark.
+    Every run starts the GUI in a fresh process, so imports are measured
+    cold, and prints the time of every startup phase:
+        python -m transphire.transphire_benchmark --runs 5
+    Use QT_QPA_PLATFORM=offscreen to run it without a display.
+    With --importtime the import of the GUI is measured with
+    python -X importtime (Python 3.7+) instead; the exit status is 1, if
+    it takes longer than --max_import_time or loads a module that should
+    be imported lazily:
+        python -m transphire.transphire_benchmark --importtime --max_import_time 1.5
+"""
+import os
+import sys
+import json
+import time as ti
+import shutil
+import argparse
+import tempfile
+import subprocess as sp
+import importlib.util
+
+
+PHASES = ['qt', 'import', 'content', 'window', 'show', 'total']
+
+# Modules that must not be loaded when the GUI is imported
+LAZY_MODULES = ['matplotlib', 'telepot', 'pkg_resources']
+
+
+def get_lazy_modules():
+    """
+    Modules that must not be loaded when the GUI is imported on this Python.
+
+    Returns:
+    List of module names
+    """
+    lazy_modules = list(LAZY_MODULES)
+    if sys.version_info < (3, 8) and \
+            importlib.util.find_spec('importlib_metadata') is None:
+        # Without importlib.metadata the version lookup needs pkg_resources
+        lazy_modules.remove('pkg_resources')
+    else:
+        pass
+    return lazy_modules
+
+
+def measure_startup(settings_directory, mount_directory):
+    """
+    Start the GUI once and measure the startup phases.
+    Runs in the benchmark child process.
+
+    settings_directory - Folder containing the settings
+    mount_directory - Folder containing the mount points
+
+    Returns:
+    Dictionary of times in seconds and the number of plot canvases
+    """
+    times = {}
+    start = ti.time()
+    try:
+        from PyQt4.QtGui import QApplication
+    except ImportError:
+        from PyQt5.QtWidgets import QApplication
+    app = QApplication([])
+    times['qt'] = ti.time() - start
+
+    phase_start = ti.time()
+    import transphire
+    from transphire import transphire_utils as tu
+    from transphire.mainwindow import MainWindow
+    from transphire.loadwindow import DefaultSettings
+    from transphire.plotwidget import PlotWidget
+    times['import'] = ti.time() - phase_start
+
+    phase_start = ti.time()
+    content = DefaultSettings.get_content_default(
+        edit_settings=False,
+        apply=False,
+        settings_folder=settings_directory
+        )[0]
+    content_gui = tu.get_content_gui(content=content)
+    times['content'] = ti.time() - phase_start
+
+    phase_start = ti.time()
+    gui = MainWindow(
+        content_gui=content_gui,
+        content_pipeline=content['Pipeline'],
+        settings_folder=settings_directory,
+        mount_directory=mount_directory,
+        version=transphire.__version__
+        )
+    times['window'] = ti.time() - phase_start
+
+    phase_start = ti.time()
+    gui.show()
+    app.processEvents()
+    times['show'] = ti.time() - phase_start
+    times['total'] = ti.time() - start
+
+    plot_widgets = gui.findChildren(PlotWidget)
+    times['plot_widgets'] = len(plot_widgets)
+    times['plot_canvases'] = len([
+        widget for widget in plot_widgets if widget.canvas is not None
+        ])
+    times['matplotlib_loaded'] = bool('matplotlib' in sys.modules)
+    return times
+
+
+def run_benchmark(runs, settings_directory):
+    """
+    Start the GUI several times, each time in a new process.
+
+    runs - Number of runs
+    settings_directory - Folder containing the settings, None for a fresh folder
+
+    Returns:
+    List of result dictionaries
+    """
+    temp_directory = tempfile.mkdtemp(prefix='transphire_benchmark_')
+    if settings_directory is None:
+        settings_directory = os.path.join(temp_directory, 'settings')
+    else:
+        pass
+    mount_directory = os.path.join(temp_directory, 'mounted')
+
+    result_list = []
+    try:
+        for _ in range(runs):
+            output = sp.check_output([
+                sys.executable,
+                '-m',
+                'transphire.transphire_benchmark',
+                '--child',
+                '--settings_directory',
+                settings_directory,
+                '--mount_directory',
+                mount_directory,
+                ])
+            result_list.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+    finally:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+    return result_list
+
+
+def measure_imports(module_name):
+    """
+    Import a module in a fresh process with python -X importtime.
+
+    module_name - Module to import
+
+    Returns:
+    Cumulative import time in seconds, list of [time in seconds, module]
+    """
+    process = sp.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {0}'.format(module_name)],
+        stdout=sp.PIPE,
+        stderr=sp.PIPE,
+        check=True
+        )
+    total = None
+    module_list = []
+    for line in process.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:'):
+            continue
+        else:
+            pass
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            cumulative = int(cumulative) / 1e6
+        except ValueError:
+            # Header line
+            continue
+        name = name.strip()
+        module_list.append([cumulative, name])
+        if name == module_name:
+            total = cumulative
+        else:
+            pass
+    return total, module_list
+
+
+def check_imports(module_name, max_import_time):
+    """
+    Print the slowest imports and check the import guard.
+
+    module_name - Module to import
+    max_import_time - Maximum import time in seconds, None for no limit
+
+    Returns:
+    True, if the guard passed
+    """
+    total, module_list = measure_imports(module_name=module_name)
+    print('module\tcumulative (s)')
+    for cumulative, name in sorted(module_list, reverse=True)[:20]:
+        print('{0}\t{1:.3f}'.format(name, cumulative))
+
+    passed = True
+    lazy_modules = get_lazy_modules()
+    loaded = sorted(set(
+        name for _, name in module_list
+        if name.split('.')[0] in lazy_modules
+        ))
+    if loaded:
+        print('Loaded at import: {0}'.format(', '.join(loaded)))
+        passed = False
+    else:
+        pass
+    print('Import time of {0}: {1:.3f}s'.format(module_name, total))
+    if max_import_time is not None and total > max_import_time:
+        print('Import time is above {0:.3f}s'.format(max_import_time))
+        passed = False
+    else:
+        pass
+    return passed
+
+
+def print_results(result_list):
+    """
+    Print the median time of every phase.
+
+    result_list - List of result dictionaries
+
+    Returns:
+    None
+    """
+    print('phase\tmedian (s)\tmin (s)\tmax (s)')
+    for phase in PHASES:
+        values = sorted(result[phase] for result in result_list)
+        print('{0}\t{1:.3f}\t{2:.3f}\t{3:.3f}'.format(
+            phase,
+            values[len(values) // 2],
+            values[0],
+            values[-1]
+            ))
+    print('plot widgets\t{0}'.format(result_list[-1]['plot_widgets']))
+    print('plot canvases\t{0}'.format(result_list[-1]['plot_canvases']))
+    print('matplotlib loaded\t{0}'.format(result_list[-1]['matplotlib_loaded']))
+
+
+def main():
+    """
+    Parse the arguments and run the benchmark.
+
+    Arguments:
+    None
+
+    Return:
+    None
+    """
+    parser = argparse.ArgumentParser(description='TranSPHIRE startup benchmark')
+    parser.add_argument('--runs', default=5, type=int, help='Number of runs')
+    parser.add_argument(
+        '--settings_directory',
+        default=None,
+        type=str,
+        help='Folder containing the settings (default fresh folder)'
+        )
+    parser.add_argument(
+        '--importtime',
+        action='store_true',
+        help='Measure the imports of the GUI instead of the startup'
+        )
+    parser.add_argument(
+        '--max_import_time',
+        default=None,
+        type=float,
+        help='Fail, if importing the GUI takes longer (seconds)'
+        )
+    parser.add_argument('--mount_directory', default=None, type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        os.makedirs(args.settings_directory, exist_ok=True)
+        os.makedirs(args.mount_directory, exist_ok=True)
+        result = measure_startup(
+            settings_directory=args.settings_directory,
+            mount_directory=args.mount_directory
+            )
+        sys.stdout.write('{0}\n'.format(json.dumps(result)))
+        sys.stdout.flush()
+        # Skip the close event, it would save the session and wait for the threads
+        os._exit(0)
+    elif args.importtime:
+        if not check_imports(
+                module_name='transphire.mainwindow',
+                max_import_time=args.max_import_time
+                ):
+            sys.exit(1)
+        else:
+            pass
+    else:
+        print_results(run_benchmark(
+            runs=args.runs,
+            settings_directory=args.settings_directory
+            ))
+
+
+if __name__ == '__main__':
+    main()
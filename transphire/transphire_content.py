@@ -49,6 +49,7 @@ def default_cter_v1_0():
         ['--phase_min', '5', float, 'Phase plate:True', 'PLAIN'],
         ['--phase_max', '175', float, 'Phase plate:True', 'PLAIN'],
         ['--phase_step', '5', float, 'Phase plate:True', 'PLAIN'],
+        ['Batch size', '1', int, '', 'PLAIN'],
         ]
     return items
 
@@ -625,8 +626,34 @@ def default_general():
         ['Scratch directory', '', str, '', 'DIR'],
         ['Scratch quota warning (%)', '80', float, '', 'PLAIN'],
         ['Scratch quota stop (%)', '90', float, '', 'PLAIN'],
+        ['Capacity check interval (sec)', '30', float, '', 'PLAIN'],
+        ['Mount check interval (sec)', '10', float, '', 'PLAIN'],
+        ['Mount check timeout (sec)', '10', float, '', 'PLAIN'],
         ['Time until notification', '25', float, '', 'PLAIN'],
         ['Phase shift warning (deg)', '110', float, '', 'PLAIN'],
+        ['Plot refresh interval (sec)', '10', float, '', 'PLAIN'],
+        ['Plot export interval (sec)', '60', float, '', 'PLAIN'],
+        ['Plot decimation threshold', '20000', int, '', 'PLAIN'],
+        ['GPU devices', 'auto', str, '', 'PLAIN'],
+        ['GPU slots per device', '1', int, '', 'PLAIN'],
+        ['Copy batch size', '50', int, '', 'PLAIN'],
+        ['Prefetch depth', '0', int, '', 'PLAIN'],
+        ['Prefetch budget (GB)', '20', float, '', 'PLAIN'],
+        ['Prefetch to scratch', ['False', 'True'], bool, '', 'COMBO'],
+        ['Copy helper workers', '4', int, '', 'PLAIN'],
+        ['Bandwidth total (MB/s)', '0', float, '', 'PLAIN'],
+        ['Bandwidth work (MB/s)', '0', float, '', 'PLAIN'],
+        ['Bandwidth backup (MB/s)', '0', float, '', 'PLAIN'],
+        ['Bandwidth HDD (MB/s)', '0', float, '', 'PLAIN'],
+        ['Priority work', ['1', '2', '3'], int, '', 'COMBO'],
+        ['Priority backup', ['2', '1', '3'], int, '', 'COMBO'],
+        ['Priority HDD', ['2', '1', '3'], int, '', 'COMBO'],
+        ['Combined file copy interval (sec)', '60', float, '', 'PLAIN'],
+        ['HDD keep micrograph together', ['True', 'False'], bool, '', 'COMBO'],
+        ['Timeout copy (min)', '60', float, '', 'PLAIN'],
+        ['Timeout motion (min)', '30', float, '', 'PLAIN'],
+        ['Timeout CTF (min)', '30', float, '', 'PLAIN'],
+        ['Timeout compress (min)', '30', float, '', 'PLAIN'],
         ]
     return items
 
@@ -0,0 +1,202 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Copy helper that runs as the target user of a mount point.
+    It is started once via sudo by copyhelper.CopyHelper and reads one JSON
+    request per line from stdin:
+        {"id": 1, "op": "copy", "src": "/a", "dst": "/b"}
+        {"id": 2, "op": "mkdir", "path": "/c"}
+        {"id": 3, "op": "append", "src": "/a", "dst": "/b"}
+        {"id": 4, "op": "fsync", "path": "/b"}
+    Every request is answered with one JSON line on stdout:
+        {"id": 1, "error": null}
+    Only the standard library is used, because the target user might not
+    see the TranSPHIRE installation.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+def copy(src, dst):
+    """
+    Copy a file and create the target folder.
+
+    src - Input file path
+    dst - Output file path
+
+    Returns:
+    None
+    """
+    mkdir(os.path.dirname(dst))
+    try:
+        shutil.copy2(src, dst)
+    except PermissionError:
+        shutil.copyfile(src, dst)
+
+
+def append(src, dst, verify_size=4096):
+    """
+    Copy only the part of a file that has been appended since the last copy.
+
+    src - Input file path
+    dst - Output file path
+    verify_size - Number of bytes to compare before appending
+
+    Returns:
+    None
+    """
+    try:
+        size_dst = os.path.getsize(dst)
+    except FileNotFoundError:
+        copy(src, dst)
+        return None
+
+    if size_dst <= os.path.getsize(src):
+        check_size = min(verify_size, size_dst)
+        with open(src, 'rb') as read:
+            with open(dst, 'r+b') as write:
+                read.seek(size_dst - check_size)
+                write.seek(size_dst - check_size)
+                if read.read(check_size) == write.read(check_size):
+                    write.seek(size_dst)
+                    shutil.copyfileobj(read, write)
+                    return None
+                else:
+                    pass
+    else:
+        pass
+    copy(src, dst)
+
+
+def mkdir(path):
+    """
+    Create folders recursively.
+
+    path - Folder structure to create
+
+    Returns:
+    None
+    """
+    if path:
+        os.makedirs(path, exist_ok=True)
+    else:
+        pass
+
+
+def fsync(path):
+    """
+    Flush a file to the device.
+
+    path - File to flush
+
+    Returns:
+    None
+    """
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def handle(request):
+    """
+    Run one request.
+
+    request - Request dictionary
+
+    Returns:
+    None, if successful, else the error message
+    """
+    try:
+        if request['op'] == 'copy':
+            copy(src=request['src'], dst=request['dst'])
+        elif request['op'] == 'append':
+            append(src=request['src'], dst=request['dst'])
+        elif request['op'] == 'mkdir':
+            mkdir(path=request['path'])
+        elif request['op'] == 'fsync':
+            fsync(path=request['path'])
+        else:
+            return 'Unknown operation: {0}'.format(request['op'])
+    except Exception:
+        return traceback.format_exc()
+    else:
+        return None
+
+
+def serve(read, write, workers):
+    """
+    Answer requests until the input is closed.
+
+    read - Input stream
+    write - Output stream
+    workers - Number of requests to process in parallel
+
+    Returns:
+    None
+    """
+    write_lock = threading.Lock()
+
+    def process(request):
+        error = handle(request)
+        with write_lock:
+            write.write('{0}\n'.format(
+                json.dumps({'id': request['id'], 'error': error})
+                ))
+            write.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        with write_lock:
+            write.write('READY\n')
+            write.flush()
+        for line in read:
+            # Skip lines that are no requests, e.g. an unused sudo password
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(request, dict) and 'id' in request:
+                pool.submit(process, request)
+            else:
+                pass
+
+
+def main():
+    """
+    Parse the arguments and serve on stdin/stdout.
+
+    Arguments:
+    None
+
+    Return:
+    None
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    serve(read=sys.stdin, write=sys.stdout, workers=max(args.workers, 1))
+
+
+if __name__ == '__main__':
+    main()
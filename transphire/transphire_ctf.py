@@ -22,6 +22,49 @@ import shutil
 import numpy as np
 from transphire import transphire_utils as tu
 from transphire import transphire_import as ti
+from transphire import transphire_template as tt
+
+
+def compile_ctf_templates(settings):
+    """
+    Compile the ctf command once per session.
+
+    settings - TranSPHIRE settings
+
+    Returns:
+    Dictionary: CTF -> List of arguments with placeholders,
+    CTF_input -> Lines to send to the program via stdin, None if not interactive
+    """
+    ctf_name = settings['Copy']['CTF']
+    input_lines = None
+    if ctf_name == 'CTFFIND4 v4.1.8' or \
+            ctf_name == 'CTFFIND4 v4.1.10':
+        command = create_ctffind_4_v4_1_8_command(
+            ctf_name=ctf_name,
+            settings=settings
+            )
+        input_lines = create_ctffind_4_v4_1_8_input(
+            ctf_name=ctf_name,
+            settings=settings
+            )
+
+    elif ctf_name == 'Gctf v1.06' or \
+            ctf_name == 'Gctf v1.18':
+        command = create_gctf_v1_06_command(
+            ctf_name=ctf_name,
+            settings=settings
+            )
+
+    elif ctf_name == 'CTER v1.0':
+        command = create_cter_1_0_command(
+            ctf_name=ctf_name,
+            settings=settings
+            )
+
+    else:
+        raise IOError('{0}: Not known!'.format(ctf_name))
+
+    return {'CTF': command, 'CTF_input': input_lines}
 
 
 def get_ctf_command(file_input, new_name, settings, queue_com, name):
@@ -37,36 +80,48 @@ def get_ctf_command(file_input, new_name, settings, queue_com, name):
     Returns:
     CTF command
     File to check vor validation if the process was successful
+    Lines to send to the program via stdin, None if not interactive
     """
     ctf_name = settings['Copy']['CTF']
+    templates = settings['command_templates']
+    input_lines = None
     if ctf_name == 'CTFFIND4 v4.1.8' or \
             ctf_name == 'CTFFIND4 v4.1.10':
-        command = create_ctffind_4_v4_1_8_command(
-            ctf_name = ctf_name,
-            file_input=file_input,
-            file_output=new_name,
-            settings=settings
+        command = ' '.join(templates['CTF'])
+        input_lines = tt.fill(
+            template=templates['CTF_input'],
+            values={
+                'file_input': file_input,
+                'file_output': new_name,
+                }
             )
         check_files = []
 
     elif ctf_name == 'Gctf v1.06' or \
             ctf_name == 'Gctf v1.18':
-        command = create_gctf_v1_06_command(
-            ctf_name=ctf_name,
-            file_input=file_input,
-            file_output=new_name,
-            settings=settings
-            )
+        command = ' '.join(tt.fill(
+            template=templates['CTF'],
+            values={
+                'file_input': file_input,
+                'file_output': new_name,
+                }
+            ))
         check_files = ['{0}_gctf.star'.format(new_name)]
 
     elif ctf_name == 'CTER v1.0':
         output_dir, _ = os.path.splitext(new_name)
-        command = create_cter_1_0_command(
-            ctf_name=ctf_name,
-            file_input=file_input,
-            output_dir=output_dir,
-            settings=settings
-            )
+        try:
+            shutil.rmtree(output_dir)
+        except FileNotFoundError:
+            pass
+        command = ' '.join(tt.fill(
+            template=templates['CTF'],
+            values={
+                'input_pattern': '{0}*'.format(file_input),
+                'output_dir': output_dir,
+                'selection_list': file_input,
+                }
+            ))
         check_files = ['{0}/partres.txt'.format(output_dir)]
 
     else:
@@ -78,11 +133,123 @@ def get_ctf_command(file_input, new_name, settings, queue_com, name):
             message,
             name
             )
-        IOError(message)
+        raise IOError(message)
+
+    return command, check_files, input_lines
+
+
+def get_ctf_batch_command(file_inputs, batch_dir, settings, queue_com, name):
+    """
+    Create the ctf command for several micrographs in one program call.
+    Only CTER supports this by using a selection list.
+
+    file_inputs - Input names of the files for ctf estimation
+    batch_dir - Output directory of the batch
+    settings - TranSPHIRE settings
+    queue_com - Queue for communication
+    name - Name of process
+
+    Returns:
+    CTF command
+    File to check vor validation if the process was successful
+    """
+    ctf_name = settings['Copy']['CTF']
+    if ctf_name == 'CTER v1.0':
+        try:
+            shutil.rmtree(batch_dir)
+        except FileNotFoundError:
+            pass
+        tu.mkdir_p(batch_dir)
+
+        selection_file = os.path.join(batch_dir, 'selection.txt')
+        with open(selection_file, 'w') as write:
+            write.write('{0}\n'.format(
+                '\n'.join([os.path.basename(entry) for entry in file_inputs])
+                ))
+
+        _, extension = os.path.splitext(file_inputs[0])
+        command = ' '.join(tt.fill(
+            template=settings['command_templates']['CTF'],
+            values={
+                'input_pattern': os.path.join(
+                    os.path.dirname(file_inputs[0]),
+                    '*{0}'.format(extension)
+                    ),
+                'output_dir': os.path.join(batch_dir, 'output'),
+                'selection_list': selection_file,
+                }
+            ))
+        check_files = ['{0}/output/partres.txt'.format(batch_dir)]
+
+    else:
+        message = '\n'.join([
+            '{0}: Batch mode not supported!'.format(settings['Copy']['CTF']),
+            'Please contact the TranSPHIRE authors!'
+            ])
+        queue_com['error'].put(
+            message,
+            name
+            )
+        raise IOError(message)
 
     return command, check_files
 
 
+def split_ctf_batch(batch_dir, file_input, output_dir):
+    """
+    Move the results of one micrograph out of a batch output directory.
+    The layout afterwards is the same as for a single program call.
+
+    batch_dir - Output directory of the batch
+    file_input - Input name of the micrograph
+    output_dir - Output directory of the micrograph
+
+    Returns:
+    None
+    """
+    batch_output = os.path.join(batch_dir, 'output')
+    mic_name = os.path.basename(file_input)
+    mic_root, _ = os.path.splitext(mic_name)
+
+    with open(os.path.join(batch_output, 'partres.txt'), 'r') as read:
+        lines = [
+            line for line in read.readlines()
+            if line.strip() and
+            os.path.basename(line.split()[-1]) == mic_name
+            ]
+    if not lines:
+        raise IOError('{0} missing in CTER batch output {1}!'.format(
+            mic_name,
+            batch_output
+            ))
+    else:
+        pass
+
+    try:
+        shutil.rmtree(output_dir)
+    except FileNotFoundError:
+        pass
+    tu.mkdir_p(output_dir)
+
+    # Per micrograph outputs are named <root>_<suffix>, e.g. pwrot/micthumb
+    for sub_dir in sorted(glob.glob('{0}/*/'.format(batch_output))):
+        sub_name = os.path.basename(os.path.dirname(sub_dir))
+        for file_name in glob.glob('{0}{1}_*'.format(sub_dir, mic_root)):
+            suffix = os.path.basename(file_name)[len(mic_root)+1:]
+            if '_' in suffix:
+                continue
+            else:
+                pass
+            tu.mkdir_p(os.path.join(output_dir, sub_name))
+            shutil.move(
+                file_name,
+                os.path.join(output_dir, sub_name, os.path.basename(file_name))
+                )
+
+    with open(os.path.join(output_dir, 'partres.txt'), 'w') as write:
+        write.write(lines[0])
+
+
 def find_logfiles(root_path, file_name, settings, queue_com, name):
     """
     Find logfiles related to the produced CTF files.
@@ -156,10 +323,8 @@ def recursive_file_search(directory, files):
             files.append(name)
 
 
-def create_gctf_v1_06_command(
-        ctf_name, file_input, file_output, settings
-        ):
-    """Create the Gctf v1.06 command"""
+def create_gctf_v1_06_command(ctf_name, settings):
+    """Create the Gctf v1.06 command template"""
 
     command = []
     # Start the program
@@ -185,42 +350,30 @@ def create_gctf_v1_06_command(
         ignore_list.append('Use movies')
 
     command.append('--ctfstar')
-    command.append('{0}_gctf.star'.format(file_output))
-
-    for key in settings[ctf_name]:
-        if key in ignore_list:
-            continue
-        elif settings[ctf_name][key]:
-            command.append(key)
-            command.append(
-                '{0}'.format(settings[ctf_name][key])
-                )
-        else:
-            continue
+    command.append('{0}_gctf.star'.format(tt.placeholder('file_output')))
 
-    command.append('{0}'.format(file_input))
+    command.extend(tt.settings_to_arguments(
+        program_settings=settings[ctf_name],
+        ignore_list=ignore_list
+        ))
 
-    return ' '.join(command)
+    command.append(tt.placeholder('file_input'))
 
-def create_cter_1_0_command(
-        ctf_name, file_input, output_dir, settings
-        ):
-    """Create the CTER v1.0 command"""
+    return command
 
-    try:
-        shutil.rmtree(output_dir)
-    except FileNotFoundError:
-        pass
+def create_cter_1_0_command(ctf_name, settings):
+    """Create the CTER v1.0 command template"""
 
     command = []
     # Start the program
     command.append('{0}'.format(settings['Path'][ctf_name]))
-    command.append("'{0}*'".format(file_input))
-    command.append(output_dir)
+    command.append(tt.placeholder('input_pattern'))
+    command.append(tt.placeholder('output_dir'))
     command.append('--selection_list')
-    command.append(file_input)
+    command.append(tt.placeholder('selection_list'))
     ignore_list = []
     ignore_list.append('Phase plate')
+    ignore_list.append('Batch size')
     if settings[ctf_name]['Phase plate'] == 'False':
         ignore_list.append('--defocus_min')
         ignore_list.append('--defocus_max')
@@ -237,25 +390,24 @@ def create_cter_1_0_command(
     else:
         pass
 
-    for key in settings[ctf_name]:
-        if key in ignore_list:
-            continue
-        elif settings[ctf_name][key]:
-            command.append(key)
-            command.append(
-                '{0}'.format(settings[ctf_name][key])
-                )
-        else:
-            continue
+    command.extend(tt.settings_to_arguments(
+        program_settings=settings[ctf_name],
+        ignore_list=ignore_list
+        ))
 
-    return ' '.join(command)
+    return command
 
-def create_ctffind_4_v4_1_8_command(ctf_name, file_input, file_output, settings):
+def create_ctffind_4_v4_1_8_command(ctf_name, settings):
     """Create the ctffind command"""
+    return ['{0}'.format(settings['Path'][ctf_name])]
+
+
+def create_ctffind_4_v4_1_8_input(ctf_name, settings):
+    """Create the answers to the interactive ctffind questions"""
     ctf_settings = settings[ctf_name]
     ctffind_command = []
     # Input file
-    ctffind_command.append('{0}'.format(file_input))
+    ctffind_command.append(tt.placeholder('file_input'))
     # Is movie
     if ctf_settings['Use movies'] == 'True':
         ctffind_command.append('{0}'.format('yes'))
@@ -263,7 +415,7 @@ def create_ctffind_4_v4_1_8_command(ctf_name, file_input, file_output, settings)
     else:
         pass
     # Output file
-    ctffind_command.append('{0}'.format(file_output))
+    ctffind_command.append(tt.placeholder('file_output'))
     # Pixel size
     ctffind_command.append('{0}'.format(ctf_settings['Pixel size']))
     # Acceleration voltage
@@ -347,11 +499,7 @@ def create_ctffind_4_v4_1_8_command(ctf_name, file_input, file_output, settings)
     else:
         pass
 
-    command = 'echo "{0}" | {1}'.format(
-        '\n'.join(ctffind_command),
-        settings['Path'][ctf_name]
-        )
-    return command
+    return ctffind_command
 
 
 def combine_ctf_outputs(
@@ -0,0 +1,342 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import json
+import signal
+import time as ti
+import subprocess as sp
+import pexpect as pe
+
+
+class ProcessStopped(Exception):
+    """
+    Raised, if a program has been killed because the user pressed Stop.
+    """
+    pass
+
+
+def get_timeout(tool, settings, file_number=1):
+    """
+    Timeout of a tool in seconds.
+    The timeouts of the settings are per file, so batches get the timeout
+    of all their files.
+
+    tool - Type of the process, e.g. Motion or Copy_work
+    settings - TranSPHIRE settings
+    file_number - Number of files the program handles
+
+    Returns:
+    Timeout in seconds, None if there is no timeout
+    """
+    timeout_dict = {
+        'Copy': 'Timeout copy (min)',
+        'Motion': 'Timeout motion (min)',
+        'CTF': 'Timeout CTF (min)',
+        'Compress': 'Timeout compress (min)',
+        }
+    try:
+        minutes = float(settings['General'][timeout_dict[tool.split('_')[0]]])
+    except KeyError:
+        return None
+    if minutes > 0:
+        return 60 * minutes * max(file_number, 1)
+    else:
+        return None
+
+
+def create_job(command, tool, settings, file_number=1):
+    """
+    Job dictionary of a program that has just been started.
+
+    command - Command of the program
+    tool - Type of the process, e.g. Motion or Copy_work
+    settings - TranSPHIRE settings
+    file_number - Number of files the program handles
+
+    Returns:
+    Job dictionary
+    """
+    return {
+        'process': None,
+        'command': command,
+        'tool': tool,
+        'err': None,
+        'start_time': ti.time(),
+        'stop_time': None,
+        'kill_time': None,
+        'timeout': get_timeout(
+            tool=tool,
+            settings=settings,
+            file_number=file_number
+            ),
+        'status': None,
+        'rusage': None,
+        'timed_out': False,
+        'stopped': False,
+        }
+
+
+def start_command(command, out, err, tool, settings, shell=False, file_number=1):
+    """
+    Start a program without waiting for it.
+
+    command - Command to run
+    out - Opened file for the program output
+    err - Opened file for error messages
+    tool - Type of the process, e.g. Motion or Copy_work
+    settings - TranSPHIRE settings
+    shell - Run the command in a shell
+    file_number - Number of files the program handles
+
+    Returns:
+    Job dictionary
+    """
+    if shell:
+        args = command
+    else:
+        args = command.split()
+    job = create_job(
+        command=command,
+        tool=tool,
+        settings=settings,
+        file_number=file_number
+        )
+    # Own session, so the kill reaches every child of a shell command.
+    job['process'] = sp.Popen(
+        args,
+        shell=shell,
+        stdout=out,
+        stderr=err,
+        start_new_session=True
+        )
+    job['err'] = err
+    return job
+
+
+def kill_command(job):
+    """
+    Terminate a job, kill it if it does not react within 5 seconds.
+
+    job - Job dictionary
+
+    Returns:
+    None
+    """
+    if job['kill_time'] is None:
+        job['kill_time'] = ti.time()
+        kill_signal = signal.SIGTERM
+    elif ti.time() - job['kill_time'] > 5:
+        kill_signal = signal.SIGKILL
+    else:
+        return None
+
+    try:
+        os.killpg(job['process'].pid, kill_signal)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def poll_command(job, stop_check=None):
+    """
+    Check a job once without blocking.
+    Kill it on timeout or if the user pressed Stop.
+
+    job - Job dictionary
+    stop_check - Function that returns True if the process should stop
+
+    Returns:
+    True, if the job finished
+    """
+    if job['status'] is not None:
+        return True
+    else:
+        pass
+
+    pid, status, rusage = os.wait4(job['process'].pid, os.WNOHANG)
+    if pid == 0:
+        if stop_check is not None and stop_check():
+            job['stopped'] = True
+            kill_command(job)
+        elif job['timeout'] is not None and \
+                ti.time() - job['start_time'] > job['timeout']:
+            job['timed_out'] = True
+            kill_command(job)
+        else:
+            pass
+        return False
+    else:
+        pass
+
+    if os.WIFSIGNALED(status):
+        job['status'] = -os.WTERMSIG(status)
+    else:
+        job['status'] = os.WEXITSTATUS(status)
+    # Reaped by wait4, tell Popen about it.
+    job['process'].returncode = job['status']
+    job['rusage'] = rusage
+    job['stop_time'] = ti.time()
+
+    if job['timed_out']:
+        job['err'].write('\nTimeout: {0} killed after {1:.0f} sec\n'.format(
+            job['command'].split()[0],
+            job['stop_time'] - job['start_time']
+            ))
+    elif job['stopped']:
+        job['err'].write('\nStopped: {0} killed by the user\n'.format(
+            job['command'].split()[0]
+            ))
+    else:
+        pass
+    return True
+
+
+def wait_commands(jobs, stop_check=None, interval=0.1):
+    """
+    Wait for several jobs at once.
+
+    jobs - List of job dictionaries
+    stop_check - Function that returns True if the process should stop
+    interval - Time between two checks in seconds
+
+    Returns:
+    None
+    """
+    while True:
+        finished = [poll_command(job=job, stop_check=stop_check) for job in jobs]
+        if all(finished):
+            break
+        else:
+            ti.sleep(interval)
+
+
+def run_command(
+        command, out, err, tool, settings,
+        stop_check=None, record_file=None, shell=False, file_number=1
+        ):
+    """
+    Run a program and wait for it.
+
+    command - Command to run
+    out - Opened file for the program output
+    err - Opened file for error messages
+    tool - Type of the process, e.g. Motion or Copy_work
+    settings - TranSPHIRE settings
+    stop_check - Function that returns True if the process should stop
+    record_file - File to append the resource record to
+    shell - Run the command in a shell
+    file_number - Number of files the program handles
+
+    Returns:
+    Exit status
+    """
+    job = start_command(
+        command=command,
+        out=out,
+        err=err,
+        tool=tool,
+        settings=settings,
+        shell=shell,
+        file_number=file_number
+        )
+    wait_commands(jobs=[job], stop_check=stop_check)
+    write_record(job=job, record_file=record_file)
+    if job['stopped']:
+        raise ProcessStopped(command)
+    else:
+        pass
+    return job['status']
+
+
+def wait_child(child, command, tool, settings, stop_check=None):
+    """
+    Wait for a pexpect child without blocking.
+    Kill it on timeout or if the user pressed Stop.
+    Pexpect reaps the child itself, so there is no rusage; the caller writes
+    the wall time and the exit status with write_record.
+
+    child - Pexpect child
+    command - Command of the child
+    tool - Type of the process, e.g. Motion or Copy_work
+    settings - TranSPHIRE settings
+    stop_check - Function that returns True if the process should stop
+
+    Returns:
+    Job dictionary
+    """
+    job = create_job(command=command, tool=tool, settings=settings)
+    while True:
+        try:
+            child.expect(pe.EOF, timeout=0.1)
+        except pe.TIMEOUT:
+            if stop_check is not None and stop_check():
+                job['stopped'] = True
+            elif job['timeout'] is not None and \
+                    ti.time() - job['start_time'] > job['timeout']:
+                job['timed_out'] = True
+            else:
+                continue
+            child.close(force=True)
+            break
+        else:
+            child.close()
+            break
+    job['stop_time'] = ti.time()
+    if child.signalstatus:
+        job['status'] = -child.signalstatus
+    else:
+        job['status'] = child.exitstatus
+    return job
+
+
+def write_record(job, record_file):
+    """
+    Append the resources used by a job as one JSON line.
+
+    job - Job dictionary
+    record_file - File to append to, nothing is written if None
+
+    Returns:
+    None
+    """
+    if record_file is None:
+        return None
+    else:
+        pass
+
+    record = {
+        'tool': job['tool'],
+        'command': job['command'],
+        'start': job['start_time'],
+        'wall_time': job['stop_time'] - job['start_time'],
+        'status': job['status'],
+        'timed_out': job['timed_out'],
+        'stopped': job['stopped'],
+        }
+    if job['rusage'] is not None:
+        record.update({
+            'user_time': job['rusage'].ru_utime,
+            'system_time': job['rusage'].ru_stime,
+            'max_rss_kb': job['rusage'].ru_maxrss,
+            'in_blocks': job['rusage'].ru_inblock,
+            'out_blocks': job['rusage'].ru_oublock,
+            })
+    else:
+        pass
+
+    with open(record_file, 'a') as append:
+        append.write('{0}\n'.format(json.dumps(record)))
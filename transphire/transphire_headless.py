@@ -0,0 +1,539 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Headless pipeline runner.
+    Runs the pipeline of a settings file saved by the GUI without creating
+    any widgets, e.g. on processing nodes or for benchmarks:
+        transphire_headless project.txt --max_runtime 3600 --json
+    The mount points need to be mounted already; plots are not created.
+    Stop the run with Ctrl+C or SIGTERM.
+"""
+import os
+import ast
+import sys
+import json
+import signal
+import shutil
+import getpass
+import argparse
+import time as ti
+try:
+    from PyQt4.QtCore import QCoreApplication
+except ImportError:
+    from PyQt5.QtCore import QCoreApplication
+
+from transphire.processworker import ProcessWorker
+from transphire.quotatracker import QuotaTracker
+from transphire.capacitymonitor import CapacityMonitor
+from transphire import transphire_utils as tu
+
+
+def get_content_settings(settings_file, settings_folder):
+    """
+    Settings of a settings file in the format of the get_settings methods
+    of the content widgets used by MainWindow.start.
+
+    settings_file - Settings file saved by the GUI
+    settings_folder - Folder containing the settings
+
+    Returns:
+    Dictionary: content name -> list of settings, list of errors
+    """
+    content_settings = {}
+    error_list = []
+    function_dict = tu.get_function_dict()
+    for key, settings in tu.read_settings_file(settings_file).items():
+        if key == 'End':
+            continue
+        elif key == 'Frames':
+            # Same types as the FrameWidget
+            content_settings[key] = [
+                {
+                    'first': int(entry['first']),
+                    'last': int(entry['last']),
+                    'dw': bool(entry['dw'] == 'True'),
+                    'default': bool(entry['default'] == 'True'),
+                    }
+                for entry in settings
+                ]
+        elif key not in function_dict:
+            print('Key', key, 'no longer exists')
+        elif key == 'Notification':
+            # Text and check box state, like the NotificationWidget
+            content_settings[key] = [{
+                name: '\t'.join(value) for name, value in settings.items()
+                }]
+        else:
+            content_settings[key] = [settings]
+
+    # Combo box entries are saved as list representation
+    for name in ['CTF_entries', 'Motion_entries']:
+        try:
+            content_settings['Copy'][0][name] = ast.literal_eval(
+                content_settings['Copy'][0][name]
+                )
+        except KeyError:
+            error_list.append('Copy:{0} is missing!'.format(name))
+        except (ValueError, SyntaxError):
+            error_list.append('Copy:{0} is not valid!'.format(name))
+
+    # The mount points are not part of the settings file
+    mount_dict = {}
+    for entry in tu.get_default_content(name='Mount', settings_folder=settings_folder):
+        settings = {}
+        for widget in entry:
+            for key in widget:
+                settings[key] = widget[key][0]
+        if settings.get('Mount name'):
+            mount_dict[settings['Mount name']] = settings
+        else:
+            pass
+    content_settings['Mount'] = [mount_dict]
+
+    return content_settings, error_list
+
+
+def build_settings(
+        settings_file, settings_folder, mount_directory,
+        continue_run, copy_software_meta
+        ):
+    """
+    Create the settings passed to the ProcessWorker, like MainWindow.start.
+
+    settings_file - Settings file saved by the GUI
+    settings_folder - Folder containing the settings
+    mount_directory - Folder containing the mount points
+    continue_run - Continue, if the project folder already exists
+    copy_software_meta - Copy the software metafiles again in continue mode
+
+    Returns:
+    Settings dictionary, list of errors
+    """
+    content_settings, error_list = get_content_settings(
+        settings_file=settings_file,
+        settings_folder=settings_folder
+        )
+    if error_list:
+        return None, error_list
+    else:
+        pass
+
+    settings, error_list = tu.get_settings_from_content(
+        content_settings=content_settings
+        )
+    if error_list:
+        return None, error_list
+    else:
+        pass
+
+    content_others = tu.get_default_content(
+        name='Others',
+        settings_folder=settings_folder
+        )
+    error = tu.set_project_settings(
+        settings=settings,
+        settings_folder=settings_folder,
+        mount_directory=mount_directory,
+        project_name_pattern=tu.get_content_value(
+            content=content_others,
+            name='Project name pattern'
+            ),
+        project_name_pattern_example=tu.get_content_value(
+            content=content_others,
+            name='Project name pattern example'
+            )
+        )
+    if error is not None:
+        return None, [error]
+    else:
+        pass
+
+    # Check for continue mode
+    if os.path.exists(settings['project_folder']):
+        if not continue_run:
+            return None, [
+                'Output project folder already exists: {0}\n'.format(
+                    settings['project_folder']
+                    ) +
+                'Use --continue to continue the old run'
+                ]
+        else:
+            settings['Copy_software_meta'] = copy_software_meta
+    else:
+        settings['Copy_software_meta'] = True
+
+    error = tu.create_project_folders(settings=settings)
+    if error is not None:
+        return None, [error]
+    else:
+        pass
+
+    return settings, []
+
+
+def save_settings_file(settings_file, settings):
+    """
+    Copy the settings file to the project settings folder.
+    Existing files are not overwritten, like in MainWindow.save.
+
+    settings_file - Settings file saved by the GUI
+    settings - Settings dictionary
+
+    Returns:
+    Name of the copy
+    """
+    file_name = os.path.join(
+        settings['settings_folder'],
+        '{0}.txt'.format(settings['General']['Project name'])
+        )
+    if os.path.exists(file_name):
+        old_filename = file_name
+        for number in range(9999):
+            file_name = '{0}_{1}'.format(old_filename, number)
+            if os.path.exists(file_name):
+                continue
+            else:
+                break
+    else:
+        pass
+    shutil.copy(settings_file, file_name)
+    return file_name
+
+
+def need_sudo_password(settings):
+    """
+    Check, if copying to a mount point needs the sudo password.
+
+    settings - Settings dictionary
+
+    Returns:
+    True, if the sudo password is needed
+    """
+    for mount_settings in settings['Mount'].values():
+        if mount_settings.get('Need sudo for copy?') == 'True':
+            return True
+        else:
+            pass
+    return False
+
+
+class ConsoleReporter(object):
+    """
+    Print the signals of the ProcessWorker to stdout.
+    Every line is either a tab separated text line or a JSON object.
+
+    Inherits from:
+    object
+    """
+
+    def __init__(self, json_output):
+        """
+        Initialize object variables.
+
+        Arguments:
+        json_output - If True, print one JSON object per line
+
+        Return:
+        None
+        """
+        super(ConsoleReporter, self).__init__()
+        self.json_output = json_output
+        self.bottleneck = None
+        self.errors = 0
+
+    def write(self, event, text=None, **kwargs):
+        """
+        Print one line.
+
+        Arguments:
+        event - Event name
+        text - Text of the text output
+        kwargs - Values of the JSON output
+
+        Return:
+        None
+        """
+        if self.json_output:
+            kwargs['event'] = event
+            kwargs['time'] = ti.time()
+            line = json.dumps(kwargs)
+        else:
+            line = '{0}\t{1}\t{2}'.format(
+                ti.strftime('%Y-%m-%d %H:%M:%S'),
+                event,
+                text
+                )
+        sys.stdout.write('{0}\n'.format(line))
+        sys.stdout.flush()
+
+    def status(self, text, device, color):
+        """
+        Status text of a device.
+
+        Arguments:
+        text - Status text
+        device - Device name
+        color - Color of the text
+
+        Return:
+        None
+        """
+        if self.json_output:
+            self.write('status_text', device=device, text=text, color=color)
+        else:
+            self.write('status', '{0}\t{1}'.format(device, text))
+
+    def status_data(self, status):
+        """
+        Structured status of a device; only part of the JSON output.
+
+        Arguments:
+        status - Status dictionary sent by ProcessThread.put_status
+
+        Return:
+        None
+        """
+        if self.json_output:
+            self.write('status', **status)
+        else:
+            pass
+
+    def metrics(self, metrics):
+        """
+        Stage metrics; the text output only shows changes of the bottleneck.
+
+        Arguments:
+        metrics - Dictionary with the stages and the bottleneck
+
+        Return:
+        None
+        """
+        if self.json_output:
+            self.write('metrics', **metrics)
+        elif metrics['bottleneck'] != self.bottleneck:
+            self.write('bottleneck', metrics['bottleneck'])
+        else:
+            pass
+        self.bottleneck = metrics['bottleneck']
+
+    def error(self, text):
+        """
+        Error of the pipeline.
+
+        Arguments:
+        text - Error message
+
+        Return:
+        None
+        """
+        self.errors += 1
+        self.write('error', text.replace('\n', ' '), text=text)
+
+    def notification(self, text):
+        """
+        Notification of the pipeline.
+
+        Arguments:
+        text - Notification message
+
+        Return:
+        None
+        """
+        self.write('notification', text.replace('\n', ' '), text=text)
+
+
+def run_pipeline(args):
+    """
+    Build the settings and run the pipeline until it is stopped.
+
+    args - Parsed command line arguments
+
+    Returns:
+    Exit status
+    """
+    reporter = ConsoleReporter(json_output=args.json)
+
+    # Resolve the paths like the GUI, relative to the root directory
+    settings_file = os.path.abspath(args.settings_file)
+    os.chdir(args.root_directory)
+    if not os.path.isdir(args.settings_directory):
+        reporter.error('Settings directory does not exist: {0}'.format(
+            os.path.abspath(args.settings_directory)
+            ))
+        return 1
+    elif not os.path.isfile(settings_file):
+        reporter.error('Settings file does not exist: {0}'.format(
+            settings_file
+            ))
+        return 1
+    else:
+        pass
+
+    settings, error_list = build_settings(
+        settings_file=settings_file,
+        settings_folder=args.settings_directory,
+        mount_directory=args.mount_directory,
+        continue_run=args.continue_run,
+        copy_software_meta=args.copy_software_meta
+        )
+    if settings is None:
+        for error in error_list:
+            reporter.error(error)
+        return 1
+    else:
+        pass
+
+    if need_sudo_password(settings):
+        password = getpass.getpass('Sudo password: ')
+    else:
+        password = ''
+
+    app = QCoreApplication([])
+    content_pipeline = tu.get_default_content(
+        name='Pipeline',
+        settings_folder=args.settings_directory
+        )
+    capacity_monitor = CapacityMonitor()
+    capacity_monitor.start()
+    process_worker = ProcessWorker(
+        password=password,
+        content_process=content_pipeline,
+        mount_directory=args.mount_directory,
+        quota_tracker=QuotaTracker(),
+        capacity_monitor=capacity_monitor
+        )
+    process_worker.sig_status.connect(reporter.status)
+    process_worker.sig_status_data.connect(reporter.status_data)
+    process_worker.sig_metrics.connect(reporter.metrics)
+    process_worker.sig_error.connect(reporter.error)
+    process_worker.sig_notification.connect(reporter.notification)
+
+    def stop_pipeline(signum, frame):
+        """
+        Stop the pipeline; running jobs are finished first.
+
+        signum - Signal number
+        frame - Current stack frame
+
+        Returns:
+        None
+        """
+        reporter.write('stopping', signal.Signals(signum).name)
+        process_worker.stop = True
+
+    signal.signal(signal.SIGINT, stop_pipeline)
+    signal.signal(signal.SIGTERM, stop_pipeline)
+    if args.max_runtime is not None:
+        signal.signal(signal.SIGALRM, stop_pipeline)
+        signal.alarm(args.max_runtime)
+    else:
+        pass
+
+    reporter.write(
+        'start',
+        settings['project_folder'],
+        project_folder=settings['project_folder'],
+        settings_file=save_settings_file(
+            settings_file=settings_file,
+            settings=settings
+            )
+        )
+    start = ti.time()
+    # Without a GUI the worker runs in the main thread, so the signals
+    # are handled directly.
+    process_worker.run(settings)
+    signal.alarm(0)
+    capacity_monitor.stop_monitor()
+    runtime = ti.time() - start
+    reporter.write(
+        'finished',
+        '{0:.1f}s'.format(runtime),
+        runtime=runtime,
+        errors=reporter.errors
+        )
+    app.quit()
+    # Failed pre-checks and errors of the pipeline fail the run
+    if reporter.errors:
+        return 1
+    else:
+        return 0
+
+
+def main():
+    """
+    Parse the arguments and run the pipeline.
+
+    Arguments:
+    None
+
+    Return:
+    None
+    """
+    parser = argparse.ArgumentParser(
+        description='Run the TranSPHIRE pipeline without the GUI'
+        )
+    parser.add_argument(
+        'settings_file',
+        type=str,
+        help='Settings file saved by the GUI'
+        )
+    parser.add_argument(
+        '--root_directory',
+        default=os.environ['HOME'],
+        type=str,
+        help='Directory where transphire is started'
+        )
+    parser.add_argument(
+        '--settings_directory',
+        default='.transphire_settings',
+        type=str,
+        help='Folder containing the settings'
+        )
+    parser.add_argument(
+        '--mount_directory',
+        default='mounted',
+        type=str,
+        help='Folder containing the mount points'
+        )
+    parser.add_argument(
+        '--continue',
+        dest='continue_run',
+        action='store_true',
+        help='Continue, if the project folder already exists'
+        )
+    parser.add_argument(
+        '--copy_software_meta',
+        action='store_true',
+        help='Copy the software metafiles (Atlas, ...) again in continue mode'
+        )
+    parser.add_argument(
+        '--max_runtime',
+        default=None,
+        type=int,
+        help='Stop the pipeline after this time in seconds'
+        )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Print one JSON object per line'
+        )
+    args = parser.parse_args()
+    sys.exit(run_pipeline(args))
+
+
+if __name__ == '__main__':
+    main()
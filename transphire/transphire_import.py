@@ -124,6 +124,7 @@ def get_dtype_dict():
         ('file_name', '|S200')
         ]
     dtype['motion'] = [
+        ('mic_number', '<f8'),
         ('overall drift', '<f8'),
         ('average drift per frame', '<f8'),
         ('first frame drift', '<f8'),
@@ -17,6 +17,7 @@
 """
 
 import os
+from transphire import transphire_template as tt
 
 
 def get_motion_default(settings, motion_frames, queue_com, name):
@@ -94,6 +95,32 @@ def get_dw_file_name(output_transfer_scratch, file_name, settings, queue_com, na
         raise IOError(message)
 
 
+def compile_motion_templates(settings):
+    """
+    Compile the motion command once per session.
+
+    settings - TranSPHIRE settings.
+
+    Returns:
+    Dictionary: Motion -> List of arguments with placeholders
+    """
+    motion_name = settings['Copy']['Motion']
+    if motion_name == 'MotionCor2 v1.0.0' or \
+            motion_name == 'MotionCor2 v1.0.5' or \
+            motion_name == 'MotionCor2 v1.1.0':
+        template = create_motion_cor_2_v1_0_0_command(
+            motion_name=motion_name,
+            settings=settings
+            )
+
+    else:
+        raise IOError(
+            '{0}: Motion version not known.'.format(motion_name)
+            )
+
+    return {'Motion': template}
+
+
 def get_motion_command(file_input, file_output_scratch, file_log_scratch, settings, queue_com, name):
     """
     Get the command for the selected motion software.
@@ -112,15 +139,28 @@ def get_motion_command(file_input, file_output_scratch, file_log_scratch, settin
     if motion_name == 'MotionCor2 v1.0.0' or \
             motion_name == 'MotionCor2 v1.0.5' or \
             motion_name == 'MotionCor2 v1.1.0':
-        return create_motion_cor_2_v1_0_0_command(
-            motion_name=settings['Copy']['Motion'],
-            file_input=file_input,
-            file_output=file_output_scratch,
-            file_log=file_log_scratch,
-            settings=settings,
-            queue_com=queue_com,
-            name=name
-            )
+        _, extension = os.path.splitext(file_input)
+        if extension == '.tiff' or \
+                extension == '.tif':
+            input_flag = '-InTiff'
+
+        elif extension == '.mrc':
+            input_flag = '-InMrc'
+
+        else:
+            message = '{0}: Not known!'.format(extension)
+            queue_com['error'].put(message, name)
+            raise IOError(message)
+
+        return ' '.join(tt.fill(
+            template=settings['command_templates']['Motion'],
+            values={
+                'input_flag': input_flag,
+                'file_input': file_input,
+                'file_output': file_output_scratch,
+                'file_log': file_log_scratch,
+                }
+            ))
 
     else:
         message = '\n'.join([
@@ -134,60 +174,39 @@ def get_motion_command(file_input, file_output_scratch, file_log_scratch, settin
         raise IOError(message)
 
 
-def create_motion_cor_2_v1_0_0_command(motion_name, file_input, file_output, file_log, settings, queue_com, name):
+def create_motion_cor_2_v1_0_0_command(motion_name, settings):
     """
-    Create the MotionCor2 v1.0.0 command
+    Create the MotionCor2 v1.0.0 command template
 
-    file_input - Input file for motion correction.
-    file_output - Output filename
-    file_log - Logfile name
+    motion_name - Name of the motion software.
     settings - TranSPHIRE settings.
-    queue_com - Queue for communication.
-    name - Name of the process.
 
     Returns:
-    Command for MotionCor2 v1.0.0
+    Argument list for MotionCor2 v1.0.0 with placeholders
     """
 
     command = []
     # Start the program
     command.append('{0}'.format(settings['Path'][motion_name]))
     # Input Micrograph
-    _, extension = os.path.splitext(file_input)
-    if extension == '.tiff' or \
-            extension == '.tif':
-        command.append('-InTiff')
-        command.append('{0}'.format(file_input))
-
-    elif extension == '.mrc':
-        command.append('-InMrc')
-        command.append('{0}'.format(file_input))
-
-    else:
-        message = '{0}: Not known!'.format(extension)
-        queue_com['error'].put(message, name)
-        raise IOError(message)
-
+    command.append(tt.placeholder('input_flag'))
+    command.append(tt.placeholder('file_input'))
     # Output micrograph
     command.append('-OutMrc')
-    command.append('{0}'.format(file_output))
+    command.append(tt.placeholder('file_output'))
     # Write the output stack
     command.append('-OutStack')
     command.append('1')
     # Log file
     command.append('-LogFile')
-    command.append('{0}'.format(file_log))
+    command.append(tt.placeholder('file_log'))
 
-    for key in settings[motion_name]:
-        if settings[motion_name][key]:
-            command.append(key)
-            command.append(
-                '{0}'.format(settings[motion_name][key])
-                )
-        else:
-            continue
+    command.extend(tt.settings_to_arguments(
+        program_settings=settings[motion_name],
+        ignore_list=[]
+        ))
 
-    return ' '.join(command)
+    return command
 
 
 def create_sum_movie_command(
@@ -0,0 +1,145 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+    Mount probe that runs in its own process.
+    A share that went away can block every file system call forever, so
+    mountmonitor.MountMonitor starts this script with a timeout instead of
+    touching the mount point itself. The result is one JSON line:
+        {"state": "mounted", "message": "", "latency": 0.002}
+    States: mounted, not_mounted, removed, missing, key_expired, error
+"""
+import os
+import sys
+import json
+import argparse
+import time as ti
+
+
+def probe_point(folder, remove=False):
+    """
+    Check, if the folder itself is a mount point.
+
+    folder - Folder to check
+    remove - Remove the folder, if it is an empty folder and not mounted
+
+    Returns:
+    State, message
+    """
+    if os.path.ismount(folder):
+        return 'mounted', ''
+    else:
+        pass
+
+    if remove:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+        else:
+            return 'removed', ''
+    else:
+        pass
+
+    try:
+        os.listdir(folder)
+    except PermissionError:
+        return 'mounted', ''
+    except FileNotFoundError as err:
+        return 'missing', str(err)
+    except OSError as err:
+        if 'Required key' in str(err):
+            return 'key_expired', str(err)
+        else:
+            return 'error', str(err)
+    else:
+        return 'not_mounted', ''
+
+
+def probe_tree(folder):
+    """
+    Check, if the folder or one of its parents is a mount point.
+
+    folder - Folder to check
+
+    Returns:
+    State, message
+    """
+    folder_names = folder.split('/')
+    # The process is not running.
+    if folder_names[-1] == 'False':
+        return 'not_mounted', ''
+    else:
+        pass
+
+    for idx in range(1, len(folder_names)+1):
+        current_dir = os.path.join(*folder_names[0:idx])
+        if not current_dir:
+            continue
+        elif folder_names[0]:
+            pass
+        else:
+            current_dir = '/{0}'.format(current_dir)
+
+        if os.path.ismount(current_dir):
+            return 'mounted', ''
+        else:
+            try:
+                os.listdir(current_dir)
+            except PermissionError:
+                return 'mounted', ''
+            except FileNotFoundError as err:
+                return 'missing', str(err)
+            except OSError as err:
+                if 'Required key' in str(err):
+                    return 'key_expired', str(err)
+                else:
+                    return 'error', str(err)
+            else:
+                pass
+    return 'not_mounted', ''
+
+
+def main():
+    """
+    Parse the arguments and print the probe result.
+
+    Arguments:
+    None
+
+    Return:
+    None
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('folder')
+    parser.add_argument('--mode', choices=['point', 'tree'], default='point')
+    parser.add_argument('--remove', action='store_true')
+    args = parser.parse_args()
+
+    start = ti.time()
+    if args.mode == 'tree':
+        state, message = probe_tree(args.folder)
+    else:
+        state, message = probe_point(args.folder, remove=args.remove)
+    sys.stdout.write('{0}\n'.format(json.dumps({
+        'state': state,
+        'message': message,
+        'latency': ti.time() - start,
+        })))
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,7 @@ import numpy as np
 def get_mic_number(array, settings):
     """
     Identify the micrograph number out of the name string.
+    The names are split with vectorized string operations.
 
     Arguments:
     array - Array containing information
@@ -29,35 +30,47 @@ def get_mic_number(array, settings):
     Return:
     Array of micrograph numbers
     """
-    error = False
-    if settings['General']['Rename micrographs'] == 'True':
-        number_list = []
-        prefix = settings['General']['Rename prefix']
-        suffix = settings['General']['Rename suffix']
-        for entry in array:
-            if suffix == '':
-                first_part = entry.split('.'.encode('utf-8'))[0]
-            else:
-                first_part_split = entry.split(suffix.encode('utf-8'))
-                first_part = suffix.encode('utf-8').join(first_part_split[:-1])
-            if prefix == '':
-                number = first_part
-            else:
-                number = first_part.split(prefix.encode('utf-8'))[-1]
-            try:
-                number_list.append(int(number))
-            except ValueError:
-                error = True
-                break
+    if settings['General']['Rename micrographs'] != 'True':
+        return np.arange(len(array))
     else:
-        number_list = np.arange(len(array))
+        pass
 
-    if error:
-        number_list = np.arange(len(array))
+    array = np.asarray(array, dtype=bytes)
+    prefix = settings['General']['Rename prefix'].encode('utf-8')
+    suffix = settings['General']['Rename suffix'].encode('utf-8')
+    if suffix == b'':
+        first_part = np.char.partition(array, b'.')[..., 0]
     else:
-        pass
+        split = np.char.rpartition(array, suffix)
+        if np.any(split[..., 1] == b''):
+            return np.arange(len(array))
+        else:
+            first_part = split[..., 0]
+
+    if prefix == b'':
+        number = first_part
+    else:
+        number = np.char.rpartition(first_part, prefix)[..., 2]
+
+    try:
+        return number.astype(int)
+    except (ValueError, OverflowError):
+        return np.arange(len(array))
+
+
+def add_mic_number(data, settings):
+    """
+    Store the micrograph numbers with the data, so the plots do not need
+    to parse the file names again.
+
+    Arguments:
+    data - Data containing a mic_number and a file_name column
+    settings - User provided settings
 
-    return np.array(number_list)
+    Return:
+    None, in place modification of data
+    """
+    data['mic_number'] = get_mic_number(data['file_name'], settings)
 
 
 def update_cter_v1_0(data, settings, label):
@@ -153,37 +166,37 @@ def update_ctffind_4_v4_1_8(data, settings, label):
     x values, y values, label, title
     """
     if label == 'defocus':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['defocus']/10000
         label = 'Defocus / mum'
         title = 'Mean defocus'
 
     elif label == 'defocus_diff':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['defocus_diff'] / 10000
         label = 'Defocus diff / mum'
         title = 'Defocus diff'
 
     elif label == 'astigmatism':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['astigmatism']
         label = 'Angle / degree'
         title = 'Azimuth of astigmatism'
 
     elif label == 'phase_shift':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['phase_shift']
         label = 'Phase shift / degree'
         title = 'Additional phase shift'
 
     elif label == 'cross_corr':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['cross_corr']
         label = 'Cross correlation'
         title = 'Cross correlation'
 
     elif label == 'limit':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['limit']
         y_values[y_values == np.inf] = 0
         label = 'Resolution limit / A'
@@ -208,25 +221,25 @@ def update_motion_cor_2_v1_0_0(data, settings, label):
     x values, y values, label, title
     """
     if label == 'overall drift':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['overall drift']
         label = 'Drift / A'
         title = 'Overall drift'
 
     elif label == 'average drift per frame':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['average drift per frame']
         label = 'Drift / A'
         title = 'Average drift per frame'
 
     elif label == 'first frame drift':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['first frame drift']
         label = 'Drift / A'
         title = 'First frame drift'
 
     elif label == 'average drift per frame without first':
-        x_values = get_mic_number(data['file_name'], settings)
+        x_values = data['mic_number']
         y_values = data['average drift per frame without first']
         label = 'Drift / A'
         title = 'Average drift per frame without first'
@@ -0,0 +1,128 @@
+"""
+    TranSPHIRE is supposed to help with the cryo-EM data collection
+    Copyright (C) 2017 Markus Stabrin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import re
+import subprocess as sp
+
+
+def placeholder(name):
+    """
+    Placeholder for a value that changes for every file.
+
+    name - Name of the value
+
+    Returns:
+    Placeholder string
+    """
+    return '@{0}@'.format(name)
+
+
+def fill(template, values):
+    """
+    Replace the placeholders of a compiled template.
+
+    template - List of arguments with placeholders
+    values - Dictionary: name of the placeholder -> value
+
+    Returns:
+    List of arguments
+    """
+    filled = []
+    for token in template:
+        if '@' in token:
+            for key, value in values.items():
+                token = token.replace(placeholder(key), '{0}'.format(value))
+        else:
+            pass
+        filled.append(token)
+    return filled
+
+
+def settings_to_arguments(program_settings, ignore_list):
+    """
+    Turn the program settings into command line arguments.
+
+    program_settings - Settings of the program
+    ignore_list - Keys that are no command line flags
+
+    Returns:
+    List of arguments
+    """
+    arguments = []
+    for key in program_settings:
+        if key in ignore_list:
+            continue
+        elif program_settings[key]:
+            arguments.append(key)
+            arguments.append('{0}'.format(program_settings[key]))
+        else:
+            continue
+    return arguments
+
+
+def get_help_text(executable):
+    """
+    Output of the program help.
+
+    executable - Program to ask
+
+    Returns:
+    Help text, empty if the program does not provide one
+    """
+    try:
+        output = sp.run(
+            [executable, '--help'],
+            stdin=sp.DEVNULL,
+            stdout=sp.PIPE,
+            stderr=sp.STDOUT,
+            timeout=30
+            ).stdout
+    except (OSError, sp.TimeoutExpired):
+        return ''
+    else:
+        return output.decode('utf-8', 'replace')
+
+
+def validate(template, help_text):
+    """
+    Check the flags of a compiled template against the program help.
+    Programs that do not list any of the flags cannot be validated.
+
+    template - List of arguments with placeholders
+    help_text - Output of the program help
+
+    Returns:
+    List of flags that are not known to the program
+    """
+    flags = [
+        token for token in template[1:]
+        if re.match(r'^--?[A-Za-z]', token)
+        ]
+    known = []
+    unknown = []
+    for flag in flags:
+        if re.search(
+                r'(?<![\w-]){0}(?![\w-])'.format(re.escape(flag)),
+                help_text
+                ):
+            known.append(flag)
+        else:
+            unknown.append(flag)
+    if known:
+        return unknown
+    else:
+        return []
@@ -16,6 +16,7 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import os
+import re
 import errno
 import glob
 import json
@@ -38,28 +39,54 @@ from transphire.framecontainer import FrameContainer
 from transphire.buttoncontainer import ButtonContainer
 from transphire.notificationcontainer import NotificationContainer
 from transphire.plotcontainer import PlotContainer
+from transphire.metricscontainer import MetricsContainer
 from transphire.tabdocker import TabDocker
 from transphire import transphire_content as tc
 from transphire import transphire_plot as tp
 from transphire import transphire_import as ti
 
 
-def copy(file_in, file_out):
+def copy(file_in, file_out, throttle=None, chunk_size=8 * 1024**2):
     """
     Copy file_in to a new location.
 
     Arguments:
     file_in - Input file
     file_out - Output file
+    throttle - Function called with the size of every chunk before it is written
+    chunk_size - Size of the chunks in bytes, if throttled
 
     Return:
     None
     """
-
-    try:
-        shutil.copy2(file_in, file_out)
-    except PermissionError:
-        shutil.copyfile(file_in, file_out)
+    if throttle is None:
+        try:
+            shutil.copy2(file_in, file_out)
+        except PermissionError:
+            shutil.copyfile(file_in, file_out)
+    else:
+        try:
+            with open(file_in, 'rb') as read:
+                with open(file_out, 'wb') as write:
+                    while True:
+                        chunk = read.read(chunk_size)
+                        if not chunk:
+                            break
+                        else:
+                            pass
+                        throttle(len(chunk))
+                        write.write(chunk)
+        except Exception:
+            # Do not leave a partial file behind
+            try:
+                os.remove(file_out)
+            except OSError:
+                pass
+            raise
+        try:
+            shutil.copystat(file_in, file_out)
+        except PermissionError:
+            pass
 
 
 def get_function_dict():
@@ -439,6 +466,360 @@ def get_key_names(settings_folder, name):
     return return_dict
 
 
+def read_settings_file(file_name):
+    """
+    Read a settings file written by the save method of the MainWindow.
+
+    Arguments:
+    file_name - Name of the settings file
+
+    Return:
+    Settings as dictionary
+    """
+    settings = []
+    with open(file_name, 'r') as read:
+        for line in read:
+            line = line.replace('\n', '')
+            key, *value = line.split('\t')
+            settings.append([key, *value])
+
+    return settings_to_dict(settings=settings)
+
+
+def settings_to_dict(settings):
+    """
+    Make the settings readable for the widgets set settings method.
+
+    Arguments:
+    settings - Settings as list of [key, *values].
+
+    Return:
+    Settings as dictionary
+    """
+    settings_dict = {}
+    idx = -1
+    while idx < len(settings)-1:
+        idx += 1
+        if settings[idx][0] == '###':
+            key = settings[idx][1]
+            if key == 'Frames':
+                settings_dict[key] = []
+            else:
+                settings_dict[key] = {}
+            continue
+
+        if len(settings[idx]) == 1:
+            settings[idx].append('')
+
+        if key == 'Frames':
+            setting = {}
+            setting[settings[idx][0]] = settings[idx][1]
+            for i in range(3):
+                idx += 1
+                setting[settings[idx][0]] = settings[idx][1]
+            settings_dict[key].append(setting)
+        else:
+            if key == 'Notification':
+                settings_dict[key].update({settings[idx][0]: [
+                    settings[idx][1],
+                    settings[idx][2]
+                    ]})
+            else:
+                settings_dict[key].update({
+                    settings[idx][0]: settings[idx][1]
+                    })
+
+    return settings_dict
+
+
+def get_content_items(typ, settings_folder, hdd=None):
+    """
+    Default content items of a settings tab.
+
+    Arguments:
+    typ - Typ/Name of content
+    settings_folder - Folder containing the settings
+    hdd - Content is hdd (default None)
+
+    Return:
+    Content items as list
+    """
+    content_function = get_function_dict()[typ]['content']
+    if typ == 'Mount':
+        return content_function(hdd=hdd)
+    elif typ == 'Copy':
+        return content_function(settings_folder=settings_folder)
+    else:
+        return content_function()
+
+
+def apply_content_defaults(content, data):
+    """
+    Overwrite the values of a content with the values of a settings file.
+
+    Arguments:
+    content - Content as list of [{key: [value, settings]}]
+    data - Content loaded from the content_*.txt file
+
+    Return:
+    None
+    """
+    for entry in data:
+        for dictionary in entry:
+            for name_content in content:
+                for default_value in name_content:
+                    if default_value.keys() == dictionary.keys():
+                        for key in default_value:
+                            default = dictionary[key][0]
+                            default_value[key][0] = default
+                        break
+                    else:
+                        pass
+
+
+def get_default_content(name, settings_folder):
+    """
+    Default content of a settings tab without creating the widgets.
+    Same format as the get_settings method of the LoadContentContainer.
+
+    Arguments:
+    name - Name of the content, e.g. Pipeline
+    settings_folder - Folder containing the settings
+
+    Return:
+    Content as list of [{key: [value, settings]}]
+    """
+    default_file = '{0}/content_{1}.txt'.format(
+        settings_folder,
+        name.replace(' ', '_')
+        )
+    try:
+        with open(default_file, 'r') as file_r:
+            data = json.load(file_r)
+    except FileNotFoundError:
+        data = None
+
+    if name == 'Mount' and data is not None:
+        # All mount points are saved
+        return data
+    else:
+        pass
+
+    # Same values as the LoadContent widgets show by default
+    content = []
+    for entry in get_content_items(typ=name, settings_folder=settings_folder, hdd=True):
+        key, values, dtype, group, typ = entry
+        if typ == 'COMBO':
+            value = values[0]
+        else:
+            value = values
+        if name == 'Mount' and key == 'Typ':
+            value = 'Copy_hdd'
+        elif name == 'Mount' and key == 'Protocol':
+            value = 'hdd'
+        else:
+            pass
+        if typ == 'FILE/CHOICE':
+            widget_2 = 'True'
+        else:
+            widget_2 = None
+        content.append({key: [value, {
+            'typ': typ,
+            'name': key,
+            'values': values,
+            'dtype': dtype,
+            'group': group,
+            'widget_2': widget_2,
+            }]})
+    content = [content]
+
+    if data is not None:
+        apply_content_defaults(content=content, data=data)
+    else:
+        pass
+    return content
+
+
+def get_content_value(content, name):
+    """
+    Value of a content entry.
+
+    Arguments:
+    content - Content as list of [{key: [value, settings]}]
+    name - Name of the entry
+
+    Return:
+    Value, None if the entry does not exist
+    """
+    for entry in content:
+        for widget in entry:
+            if name in widget:
+                return widget[name][0]
+            else:
+                pass
+    return None
+
+
+def get_settings_from_content(content_settings):
+    """
+    Combine the settings of the widgets to the settings of the process.
+
+    Arguments:
+    content_settings - Dictionary: content name -> list of settings returned
+    by the get_settings method of the content widget
+
+    Return:
+    Settings dictionary, list of errors
+    """
+    settings = {}
+    error_list = []
+    skip_list = [
+        'Mount',
+        'Notification',
+        'Path',
+        'Frames'
+        ]
+    for key, settings_widget in content_settings.items():
+        settings[key] = {}
+
+        if key == 'Frames':
+            skip_name_list = []
+        else:
+            skip_name_list = get_function_dict()[key]['allow_empty']
+
+        for entry in settings_widget:
+            if key not in skip_list:
+                for name in entry:
+                    if not entry[name] and name not in skip_name_list:
+                        error_list.append(
+                            '{0}:{1} is not allowed to be emtpy!'.format(
+                                key,
+                                name
+                                )
+                            )
+                    else:
+                        pass
+            else:
+                pass
+
+        if key == 'Frames':
+            settings['motion_frames'] = {}
+            for idx, entry in enumerate(settings_widget):
+                settings['motion_frames'][idx] = entry
+        else:
+            for entry in settings_widget:
+                settings[key].update(entry)
+
+    return settings, error_list
+
+
+def set_project_settings(
+        settings, settings_folder, mount_directory,
+        project_name_pattern, project_name_pattern_example
+        ):
+    """
+    Add the mount users and the project folder names to the settings.
+
+    Arguments:
+    settings - Settings dictionary of get_settings_from_content
+    settings_folder - Folder containing the settings
+    mount_directory - Folder containing the mount points
+    project_name_pattern - Regular expression for the project name
+    project_name_pattern_example - Example of a valid project name
+
+    Return:
+    None, if successful, else the error message
+    """
+    # Get mount information
+    for key in settings['Mount']:
+        device_name = key.replace(' ', '_')
+        save_file = os.path.join(settings_folder, device_name)
+        try:
+            with open(save_file, 'r') as read:
+                lines = read.readlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            name = line.split('\t')[0]
+            settings['user_{0}'.format(device_name)] = name
+    settings['user_Later'] = None
+
+    if not re.match(
+            project_name_pattern,
+            settings['General']['Project name']
+            ):
+        return 'Project name needs to match pattern:\n{0}\n For example: {1}'.format(
+            project_name_pattern,
+            project_name_pattern_example
+            )
+    else:
+        pass
+
+    # Project folder names
+    settings['project_folder'] = os.path.join(
+        settings['General']['Project directory'],
+        settings['General']['Project name']
+        )
+    settings['compress_folder'] = os.path.join(
+        settings['General']['Project directory'],
+        settings['General']['Project name']
+        )
+    settings['motion_folder'] = os.path.join(
+        settings['General']['Project directory'],
+        settings['General']['Project name']
+        )
+    settings['ctf_folder'] = os.path.join(
+        settings['General']['Project directory'],
+        settings['General']['Project name']
+        )
+    settings['scratch_folder'] = os.path.join(
+        settings['General']['Scratch directory'],
+        settings['General']['Project name']
+        )
+    settings['Copy_hdd_folder'] = mount_directory
+    settings['Copy_backup_folder'] = mount_directory
+    settings['Copy_work_folder'] = mount_directory
+    settings['settings_folder'] = os.path.join(
+        settings['project_folder'],
+        'settings'
+        )
+    settings['queue_folder'] = os.path.join(
+        settings['project_folder'],
+        'queue'
+        )
+    settings['error_folder'] = os.path.join(
+        settings['project_folder'],
+        'error'
+        )
+    settings['resources_folder'] = os.path.join(
+        settings['project_folder'],
+        'resources'
+        )
+    return None
+
+
+def create_project_folders(settings):
+    """
+    Create the project and settings folders.
+
+    Arguments:
+    settings - Settings dictionary of set_project_settings
+
+    Return:
+    None, if successful, else the error message
+    """
+    for name in [
+            'project_folder', 'settings_folder',
+            'scratch_folder', 'queue_folder', 'error_folder',
+            'resources_folder'
+            ]:
+        try:
+            mkdir_p(settings[name])
+        except FileNotFoundError:
+            return 'Project name cannot be empty'
+    return None
+
+
 def get_content_gui(content):
     """
     Create content lists to load the GUI.
@@ -527,6 +908,11 @@ def get_content_gui(content):
             'content_pipeline': content['Pipeline'],
             'layout': 'h1',
             },
+        {
+            'name': 'Metrics',
+            'widget': MetricsContainer,
+            'layout': 'TAB1',
+            },
         {
             'name': 'Plot Motion',
             'widget': TabDocker,